@@ -1,270 +1,173 @@
 from django.db import connection
+from collections import namedtuple
 from datetime import datetime
 
+from .history_archive import check_not_archived
+from .history_cache import point_in_time_cache
+from .models import HistoryCheckpoint
+from .queries import CURRENT_OUTAGES, HISTORIC_OUTAGES, DIFF_MISSING_OUTAGES, DIFF_CHANGED_OUTAGES, OUTAGE_DIFF, \
+    OUTAGES_AS_OF, outages_as_of_batch, HISTORIC_OUTAGES_FROM_CHECKPOINT, OUTAGE_DIFF_FROM_CHECKPOINTS
+
 def _to_date_string(date):
     return datetime.strftime(date, "%Y-%m-%d %H:%M")
 
-def get_current_outages():
+def _to_datetime_string(date):
+    return datetime.strftime(date, "%Y-%m-%d %H:%M:%S")
+
+# Rows fetched per round trip by the iter_* functions
+FETCH_SIZE = 2000
+
+# Requests sent per statement by get_outages_as_of_batch, four parameters each within sqlite's limit of 999
+AS_OF_BATCH_SIZE = 200
+
+def _fetchall(sql, params=()):
     c = connection.cursor()
-    sql ="""
-        SELECT
-          outages_currentticket.ticket_number,
-          zoneName,
-          equipmentName,
-          equipmentType,
-          voltageLevel,
-          voltageMeasurementUnit,
-          startTime,
-          endTime,
-          openClosed,
-          status,
-          lastRevised,
-          approvalRisk,
-          availability,
-          rtepNumber,
-          previousStatus
-        FROM outages_currentplannedoutage
-          LEFT JOIN outages_currentticket
-            ON outages_currentplannedoutage.ticket_id = outages_currentticket.id
-          LEFT JOIN outages_zone
-            ON outages_currentplannedoutage.zone_id = outages_zone.id
-          LEFT JOIN outages_equipment
-            ON outages_currentplannedoutage.facility_id = outages_equipment.id
+    try:
+        c.execute(sql, params)
+        return c.fetchall()
+    finally:
+        c.close()
+
+def _iterate(sql, params=(), fetch_size=FETCH_SIZE):
+    """
+    Helper function to stream the rows of a query in batches
+    On PostgreSQL the rows come from a server-side cursor, other backends fetch them with fetchmany
+    :param sql: Statement from queries.py
+    :param params: Parameters of the statement
+    :param fetch_size: Number of rows fetched at a time
+    :return: Generator of namedtuples with the column names of the query as fields
     """
-    res = c.execute(sql)
-    return res.fetchall()
+    c = getattr(connection, 'chunked_cursor', connection.cursor)()
+    try:
+        c.execute(sql, params)
+        # A server-side cursor only has a description once the first rows are fetched
+        rows = c.fetchmany(fetch_size)
+        row_type = namedtuple('Row', [column[0] for column in c.description], rename=True)
+        while rows:
+            for row in rows:
+                yield row_type._make(row)
+            rows = c.fetchmany(fetch_size)
+    finally:
+        c.close()
 
-def get_historic_outages(date1):
+def get_current_outages():
+    return _fetchall(CURRENT_OUTAGES)
+
+def _historic_outages_query(date1):
+    """
+    Helper function to pick the point-in-time statement, starting from the nearest checkpoint when there is one
+    :param date1: Point in time
+    :return: Tuple of (statement, parameters)
+    """
+    checkpoint = HistoryCheckpoint.objects.nearest(date1)
     date1 = _to_date_string(date1)
-    c = connection.cursor()
-    sql = """
-            SELECT
-              outages_historicticket.ticket_number,
-              zoneName,
-              equipmentName,
-              equipmentType,
-              voltageLevel,
-              voltageMeasurementUnit,
-              startTime,
-              endTime,
-              openClosed,
-              status,
-              lastRevised,
-              approvalRisk,
-              availability,
-              rtepNumber,
-              previousStatus
-            FROM outages_historicplannedoutage
-              LEFT JOIN outages_historicticket
-                ON outages_historicplannedoutage.ticket_id = outages_historicticket.id
-              LEFT JOIN outages_zone
-                ON outages_historicplannedoutage.zone_id = outages_zone.id
-              LEFT JOIN outages_equipment
-                ON outages_historicplannedoutage.facility_id = outages_equipment.id
-            WHERE outages_historicplannedoutage.validFrom < '{date1}'
-                  AND (
-                    outages_historicplannedoutage.validTo > '{date1}' OR
-                    outages_historicplannedoutage.validTo ISNULL
-                  )
-      """.format(**{'date1': date1})
-    res = c.execute(sql)
-    return res.fetchall()
+    if checkpoint is None:
+        return HISTORIC_OUTAGES, [date1, date1]
+    return HISTORIC_OUTAGES_FROM_CHECKPOINT, [checkpoint.id, date1, _to_date_string(checkpoint.checkpointTime),
+                                              date1, date1]
 
-def get_diff_added_outages(date1, date2):
+def _outage_diff_query(date1, date2):
+    """
+    Helper function to pick the diff statement, starting from the nearest checkpoints when both dates have one
+    :param date1: Later point in time
+    :param date2: Earlier point in time
+    :return: Tuple of (statement, parameters)
+    """
+    checkpoint1 = HistoryCheckpoint.objects.nearest(date1)
+    checkpoint2 = HistoryCheckpoint.objects.nearest(date2)
     date1 = _to_date_string(date1)
     date2 = _to_date_string(date2)
+    if checkpoint1 is None or checkpoint2 is None:
+        return OUTAGE_DIFF, [date1, date1, date2, date2, date2, date2, date1, date1]
+    time1 = _to_date_string(checkpoint1.checkpointTime)
+    time2 = _to_date_string(checkpoint2.checkpointTime)
+    return OUTAGE_DIFF_FROM_CHECKPOINTS, [checkpoint1.id, date1, date2, date2, time1, date1, date1, date2, date2,
+                                          checkpoint2.id, date2, date1, date1, time2, date2, date2, date1, date1]
 
-    c = connection.cursor()
-    sql = """
-        SELECT
-          ticket_number,
-          zoneName,
-          equipmentName,
-          equipmentType,
-          voltageLevel,
-          voltageMeasurementUnit,
-          startTime,
-          endTime,
-          openClosed,
-          status,
-          lastRevised,
-          approvalRisk,
-          availability,
-          rtepNumber,
-          previousStatus
-        FROM (SELECT *
-              FROM outages_historicplannedoutage
-                LEFT JOIN outages_historicticket
-                        ON outages_historicplannedoutage.ticket_id = outages_historicticket.id
-                      LEFT JOIN outages_zone
-                        ON outages_historicplannedoutage.zone_id = outages_zone.id
-                      LEFT JOIN outages_equipment
-                        ON outages_historicplannedoutage.facility_id = outages_equipment.id
-              WHERE outages_historicplannedoutage.validFrom < '{date1}'
-                    AND ('({date1}' < outages_historicplannedoutage.validTo
-                         OR outages_historicplannedoutage.validTo ISNULL)
-             ) AS current
-        WHERE NOT EXISTS(SELECT *
-                         FROM outages_historicplannedoutage AS history
-                         WHERE history.validFrom < '{date2}'
-                               AND ('{date2}' < history.validTo
-                                    OR history.validTo ISNULL)
-                               AND current.ticket_id = history.ticket_id
-                               AND current.facility_id = history.facility_id
-                               AND current.lineNumber = history.lineNumber);
-        """.format(**{'date1': date1, 'date2': date2})
-    res = c.execute(sql)
-    return res.fetchall()
+def _query_historic_outages(date1):
+    return _fetchall(*_historic_outages_query(date1))
 
-def get_diff_removed_outages(date1, date2):
+def get_historic_outages(date1):
+    check_not_archived(date1)
+    return point_in_time_cache.get(date1, _query_historic_outages)
+
+def get_diff_added_outages(date1, date2):
+    check_not_archived(date1, date2)
     date1 = _to_date_string(date1)
     date2 = _to_date_string(date2)
+    return _fetchall(DIFF_MISSING_OUTAGES, [date1, date1, date2, date2])
 
-    c = connection.cursor()
-    sql ="""
-        SELECT
-          ticket_number,
-          zoneName,
-          equipmentName,
-          equipmentType,
-          voltageLevel,
-          voltageMeasurementUnit,
-          startTime,
-          endTime,
-          openClosed,
-          status,
-          lastRevised,
-          approvalRisk,
-          availability,
-          rtepNumber,
-          previousStatus
-        FROM (SELECT *
-              FROM outages_historicplannedoutage
-                LEFT JOIN outages_historicticket
-                  ON outages_historicplannedoutage.ticket_id = outages_historicticket.id
-                LEFT JOIN outages_zone
-                  ON outages_historicplannedoutage.zone_id = outages_zone.id
-                LEFT JOIN outages_equipment
-                  ON outages_historicplannedoutage.facility_id = outages_equipment.id
-              WHERE outages_historicplannedoutage.validFrom < '{date2}'
-                    AND ('{date2}' < outages_historicplannedoutage.validTo
-                         OR outages_historicplannedoutage.validTo ISNULL)
-             ) AS current
-        WHERE NOT EXISTS(SELECT *
-                         FROM outages_historicplannedoutage AS history
-                         WHERE history.validFrom < '{date1}'
-                               AND ('{date1}' < history.validTo OR history.validTo ISNULL)
-                               AND current.ticket_id = history.ticket_id
-                               AND current.facility_id = history.facility_id
-                               AND current.lineNumber = history.lineNumber)
-    """.format(**{'date1': date1, 'date2': date2})
-    res = c.execute(sql)
-    return res.fetchall()
+def get_diff_removed_outages(date1, date2):
+    check_not_archived(date1, date2)
+    date1 = _to_date_string(date1)
+    date2 = _to_date_string(date2)
+    return _fetchall(DIFF_MISSING_OUTAGES, [date2, date2, date1, date1])
 
 def get_diff_changed_to_outages(date1, date2):
+    check_not_archived(date1, date2)
     date1 = _to_date_string(date1)
     date2 = _to_date_string(date2)
-
-    c = connection.cursor()
-    sql ="""
-        SELECT
-          ticket_number,
-          zoneName,
-          equipmentName,
-          equipmentType,
-          voltageLevel,
-          voltageMeasurementUnit,
-          startTime,
-          endTime,
-          openClosed,
-          status,
-          lastRevised,
-          approvalRisk,
-          availability,
-          rtepNumber,
-          previousStatus
-        FROM (
-               SELECT *
-               FROM outages_historicplannedoutage
-                 LEFT JOIN outages_historicticket
-                   ON outages_historicplannedoutage.ticket_id = outages_historicticket.id
-                 LEFT JOIN outages_zone
-                   ON outages_historicplannedoutage.zone_id = outages_zone.id
-                 LEFT JOIN outages_equipment
-                   ON outages_historicplannedoutage.facility_id = outages_equipment.id
-               WHERE outages_historicplannedoutage.validFrom < '{date1}'
-                     AND ('{date1}' < outages_historicplannedoutage.validTo
-                          OR outages_historicplannedoutage.validTo ISNULL))
-          AS current
-        WHERE EXISTS(
-            SELECT *
-            FROM (
-                   SELECT *
-                   FROM outages_historicplannedoutage
-                   WHERE outages_historicplannedoutage.validFrom < '{date2}'
-                         AND ('{date2}' < outages_historicplannedoutage.validTo
-                              OR outages_historicplannedoutage.validTo ISNULL))
-              AS history
-            WHERE current.ticket_id = history.ticket_id
-                  AND current.facility_id = history.facility_id
-                  AND current.lineNumber = history.lineNumber
-                  AND (current.startTime != history.startTime
-                       OR current.endTime != history.endTime
-                       OR current.openClosed != history.openClosed))
-    """.format(**{'date1': date1, 'date2': date2})
-    res = c.execute(sql)
-    return res.fetchall()
+    return _fetchall(DIFF_CHANGED_OUTAGES, [date1, date1, date2, date2])
 
 def get_diff_changed_from_outages(date1, date2):
+    check_not_archived(date1, date2)
     date1 = _to_date_string(date1)
     date2 = _to_date_string(date2)
+    return _fetchall(DIFF_CHANGED_OUTAGES, [date2, date2, date1, date1])
 
-    c = connection.cursor()
-    sql ="""
-        SELECT
-          ticket_number,
-          zoneName,
-          equipmentName,
-          equipmentType,
-          voltageLevel,
-          voltageMeasurementUnit,
-          startTime,
-          endTime,
-          openClosed,
-          status,
-          lastRevised,
-          approvalRisk,
-          availability,
-          rtepNumber,
-          previousStatus
-        FROM (
-               SELECT *
-               FROM outages_historicplannedoutage
-                 LEFT JOIN outages_historicticket
-                   ON outages_historicplannedoutage.ticket_id = outages_historicticket.id
-                 LEFT JOIN outages_zone
-                   ON outages_historicplannedoutage.zone_id = outages_zone.id
-                 LEFT JOIN outages_equipment
-                   ON outages_historicplannedoutage.facility_id = outages_equipment.id
-               WHERE outages_historicplannedoutage.validFrom < '{date2}'
-                     AND ('{date2}' < outages_historicplannedoutage.validTo
-                          OR outages_historicplannedoutage.validTo ISNULL))
-          AS current
-        WHERE EXISTS(
-            SELECT *
-            FROM (
-                   SELECT *
-                   FROM outages_historicplannedoutage
-                   WHERE outages_historicplannedoutage.validFrom < '{date1}'
-                         AND ('{date1}' < outages_historicplannedoutage.validTo
-                              OR outages_historicplannedoutage.validTo ISNULL))
-              AS history
-            WHERE current.ticket_id = history.ticket_id
-                  AND current.facility_id = history.facility_id
-                  AND current.lineNumber = history.lineNumber
-                  AND (current.startTime != history.startTime
-                       OR current.endTime != history.endTime
-                       OR current.openClosed != history.openClosed))
-    """.format(**{'date1': date1, 'date2': date2})
-    res = c.execute(sql)
-    return res.fetchall()
+def get_outage_diff(date1, date2):
+    """
+    Added, removed, changed_to and changed_from outages between two points in time in a single query
+    :param date1: Later point in time
+    :param date2: Earlier point in time
+    :return: Rows of the four get_diff_* functions, each prefixed with its change type from queries.py
+    """
+    check_not_archived(date1, date2)
+    return _fetchall(*_outage_diff_query(date1, date2))
+
+def iter_current_outages(fetch_size=FETCH_SIZE):
+    return _iterate(CURRENT_OUTAGES, fetch_size=fetch_size)
+
+def iter_historic_outages(date1, fetch_size=FETCH_SIZE):
+    check_not_archived(date1)
+    sql, params = _historic_outages_query(date1)
+    return _iterate(sql, params, fetch_size)
+
+def iter_outage_diff(date1, date2, fetch_size=FETCH_SIZE):
+    check_not_archived(date1, date2)
+    sql, params = _outage_diff_query(date1, date2)
+    return _iterate(sql, params, fetch_size)
+
+def get_outages_as_of(as_of, active_from, active_to=None):
+    """
+    Outages as the history knew them at one time, scheduled to be out at another time or during a window
+    :param as_of: Point in time on the validFrom/validTo axis
+    :param active_from: Start of the window on the startTime/endTime axis
+    :param active_to: End of the window, the window is the single point active_from if None
+    :return: Rows in the layout of get_historic_outages
+    """
+    check_not_archived(as_of)
+    as_of = _to_date_string(as_of)
+    active_to = _to_datetime_string(active_from if active_to is None else active_to)
+    active_from = _to_datetime_string(active_from)
+    return _fetchall(OUTAGES_AS_OF, [as_of, as_of, active_to, active_from])
+
+def get_outages_as_of_batch(requests):
+    """
+    get_outages_as_of for many requests, AS_OF_BATCH_SIZE requests per query
+    :param requests: List of (as_of, active_from, active_to) tuples, active_to may be None
+    :return: List with the rows of each request, in the order of the requests
+    """
+    check_not_archived(*[as_of for as_of, active_from, active_to in requests])
+    # PostgreSQL does not infer the type of untyped VALUES parameters compared to a timestamp column
+    placeholder = 'CAST(%s AS timestamp)' if connection.vendor == 'postgresql' else '%s'
+    results = [[] for _ in requests]
+    for start in range(0, len(requests), AS_OF_BATCH_SIZE):
+        batch = requests[start:start + AS_OF_BATCH_SIZE]
+        params = []
+        for request_number, (as_of, active_from, active_to) in enumerate(batch, start):
+            params.extend([request_number, _to_date_string(as_of), _to_datetime_string(active_from),
+                           _to_datetime_string(active_from if active_to is None else active_to)])
+        for row in _fetchall(outages_as_of_batch(len(batch), placeholder), params):
+            results[row[0]].append(row[1:])
+    return results
@@ -0,0 +1,105 @@
+"""
+Point-in-time and diff queries read from daily checkpoints against the same queries over the whole history:
+
+    python -m outages.benchmarks.checkpoints --rows 1000000
+"""
+
+import argparse
+from datetime import timedelta
+from timeit import default_timer
+
+from ..queries import HISTORIC_OUTAGES, HISTORIC_OUTAGES_FROM_CHECKPOINT, OUTAGE_DIFF, OUTAGE_DIFF_FROM_CHECKPOINTS
+from .history_data import START, SPAN, create_database, sqlite_query
+from .history_indexes import INDEXES
+
+# sqlite form of the tables of migrations/0004_history_checkpoints.py
+CHECKPOINT_SCHEMA = """
+CREATE TABLE outages_historycheckpoint (id INTEGER PRIMARY KEY, checkpointTime DATETIME UNIQUE);
+CREATE TABLE outages_historycheckpointoutage (id INTEGER PRIMARY KEY, checkpoint_id INTEGER, outage_id INTEGER);
+CREATE INDEX outages_historycheckpointoutage_checkpoint_id ON outages_historycheckpointoutage (checkpoint_id);
+"""
+
+# Same statement as HistoryCheckpointManager.write
+WRITE_CHECKPOINT = """
+INSERT INTO outages_historycheckpointoutage (checkpoint_id, outage_id)
+SELECT ?, id FROM outages_allhistoricplannedoutage
+WHERE validFrom < ? AND (? < validTo OR validTo IS NULL)
+"""
+
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def write_checkpoints(connection, interval=timedelta(days=1)):
+    """
+    Write a checkpoint every interval over the span of the synthetic history
+    :param connection: sqlite3 connection to the benchmark database
+    :param interval: Time between checkpoints
+    :return: List of (checkpoint id, checkpoint time as text)
+    """
+    connection.executescript(CHECKPOINT_SCHEMA)
+    checkpoints = []
+    checkpoint_time = START
+    while checkpoint_time <= START + SPAN:
+        date = checkpoint_time.strftime(DATE_FORMAT)
+        checkpoint_id = connection.execute('INSERT INTO outages_historycheckpoint (checkpointTime) VALUES (?)',
+                                           (date,)).lastrowid
+        connection.execute(WRITE_CHECKPOINT, (checkpoint_id, date, date))
+        checkpoints.append((checkpoint_id, date))
+        checkpoint_time += interval
+    connection.commit()
+    return checkpoints
+
+
+def nearest(checkpoints, date):
+    return max(checkpoint for checkpoint in checkpoints if checkpoint[1] <= date)
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = default_timer()
+        result = function()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    arguments = argparse.ArgumentParser(description='Benchmark history queries read from checkpoints')
+    arguments.add_argument('--rows', type=int, default=1000000)
+    arguments.add_argument('--date1', default='2015-07-02 08:00')
+    arguments.add_argument('--date2', default='2015-07-01 08:00')
+    arguments.add_argument('--repeat', type=int, default=3)
+    options = arguments.parse_args()
+
+    connection = create_database(options.rows)
+    connection.executescript(INDEXES)
+    checkpoints = write_checkpoints(connection)
+    connection.execute('ANALYZE')
+    date1, date2 = options.date1, options.date2
+    checkpoint1, checkpoint2 = nearest(checkpoints, date1), nearest(checkpoints, date2)
+
+    queries = [
+        ('point_in_time',
+         lambda: connection.execute(sqlite_query(HISTORIC_OUTAGES), (date1, date1)).fetchall(),
+         lambda: connection.execute(sqlite_query(HISTORIC_OUTAGES_FROM_CHECKPOINT),
+                                    (checkpoint1[0], date1, checkpoint1[1], date1, date1)).fetchall()),
+        ('outage_diff',
+         lambda: connection.execute(sqlite_query(OUTAGE_DIFF),
+                                    (date1, date1, date2, date2, date2, date2, date1, date1)).fetchall(),
+         lambda: connection.execute(sqlite_query(OUTAGE_DIFF_FROM_CHECKPOINTS),
+                                    (checkpoint1[0], date1, date2, date2, checkpoint1[1], date1, date1, date2, date2,
+                                     checkpoint2[0], date2, date1, date1, checkpoint2[1], date2, date2, date1,
+                                     date1)).fetchall()),
+    ]
+    for name, full_query, checkpoint_query in queries:
+        full, full_rows = best_time(full_query, options.repeat)
+        checkpoint, checkpoint_rows = best_time(checkpoint_query, options.repeat)
+        if sorted(full_rows) != sorted(checkpoint_rows):
+            raise AssertionError('{} from checkpoints does not match the full query'.format(name))
+        print('{:<14} whole history {:8.4f}s  from checkpoint {:8.4f}s  ({:.1f}x)'.format(
+            name, full, checkpoint, full / checkpoint))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Synthetic bitemporal history in a standalone sqlite database, laid out like the outages_* tables
+created by models.py and the migrations, for benchmarking the history queries without a Django project
+"""
+
+import random
+import sqlite3
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE outages_zone (id INTEGER PRIMARY KEY, zoneName VARCHAR(8));
+CREATE TABLE outages_station (id INTEGER PRIMARY KEY, stationName VARCHAR(8));
+CREATE TABLE outages_equipment (id INTEGER PRIMARY KEY, equipmentName VARCHAR(32), equipmentType VARCHAR(4),
+  station_id INTEGER, voltageLevel INTEGER, voltageMeasurementUnit VARCHAR(8));
+CREATE TABLE outages_historicticket (id INTEGER PRIMARY KEY, ticket_number INTEGER, status VARCHAR(9),
+  lastRevised DATETIME, outageType VARCHAR(27), approvalRisk VARCHAR(8), availability VARCHAR(9),
+  rtepNumber VARCHAR(9), previousStatus VARCHAR(11), validFrom DATETIME, validTo DATETIME,
+  currentStatus VARCHAR(1));
+CREATE TABLE outages_historicplannedoutage (id INTEGER PRIMARY KEY, ticket_id INTEGER, ticket_number INTEGER,
+  facility_id INTEGER, lineNumber INTEGER, zone_id INTEGER, station_id INTEGER, startTime DATETIME,
+  endTime DATETIME, openClosed VARCHAR(1), validFrom DATETIME, validTo DATETIME, currentStatus VARCHAR(1));
+CREATE TABLE outages_closedhistoricticket (id INTEGER PRIMARY KEY, ticket_number INTEGER, status VARCHAR(9),
+  lastRevised DATETIME, outageType VARCHAR(27), approvalRisk VARCHAR(8), availability VARCHAR(9),
+  rtepNumber VARCHAR(9), previousStatus VARCHAR(11), validFrom DATETIME, validTo DATETIME,
+  currentStatus VARCHAR(1));
+CREATE TABLE outages_closedhistoricplannedoutage (id INTEGER PRIMARY KEY, ticket_id INTEGER,
+  ticket_number INTEGER, facility_id INTEGER, lineNumber INTEGER, zone_id INTEGER, station_id INTEGER,
+  startTime DATETIME, endTime DATETIME, openClosed VARCHAR(1), validFrom DATETIME, validTo DATETIME,
+  currentStatus VARCHAR(1));
+CREATE VIEW outages_allhistoricplannedoutage AS
+  SELECT * FROM outages_historicplannedoutage UNION ALL SELECT * FROM outages_closedhistoricplannedoutage;
+CREATE INDEX outages_equipment_station_id ON outages_equipment (station_id);
+CREATE INDEX outages_historicplannedoutage_ticket_id ON outages_historicplannedoutage (ticket_id);
+CREATE INDEX outages_historicplannedoutage_facility_id ON outages_historicplannedoutage (facility_id);
+CREATE INDEX outages_historicplannedoutage_zone_id ON outages_historicplannedoutage (zone_id);
+CREATE INDEX outages_historicplannedoutage_station_id ON outages_historicplannedoutage (station_id);
+CREATE INDEX outages_closedhistoricplannedoutage_facility_id ON outages_closedhistoricplannedoutage (facility_id);
+CREATE INDEX outages_closedhistoricplannedoutage_zone_id ON outages_closedhistoricplannedoutage (zone_id);
+CREATE INDEX outages_closedhistoricplannedoutage_station_id ON outages_closedhistoricplannedoutage (station_id);
+"""
+
+# Same statements as the move_closed methods of the history managers in models.py
+MOVE_CLOSED = """
+INSERT INTO outages_closedhistoricplannedoutage SELECT * FROM outages_historicplannedoutage WHERE currentStatus = 'N';
+DELETE FROM outages_historicplannedoutage WHERE currentStatus = 'N';
+INSERT INTO outages_closedhistoricticket SELECT * FROM outages_historicticket
+  WHERE currentStatus = 'N' AND NOT EXISTS(SELECT * FROM outages_historicplannedoutage
+                                           WHERE outages_historicplannedoutage.ticket_id = outages_historicticket.id);
+DELETE FROM outages_historicticket
+  WHERE currentStatus = 'N' AND NOT EXISTS(SELECT * FROM outages_historicplannedoutage
+                                           WHERE outages_historicplannedoutage.ticket_id = outages_historicticket.id);
+"""
+
+ZONES = ['AEP', 'AEP-IM', 'AEP-OH', 'COMED', 'DOM', 'FE', 'ME', 'PECO', 'PEPCO', 'PPL']
+VOLTAGES = [69, 115, 138, 230, 345, 500, 765]
+
+START = datetime(2015, 1, 1)
+SPAN = timedelta(days=365)
+
+
+def _change_points(start, end, count):
+    points = sorted(start + (end - start) * random.random() for _ in range(count))
+    return [start] + points + [end]
+
+
+def populate(connection, rows, equipment=5000, seed=0):
+    """
+    Fill an empty database with roughly the given number of planned outage history rows
+    :param connection: sqlite3 connection with SCHEMA applied
+    :param rows: Approximate number of outages_historicplannedoutage rows
+    :param equipment: Number of equipment rows
+    :param seed: Random seed, the same seed gives the same data
+    :return: Number of planned outage history rows written
+    """
+    random.seed(seed)
+    connection.executemany('INSERT INTO outages_zone VALUES (?, ?)', enumerate(ZONES, 1))
+    connection.executemany('INSERT INTO outages_station VALUES (?, ?)',
+                           [(i, 'ST{}'.format(i)) for i in range(1, equipment // 4 + 1)])
+    connection.executemany('INSERT INTO outages_equipment VALUES (?, ?, ?, ?, ?, ?)',
+                           [(i, 'FACILITY {}'.format(i), random.choice(['BRKR', 'LINE', 'XFMR']),
+                             random.randint(1, equipment // 4), random.choice(VOLTAGES), 'KV')
+                            for i in range(1, equipment + 1)])
+
+    end_of_history = START + SPAN
+    ticket_rows, outage_rows = [], []
+    ticket_id = 0
+    ticket_number = 500000
+    while len(outage_rows) < rows:
+        ticket_number += 1
+        created = START + SPAN * random.random()
+        retired = created + timedelta(days=random.randint(1, 120))
+        open_ended = retired >= end_of_history
+        retired = min(retired, end_of_history)
+
+        # Versions of the ticket
+        ticket_points = _change_points(created, retired, random.randint(0, 4))
+        version_ids = []
+        for valid_from, valid_to in zip(ticket_points, ticket_points[1:]):
+            ticket_id += 1
+            is_open = open_ended and valid_to == retired
+            version_ids.append(ticket_id)
+            ticket_rows.append((ticket_id, ticket_number, 'Active', valid_from.strftime(DATE_FORMAT), 'Continuous',
+                                '', '', '', 'Submitted', valid_from.strftime(DATE_FORMAT),
+                                None if is_open else valid_to.strftime(DATE_FORMAT), 'Y' if is_open else 'N'))
+
+        # Versions of each outage line, each referencing the ticket version valid when it starts
+        outage_start = created + timedelta(days=random.randint(0, 30))
+        for line_number in range(random.randint(1, 4)):
+            facility = random.randint(1, equipment)
+            line_points = _change_points(created, retired, random.randint(0, 8))
+            for valid_from, valid_to in zip(line_points, line_points[1:]):
+                is_open = open_ended and valid_to == retired
+                outage_start += timedelta(hours=random.randint(-24, 24))
+                version = version_ids[max(bisect_right(ticket_points, valid_from) - 1, 0)]
+                outage_rows.append((None, version, ticket_number, facility, line_number, random.randint(1, len(ZONES)),
+                                    facility // 4 + 1, outage_start.strftime(DATE_FORMAT),
+                                    (outage_start + timedelta(days=random.randint(1, 14))).strftime(DATE_FORMAT),
+                                    'O', valid_from.strftime(DATE_FORMAT),
+                                    None if is_open else valid_to.strftime(DATE_FORMAT), 'Y' if is_open else 'N'))
+
+    connection.executemany('INSERT INTO outages_historicticket VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           ticket_rows)
+    connection.executemany('INSERT INTO outages_historicplannedoutage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           outage_rows)
+    connection.commit()
+    return len(outage_rows)
+
+
+def sqlite_query(sql):
+    """
+    Convert a statement from queries.py to the sqlite parameter style
+    :param sql: Statement with %s parameters
+    :return: Statement with ? parameters
+    """
+    return sql.replace('%s', '?')
+
+
+def create_database(rows, path=':memory:'):
+    """
+    Create and fill a benchmark database
+    :param rows: Approximate number of planned outage history rows
+    :param path: sqlite database path, in memory by default
+    :return: sqlite3 connection
+    """
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    populate(connection, rows)
+    connection.executescript(MOVE_CLOSED)
+    connection.execute('ANALYZE')
+    return connection
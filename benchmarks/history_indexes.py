@@ -0,0 +1,87 @@
+"""
+Point-in-time and diff queries against synthetic history, before and after the indexes of
+migrations/0002_history_indexes.py:
+
+    python -m outages.benchmarks.history_indexes --rows 1000000
+"""
+
+import argparse
+from timeit import default_timer
+
+from ..queries import HISTORIC_OUTAGES, DIFF_MISSING_OUTAGES
+from .history_data import create_database, sqlite_query
+
+# sqlite form of the indexes created by migrations/0002_history_indexes.py and, on the closed history tables, by
+# migrations/0005_closed_history.py
+INDEXES = """
+CREATE INDEX outages_hpo_match_idx ON outages_historicplannedoutage (ticket_number, facility_id, lineNumber);
+CREATE INDEX outages_hpo_ticket_match_idx ON outages_historicplannedoutage (ticket_id, facility_id, lineNumber);
+CREATE INDEX outages_hpo_valid_idx ON outages_historicplannedoutage (validFrom, validTo);
+CREATE INDEX outages_hpo_open_match_idx ON outages_historicplannedoutage (ticket_number, facility_id, lineNumber)
+  WHERE currentStatus = 'Y';
+CREATE INDEX outages_ht_match_idx ON outages_historicticket (ticket_number);
+CREATE INDEX outages_ht_valid_idx ON outages_historicticket (validFrom, validTo);
+CREATE INDEX outages_ht_open_match_idx ON outages_historicticket (ticket_number) WHERE currentStatus = 'Y';
+CREATE INDEX outages_chpo_ticket_match_idx ON outages_closedhistoricplannedoutage (ticket_id, facility_id, lineNumber);
+CREATE INDEX outages_chpo_valid_idx ON outages_closedhistoricplannedoutage (validFrom, validTo);
+"""
+
+# The point-in-time and diff statements run by SQL.py
+POINT_IN_TIME = sqlite_query(HISTORIC_OUTAGES)
+
+DIFF_ADDED = sqlite_query(DIFF_MISSING_OUTAGES)
+
+OPEN_ROW_LOOKUP = """
+SELECT id FROM outages_historicplannedoutage
+WHERE currentStatus = 'Y' AND ticket_number = ? AND facility_id = ? AND lineNumber = ?
+"""
+
+
+def time_queries(connection, date1, date2, repeat=3):
+    """
+    Time the benchmarked queries
+    :param connection: sqlite3 connection to the benchmark database
+    :param date1: Later point in time as text
+    :param date2: Earlier point in time as text
+    :param repeat: Number of runs, the fastest is kept
+    :return: Dictionary of query name to seconds
+    """
+    keys = connection.execute("SELECT ticket_number, facility_id, lineNumber FROM outages_historicplannedoutage "
+                              "WHERE currentStatus = 'Y' LIMIT 500").fetchall()
+    queries = {
+        'point_in_time': lambda: connection.execute(POINT_IN_TIME, (date1, date1)).fetchall(),
+        'diff_added': lambda: connection.execute(DIFF_ADDED, (date1, date1, date2, date2)).fetchall(),
+        'open_row_lookup_x500': lambda: [connection.execute(OPEN_ROW_LOOKUP, key).fetchall() for key in keys],
+    }
+    timings = {}
+    for name, query in queries.items():
+        best = None
+        for _ in range(repeat):
+            start = default_timer()
+            query()
+            elapsed = default_timer() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return timings
+
+
+def main():
+    arguments = argparse.ArgumentParser(description='Benchmark history queries before and after indexing')
+    arguments.add_argument('--rows', type=int, default=1000000)
+    arguments.add_argument('--date1', default='2015-07-02 08:00')
+    arguments.add_argument('--date2', default='2015-07-01 08:00')
+    options = arguments.parse_args()
+
+    connection = create_database(options.rows)
+    before = time_queries(connection, options.date1, options.date2)
+    connection.executescript(INDEXES)
+    connection.execute('ANALYZE')
+    after = time_queries(connection, options.date1, options.date2)
+
+    for name in sorted(before):
+        print('{:<22} before {:8.4f}s  after {:8.4f}s  ({:.1f}x)'.format(
+            name, before[name], after[name], before[name] / after[name]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+The single statement diff of SQL.get_outage_diff against the four get_diff_* statements it replaces:
+
+    python -m outages.benchmarks.outage_diff --rows 1000000
+"""
+
+import argparse
+from timeit import default_timer
+
+from ..queries import DIFF_MISSING_OUTAGES, DIFF_CHANGED_OUTAGES, OUTAGE_DIFF
+from .history_data import create_database, sqlite_query
+from .history_indexes import INDEXES
+
+
+def four_queries(connection, date1, date2):
+    """
+    Run the four get_diff_* statements
+    :param connection: sqlite3 connection to the benchmark database
+    :param date1: Later point in time as text
+    :param date2: Earlier point in time as text
+    :return: List of rows tagged with their change type
+    """
+    missing = sqlite_query(DIFF_MISSING_OUTAGES)
+    changed = sqlite_query(DIFF_CHANGED_OUTAGES)
+    rows = []
+    for change_type, sql, params in [('added', missing, (date1, date1, date2, date2)),
+                                     ('removed', missing, (date2, date2, date1, date1)),
+                                     ('changed_to', changed, (date1, date1, date2, date2)),
+                                     ('changed_from', changed, (date2, date2, date1, date1))]:
+        rows.extend((change_type,) + row for row in connection.execute(sql, params).fetchall())
+    return rows
+
+
+def single_query(connection, date1, date2):
+    """
+    Run the combined diff statement
+    :param connection: sqlite3 connection to the benchmark database
+    :param date1: Later point in time as text
+    :param date2: Earlier point in time as text
+    :return: List of rows tagged with their change type
+    """
+    return connection.execute(sqlite_query(OUTAGE_DIFF),
+                              (date1, date1, date2, date2, date2, date2, date1, date1)).fetchall()
+
+
+def best_time(function, repeat, *args):
+    best = None
+    for _ in range(repeat):
+        start = default_timer()
+        function(*args)
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arguments = argparse.ArgumentParser(description='Benchmark the single statement outage diff')
+    arguments.add_argument('--rows', type=int, default=1000000)
+    arguments.add_argument('--date1', default='2015-07-02 08:00')
+    arguments.add_argument('--date2', default='2015-07-01 08:00')
+    arguments.add_argument('--repeat', type=int, default=3)
+    options = arguments.parse_args()
+
+    connection = create_database(options.rows)
+    for indexed in (False, True):
+        if indexed:
+            connection.executescript(INDEXES)
+            connection.execute('ANALYZE')
+        dates = (options.date1, options.date2)
+        if sorted(four_queries(connection, *dates)) != sorted(single_query(connection, *dates)):
+            raise AssertionError('The single statement diff does not match the four queries')
+        four = best_time(four_queries, options.repeat, connection, *dates)
+        single = best_time(single_query, options.repeat, connection, *dates)
+        print('{:<10} four queries {:8.4f}s  single query {:8.4f}s  ({:.1f}x)'.format(
+            'indexed' if indexed else 'unindexed', four, single, four / single))
+
+
+if __name__ == '__main__':
+    main()
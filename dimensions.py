@@ -0,0 +1,114 @@
+"""
+Cache of the Zone, Station and Equipment dimension tables used while loading outages
+"""
+
+from django.db import IntegrityError, transaction
+
+from .models import Zone, Station, Equipment, ID_BATCH_SIZE
+
+
+def _fetch_ids(model, field, names):
+    """
+    Helper function to look up the ids of dimension rows by name, in batches
+    :param model: Dimension model class
+    :param field: Name column of the model
+    :param names: Names to look up
+    :return: Dictionary of name to id
+    """
+    names = list(names)
+    ids = {}
+    for start in range(0, len(names), ID_BATCH_SIZE):
+        lookup = {field + '__in': names[start:start + ID_BATCH_SIZE]}
+        ids.update(model.objects.filter(**lookup).values_list(field, 'id'))
+    return ids
+
+
+def _insert_missing(model, field, rows):
+    """
+    Helper function to insert dimension rows by name with one bulk insert, another loader may insert some of the
+    same names at the same time
+    :param model: Dimension model class
+    :param field: Name column of the model
+    :param rows: Dictionary of name to the values of the other columns of its row
+    :return: Dictionary of name to id
+    """
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([model(**dict(values, **{field: name})) for name, values in rows.items()])
+    except IntegrityError:
+        # Some names were inserted since the cache was read, keep those rows and insert the others
+        for name, values in rows.items():
+            model.objects.get_or_create(defaults=values, **{field: name})
+    return _fetch_ids(model, field, rows)
+
+
+class DimensionCache(object):
+    """
+    Maps zone, station and facility names to their foreign keys without a query per outage
+
+    The small dimension tables are read into dictionaries once; names that are not in the database yet
+    are inserted with one bulk insert per table, falling back to a get_or_create per name when another
+    loader inserted some of them first. The cache stays warm across polls.
+    """
+
+    def __init__(self):
+        self.zones = None
+        self.stations = None
+        self.equipment = None
+
+    def load(self):
+        """
+        Read the dimension tables into memory
+        :return: Returns nothing, does SQL I/O
+        """
+        self.zones = dict(Zone.objects.values_list('zoneName', 'id'))
+        self.stations = dict(Station.objects.values_list('stationName', 'id'))
+        self.equipment = dict(Equipment.objects.values_list('equipmentName', 'id'))
+
+    def invalidate(self):
+        """
+        Forget the cached tables, the next prime reads them again
+        :return: Returns nothing
+        """
+        self.zones = None
+        self.stations = None
+        self.equipment = None
+
+    def prime(self, outages):
+        """
+        Make sure every zone, station and facility of the outages has a database row and a cached id
+        :param outages: Iterable of parsed Outage objects
+        :return: Returns nothing, does SQL I/O only for unseen names
+        """
+        if self.zones is None:
+            self.load()
+
+        outages = list(outages)
+        new_zones = set(outage.zone for outage in outages) - set(self.zones)
+        if new_zones:
+            self.zones.update(_insert_missing(Zone, 'zoneName', dict((name, {}) for name in new_zones)))
+
+        new_stations = set(outage.station for outage in outages) - set(self.stations)
+        if new_stations:
+            self.stations.update(_insert_missing(Station, 'stationName', dict((name, {}) for name in new_stations)))
+
+        new_equipment = {}
+        for outage in outages:
+            if outage.facility_name not in self.equipment:
+                new_equipment[outage.facility_name] = dict(
+                    equipmentType=outage.equipment_type, station_id=self.stations[outage.station],
+                    voltageLevel=outage.voltage or 0, voltageMeasurementUnit=outage.voltage_measurement_unit)
+        if new_equipment:
+            self.equipment.update(_insert_missing(Equipment, 'equipmentName', new_equipment))
+
+    def resolve(self, outage):
+        """
+        Foreign keys of a primed outage
+        :param outage: Parsed Outage object
+        :return: Tuple of (zone id, station id, facility id)
+        """
+        return self.zones[outage.zone], self.stations[outage.station], self.equipment[outage.facility_name]
+
+
+# Shared cache, kept warm for the lifetime of the process
+dimension_cache = DimensionCache()
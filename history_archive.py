@@ -0,0 +1,286 @@
+"""
+Archive of the closed planned outage history in gzip CSV files, one per month of validTo
+
+archive_closed_history moves the closed history rows that stopped being valid before a month out of the
+database into the files; the iter_archived_* functions and archived_outages_at read them back. Each run is
+recorded as a HistoryArchive, and the point-in-time queries of SQL.py raise ArchivedHistoryError for dates
+before the latest one instead of returning incomplete results.
+"""
+
+import csv
+import gzip
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .history_cache import point_in_time_cache
+from .models import HistoryArchive, HistoryCheckpoint
+from .queries import BASE_COLUMNS, BASE_JOINS, historic_tables
+
+OUTAGE_FILE = 'planned-outages-{}.csv.gz'
+TICKET_FILE = 'tickets-{}.csv.gz'
+ARCHIVE_FILE = re.compile(r'^(planned-outages|tickets)-(\d{4}-\d{2})\.csv\.gz$')
+
+# Dates are bound and compared in the formats of SQL.py
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+MONTH_FORMAT = '%Y-%m'
+
+# Closed outage rows with a validTo in a month, joined to their ticket, zone and equipment as the history queries
+# see them. Parameters: month start, next month start
+ARCHIVED_OUTAGES = """
+    SELECT outages_closedhistoricplannedoutage.id AS id,""" + BASE_COLUMNS + """,
+      outages_closedhistoricplannedoutage.validFrom AS validFrom,
+      outages_closedhistoricplannedoutage.validTo AS validTo
+    FROM outages_closedhistoricplannedoutage""" + BASE_JOINS + """
+    WHERE outages_closedhistoricplannedoutage.validTo >= %s AND outages_closedhistoricplannedoutage.validTo < %s
+    ORDER BY outages_closedhistoricplannedoutage.validTo, outages_closedhistoricplannedoutage.id"""
+ARCHIVED_OUTAGES = ARCHIVED_OUTAGES.format(**historic_tables('outages_closedhistoricplannedoutage'))
+
+# Earliest validFrom of the closed outage rows an archive run moves out. Parameters: first month kept
+FIRST_ARCHIVED_VALID_FROM = """
+    SELECT MIN(validFrom) FROM outages_closedhistoricplannedoutage WHERE validTo < %s"""
+
+DELETE_OUTAGES = """
+    DELETE FROM outages_closedhistoricplannedoutage WHERE validTo >= %s AND validTo < %s"""
+
+# Closed tickets with a validTo in a month that no outage still in the database references, run after the
+# outages of the month are deleted. Parameters: month start, next month start
+UNREFERENCED_TICKETS = """
+    WHERE validTo >= %s AND validTo < %s
+      AND NOT EXISTS(SELECT * FROM outages_historicplannedoutage
+                     WHERE outages_historicplannedoutage.ticket_id = outages_closedhistoricticket.id)
+      AND NOT EXISTS(SELECT * FROM outages_closedhistoricplannedoutage
+                     WHERE outages_closedhistoricplannedoutage.ticket_id = outages_closedhistoricticket.id)"""
+
+ARCHIVED_TICKETS = """
+    SELECT id, ticket_number, status, lastRevised, outageType, approvalRisk, availability, rtepNumber,
+      previousStatus, validFrom, validTo
+    FROM outages_closedhistoricticket""" + UNREFERENCED_TICKETS + """
+    ORDER BY validTo, id"""
+
+DELETE_TICKETS = """
+    DELETE FROM outages_closedhistoricticket""" + UNREFERENCED_TICKETS
+
+
+class ArchivedHistoryError(ValueError):
+    """
+    Raised for a point-in-time query at a date whose closed history rows may have been archived
+    """
+
+
+# Load generation of the point-in-time cache and the archive cutoff read at it
+_archive_cutoff = [None, None]
+
+
+def archived_before():
+    """
+    Start of the first month whose closed history rows are still in the database, read again after every
+    history load or archive run recorded in the point-in-time cache, and on every call while none is recorded
+    :return: Datetime, None if nothing was archived
+    """
+    generation = point_in_time_cache.load_generation()
+    if not generation or _archive_cutoff[0] != generation:
+        _archive_cutoff[:] = [generation, HistoryArchive.objects.archived_before()]
+    return _archive_cutoff[1]
+
+
+def check_not_archived(*dates):
+    """
+    Make sure the database still holds every history row valid at the dates of a point-in-time query
+    A row valid at a date has a validTo after it, so only dates before the cutoff can miss archived rows.
+    :param dates: Points in time of the query
+    :return: Returns nothing, raises ArchivedHistoryError
+    """
+    cutoff = archived_before()
+    if cutoff is None:
+        return
+    # Compared as the queries compare the bound dates with the stored ones
+    cutoff = cutoff.strftime(DATE_FORMAT)
+    for date in dates:
+        if date.strftime(DATE_FORMAT) < cutoff:
+            raise ArchivedHistoryError('The history before {} is archived, read {} with archived_outages_at'.format(
+                cutoff, date))
+
+
+def _month_start(value):
+    """
+    Helper function to truncate a date to its month, sqlite returns the dates of aggregates as strings
+    :param value: Datetime or date string
+    :return: Datetime of the first day of the month
+    """
+    if isinstance(value, datetime):
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return datetime.strptime(value[:7], MONTH_FORMAT)
+
+
+def _load_time(value):
+    """
+    Helper function to turn a date as the history tables store it into a datetime for record_load and the ORM,
+    aware like the cache keys when USE_TZ is set
+    :param value: Datetime or date string in UTC, sqlite returns the dates of aggregates as strings
+    :return: Datetime
+    """
+    if not isinstance(value, datetime):
+        value = datetime.strptime(value[:16], DATE_FORMAT)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def _next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def _append_rows(path, cursor):
+    """
+    Helper function to append the rows of an executed query to an archive file, each append adds a gzip member
+    Rows whose id is already in the file, left there by a run whose transaction failed, are not written again.
+    :param path: Archive file, created with a header row of the query's column names if missing
+    :param cursor: Cursor with the executed query, id as its first column
+    :return: Number of rows written
+    """
+    archived_ids = set()
+    new_file = not os.path.exists(path)
+    if not new_file:
+        with gzip.open(path, 'rt', newline='') as archive:
+            reader = csv.reader(archive)
+            next(reader)
+            archived_ids.update(row[0] for row in reader)
+
+    count = 0
+    with gzip.open(path, 'at', newline='') as archive:
+        writer = csv.writer(archive)
+        if new_file:
+            writer.writerow([column[0] for column in cursor.description])
+        for row in cursor.fetchall():
+            if str(row[0]) in archived_ids:
+                continue
+            writer.writerow([_csv_value(value) for value in row])
+            count += 1
+    return count
+
+
+def _archive_month(directory, month):
+    """
+    Helper function to archive and delete the closed outages of a month and the tickets they leave unreferenced
+    The files are written before the rows are deleted, a failure leaves rows in both rather than in neither and
+    the next run does not archive them twice.
+    :param directory: Directory of the archive files
+    :param month: Datetime of the first day of the month
+    :return: Tuple of (outages archived, tickets archived)
+    """
+    params = [month.strftime(DATE_FORMAT), _next_month(month).strftime(DATE_FORMAT)]
+    name = month.strftime(MONTH_FORMAT)
+    with transaction.atomic():
+        c = connection.cursor()
+        try:
+            c.execute(ARCHIVED_OUTAGES, params)
+            outages = _append_rows(os.path.join(directory, OUTAGE_FILE.format(name)), c)
+            c.execute(DELETE_OUTAGES, params)
+            c.execute(ARCHIVED_TICKETS, params)
+            tickets = _append_rows(os.path.join(directory, TICKET_FILE.format(name)), c)
+            c.execute(DELETE_TICKETS, params)
+        finally:
+            c.close()
+    return outages, tickets
+
+
+def archive_closed_history(directory, before):
+    """
+    Moves the closed history rows with a validTo before a month to the archive files, one transaction per month
+    Point-in-time queries before that month raise ArchivedHistoryError from then on, archived_outages_at answers
+    them.
+    :param directory: Directory of the archive files, created if missing
+    :param before: Datetime of the first day of the first month to keep in the database
+    :return: List of (month as YYYY-MM, outages archived, tickets archived) tuples
+    """
+    c = connection.cursor()
+    try:
+        c.execute('SELECT MIN(validTo) FROM outages_closedhistoricplannedoutage')
+        oldest = c.fetchone()[0]
+        c.execute(FIRST_ARCHIVED_VALID_FROM, [_month_start(before).strftime(DATE_FORMAT)])
+        first_valid_from = c.fetchone()[0]
+    finally:
+        c.close()
+
+    archived = []
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    month = _month_start(oldest) if oldest is not None else None
+    while month is not None and month < _month_start(before):
+        outages, tickets = _archive_month(directory, month)
+        archived.append((month.strftime(MONTH_FORMAT), outages, tickets))
+        month = _next_month(month)
+
+    # Their rows point at outages that may now be archived
+    HistoryCheckpoint.objects.filter(checkpointTime__lt=before).delete()
+    if first_valid_from is not None:
+        HistoryArchive.objects.update_or_create(archivedBefore=_load_time(_month_start(before)),
+                                                defaults={'directory': directory})
+        # Results from the validFrom of the first archived row on may have included archived rows
+        point_in_time_cache.record_load(_load_time(first_valid_from))
+    return archived
+
+
+def _iter_archive(directory, kind, first_month=None, last_month=None):
+    """
+    Helper function to read the rows of the archive files of one kind, in month order
+    :param directory: Directory of the archive files
+    :param kind: planned-outages or tickets
+    :param first_month: First month to read as YYYY-MM, from the oldest if None
+    :param last_month: Last month to read as YYYY-MM, to the newest if None
+    :return: Generator of namedtuples with the header of the files as fields, every value a string
+    """
+    files = []
+    for name in os.listdir(directory):
+        match = ARCHIVE_FILE.match(name)
+        if match is None or match.group(1) != kind:
+            continue
+        month = match.group(2)
+        if (first_month is None or month >= first_month) and (last_month is None or month <= last_month):
+            files.append((month, name))
+
+    for month, name in sorted(files):
+        with gzip.open(os.path.join(directory, name), 'rt', newline='') as archive:
+            reader = csv.reader(archive)
+            row_type = namedtuple('Row', next(reader))
+            for row in reader:
+                yield row_type._make(row)
+
+
+def iter_archived_outages(directory, first_month=None, last_month=None):
+    return _iter_archive(directory, 'planned-outages', first_month, last_month)
+
+
+def iter_archived_tickets(directory, first_month=None, last_month=None):
+    return _iter_archive(directory, 'tickets', first_month, last_month)
+
+
+def archived_outages_at(directory, date):
+    """
+    Archived outages valid at a point in time, to be combined with get_historic_outages for dates before the
+    oldest month still in the database
+    :param directory: Directory of the archive files
+    :param date: Point in time
+    :return: List of archived outage rows
+    """
+    # The dates are compared as strings, the way sqlite compares the bound dates of SQL.py
+    date = date.strftime(DATE_FORMAT)
+    return [row for row in iter_archived_outages(directory, first_month=date[:7])
+            if row.validFrom < date < row.validTo]
@@ -0,0 +1,201 @@
+"""
+Cache of point-in-time query results, invalidated by the history loads
+
+History rows are only ever closed or added by a load, and a load at mod_date only changes what the
+history looked like at mod_date and later. A cached result for an earlier time therefore stays valid;
+the loads report their mod_date through record_load so exactly the entries at or after it are dropped.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+# Keys in the Django cache shared by every process using the history tables: the number of the last load,
+# and the since of each load by number
+GENERATION_CACHE_KEY = 'outages.history_cache.generation'
+LOAD_CACHE_KEY = 'outages.history_cache.load.{}'
+
+# Seconds the since of a load stays in the shared cache, a process that slept longer drops every entry
+LOAD_TIMEOUT = 24 * 60 * 60
+
+# Loads missed by a process that are caught up one by one, beyond that every entry is dropped
+MAX_MISSED_LOADS = 64
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def truncate_to_minute(date):
+    """
+    Cache key of a point in time, the point-in-time queries compare dates to the minute
+    :param date: Datetime
+    :return: Datetime without seconds and microseconds
+    """
+    return date.replace(second=0, microsecond=0)
+
+
+def estimate_size(rows):
+    """
+    Rough memory size of a query result, values shared between rows are counted once per row
+    :param rows: List of row tuples
+    :return: Size in bytes
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class PointInTimeCache(object):
+    """
+    LRU cache of query results keyed by minute, bounded by the estimated memory size of the results
+
+    Loads are numbered by a generation kept in the Django cache, so a load done by the polling daemon
+    also invalidates the entries of the web processes when CACHES points at a backend they share, such as
+    memcached or the database cache. Each load takes its number with an atomic incr and publishes its since
+    under that number, so two loads in different processes never share a number and a process catching up
+    invalidates from the earliest since it missed. A result computed while a load ran is not stored.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, shared=None):
+        """
+        :param max_bytes: Largest total estimated size of the cached results
+        :param shared: Cache with get, get_many, set, add and incr used to share loads between processes, Django's
+        default cache if None
+        """
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.entries = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _shared_cache(self):
+        if self.shared is None:
+            from django.core.cache import cache
+            self.shared = cache
+        return self.shared
+
+    def _evict(self, key):
+        rows, size = self.entries.pop(key)
+        self.size -= size
+
+    def _invalidate_from(self, since):
+        """
+        Helper function to drop the entries a load at since may have changed, call with the lock held
+        :param since: Earliest validFrom or validTo written by the load, None drops every entry
+        :return: Returns nothing
+        """
+        for key in list(self.entries):
+            if since is None or key >= truncate_to_minute(since):
+                self._evict(key)
+
+    def _catch_up(self, generation):
+        """
+        Helper function to apply the loads after this process's generation up to a shared one, call with the
+        lock held
+        :param generation: Generation to catch up to, 0 if the shared count was never set or was evicted
+        :return: Returns nothing
+        """
+        if generation == self.generation:
+            return
+        since = None
+        if self.generation < generation <= self.generation + MAX_MISSED_LOADS:
+            keys = [LOAD_CACHE_KEY.format(number) for number in range(self.generation + 1, generation + 1)]
+            loads = self._shared_cache().get_many(keys)
+            # A load that is numbered but not published yet, or expired, could have changed anything
+            if len(loads) == len(keys):
+                since = min(loads.values())
+        self._invalidate_from(since)
+        self.generation = generation
+
+    def _sync(self):
+        """
+        Helper function to catch up with loads recorded by other processes, call with the lock held
+        :return: Returns nothing
+        """
+        self._catch_up(self._shared_cache().get(GENERATION_CACHE_KEY) or 0)
+
+    def _next_generation(self):
+        """
+        Helper function to number a new load, atomic across processes on backends with an atomic incr
+        :return: Generation of the load
+        """
+        shared = self._shared_cache()
+        shared.add(GENERATION_CACHE_KEY, 0, None)
+        try:
+            return shared.incr(GENERATION_CACHE_KEY)
+        except ValueError:
+            # Evicted between add and incr
+            shared.add(GENERATION_CACHE_KEY, 0, None)
+            return shared.incr(GENERATION_CACHE_KEY)
+
+    def record_load(self, since):
+        """
+        Invalidate the entries changed by a finished load and tell the other processes about it
+        :param since: Earliest validFrom or validTo written by the load
+        :return: Returns nothing
+        """
+        with self._lock:
+            generation = self._next_generation()
+            self._shared_cache().set(LOAD_CACHE_KEY.format(generation), since, LOAD_TIMEOUT)
+            # Loads numbered by other processes since the last sync
+            self._catch_up(generation - 1)
+            self._invalidate_from(since)
+            self.generation = generation
+
+    def load_generation(self):
+        """
+        Number of the last history load seen by this process, for other caches that follow the loads
+        :return: Generation
+        """
+        with self._lock:
+            self._sync()
+            return self.generation
+
+    def get(self, date, query):
+        """
+        Cached result of a point-in-time query
+        :param date: Point in time
+        :param query: Function of the minute-truncated date returning the list of rows when not cached
+        :return: List of rows
+        """
+        key = truncate_to_minute(date)
+        with self._lock:
+            self._sync()
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return list(self.entries[key][0])
+            self.misses += 1
+            generation = self.generation
+
+        rows = query(key)
+
+        size = estimate_size(rows)
+        with self._lock:
+            self._sync()
+            if self.generation == generation and size <= self.max_bytes:
+                if key in self.entries:
+                    self._evict(key)
+                self.entries[key] = (rows, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    self._evict(next(iter(self.entries)))
+        return list(rows)
+
+    def clear(self):
+        """
+        Drop every entry of this process
+        :return: Returns nothing
+        """
+        with self._lock:
+            self._invalidate_from(None)
+
+
+# Cache of SQL.get_historic_outages
+point_in_time_cache = PointInTimeCache()
@@ -0,0 +1,146 @@
+"""
+In-process index of planned outages by their outage window, for "what is out between T1 and T2" queries
+"""
+
+import threading
+from collections import namedtuple, defaultdict
+
+from .history_cache import point_in_time_cache
+from .interval_tree import IntervalTree
+from .models import CurrentPlannedOutage, HistoricPlannedOutage, ClosedHistoricPlannedOutage
+
+OutageInterval = namedtuple('OutageInterval', ['id', 'ticket_number', 'line_number', 'equipment', 'equipment_type',
+                                               'zone', 'voltage', 'start', 'end', 'open_closed'])
+
+# Field holding the ticket number of each indexed model, the current outages keep it in ticket_id, see
+# CurrentPlannedOutageManager
+TICKET_NUMBER_FIELDS = {
+    CurrentPlannedOutage: 'ticket_id',
+    HistoricPlannedOutage: 'ticket_number',
+    ClosedHistoricPlannedOutage: 'ticket_number',
+}
+
+
+def historic_querysets():
+    """
+    Querysets of the whole planned outage history, the open rows and the rows moved to the closed table
+    :return: Tuple of querysets for OutageIntervalIndex
+    """
+    return HistoricPlannedOutage.objects.all(), ClosedHistoricPlannedOutage.objects.all()
+
+
+class OutageIntervalIndex(object):
+    """
+    Interval trees over the outage windows (startTime to endTime) of the planned outages, one over all of
+    them and one per equipment, zone and voltage
+
+    The index reloads itself on the next query after a history load, following the load generation of
+    the point-in-time cache.
+    """
+
+    # Grouping of the per-group trees, named after the query keywords
+    GROUPS = ('equipment', 'zone', 'voltage')
+
+    def __init__(self, queryset=None):
+        """
+        :param queryset: CurrentPlannedOutage, HistoricPlannedOutage or ClosedHistoricPlannedOutage rows to index,
+        or a tuple of them such as historic_querysets() for the whole history, all current outages if None
+        """
+        if queryset is None:
+            querysets = ()
+        elif isinstance(queryset, (tuple, list)):
+            querysets = tuple(queryset)
+        else:
+            querysets = (queryset,)
+        for rows in querysets:
+            if rows.model not in TICKET_NUMBER_FIELDS:
+                raise ValueError('Cannot index {} rows'.format(rows.model.__name__))
+        self.querysets = querysets
+        self.generation = None
+        self._trees = None
+        self._lock = threading.Lock()
+
+    def _rows(self):
+        # Closed rows keep the id they had in the open table, so the ids stay unique across both
+        for queryset in self.querysets or (CurrentPlannedOutage.objects.all(),):
+            for row in queryset.values_list('id', TICKET_NUMBER_FIELDS[queryset.model], 'lineNumber',
+                                            'facility__equipmentName', 'facility__equipmentType', 'zone__zoneName',
+                                            'facility__voltageLevel', 'startTime', 'endTime', 'openClosed'):
+                yield row
+
+    def load(self):
+        """
+        Read the outages and build the trees
+        :return: Returns nothing, does SQL I/O
+        """
+        generation = point_in_time_cache.load_generation()
+        intervals = [(row[7], row[8], OutageInterval._make(row)) for row in self._rows()]
+
+        grouped = dict((group, defaultdict(list)) for group in self.GROUPS)
+        for interval in intervals:
+            outage = interval[2]
+            for group in self.GROUPS:
+                grouped[group][getattr(outage, group)].append(interval)
+
+        trees = {None: IntervalTree(intervals)}
+        for group in self.GROUPS:
+            trees[group] = dict((key, IntervalTree(members)) for key, members in grouped[group].items())
+        with self._lock:
+            self._trees = trees
+            self.generation = generation
+
+    def invalidate(self):
+        """
+        Forget the trees, the next query loads them again
+        :return: Returns nothing
+        """
+        with self._lock:
+            self._trees = None
+
+    def _current_trees(self):
+        with self._lock:
+            trees = self._trees
+            stale = trees is None or self.generation != point_in_time_cache.load_generation()
+        if stale:
+            self.load()
+            trees = self._trees
+        return trees
+
+    def overlapping(self, start, end, equipment=None, zone=None, voltage=None):
+        """
+        Outages whose window shares at least one point with [start, end]
+        :param start: Start of the window
+        :param end: End of the window
+        :param equipment: Optional equipment name to restrict to
+        :param zone: Optional zone name to restrict to
+        :param voltage: Optional voltage level to restrict to
+        :return: List of OutageInterval
+        """
+        trees = self._current_trees()
+        filters = dict((group, value) for group, value in zip(self.GROUPS, (equipment, zone, voltage))
+                       if value is not None)
+        if not filters:
+            return trees[None].overlapping(start, end)
+
+        # Query the tree of the first filter, check the others on its results
+        group = next(group for group in self.GROUPS if group in filters)
+        tree = trees[group].get(filters.pop(group))
+        if tree is None:
+            return []
+        return [outage for outage in tree.overlapping(start, end)
+                if all(getattr(outage, name) == value for name, value in filters.items())]
+
+    def active_at(self, point, equipment=None, zone=None, voltage=None):
+        """
+        Outages whose window contains a point in time
+        :param point: Point in time
+        :param equipment: Optional equipment name to restrict to
+        :param zone: Optional zone name to restrict to
+        :param voltage: Optional voltage level to restrict to
+        :return: List of OutageInterval
+        """
+        return self.overlapping(point, point, equipment, zone, voltage)
+
+
+# Shared index of the current planned outages
+interval_index = OutageIntervalIndex()
@@ -0,0 +1,93 @@
+"""
+Static interval tree answering overlap and stabbing queries, used by interval_index.py
+"""
+
+
+class _Node(object):
+    """
+    Node of an IntervalTree holding the intervals that contain its center
+    """
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, center, intervals, left, right):
+        self.center = center
+        self.by_start = sorted(intervals, key=lambda interval: interval[0])
+        self.by_end = sorted(intervals, key=lambda interval: interval[1], reverse=True)
+        self.left = left
+        self.right = right
+
+
+class IntervalTree(object):
+    """
+    Static centered interval tree over closed intervals
+
+    Overlap and stabbing queries take O(log n + k) for k results.
+    """
+
+    def __init__(self, intervals):
+        """
+        Build the tree
+        :param intervals: Iterable of (start, end, value) tuples with start <= end
+        """
+        intervals = list(intervals)
+        self.size = len(intervals)
+        self.root = self._build(intervals)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def _build(cls, intervals):
+        if not intervals:
+            return None
+        endpoints = sorted([interval[0] for interval in intervals] + [interval[1] for interval in intervals])
+        center = endpoints[len(endpoints) // 2]
+        left, here, right = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        return _Node(center, here, cls._build(left), cls._build(right))
+
+    def overlapping(self, start, end):
+        """
+        Intervals sharing at least one point with [start, end]
+        :param start: Start of the window
+        :param end: End of the window
+        :return: List of values
+        """
+        found = []
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            if node is None:
+                continue
+            if end < node.center:
+                # Every interval of the node ends at or after the center, only the starts need checking
+                for interval in node.by_start:
+                    if interval[0] > end:
+                        break
+                    found.append(interval[2])
+                pending.append(node.left)
+            elif start > node.center:
+                for interval in node.by_end:
+                    if interval[1] < start:
+                        break
+                    found.append(interval[2])
+                pending.append(node.right)
+            else:
+                found.extend(interval[2] for interval in node.by_start)
+                pending.append(node.left)
+                pending.append(node.right)
+        return found
+
+    def stabbing(self, point):
+        """
+        Intervals containing a point
+        :param point: Point in time
+        :return: List of values
+        """
+        return self.overlapping(point, point)
@@ -0,0 +1,67 @@
+"""
+Loads a parsed outage file into the current tables and brings the history tables in line with it
+"""
+
+from django.db import transaction
+
+from .dimensions import dimension_cache
+from .models import CurrentTicket, CurrentPlannedOutage
+from .outage_parser.outage_parser import ParsingException
+
+
+def _current_ticket(ticket, mod_date):
+    """
+    Helper function to build the CurrentTicket row of a parsed ticket
+    :param ticket: Parsed Ticket object
+    :param mod_date: Modification date of the file, the validFrom of the row
+    :return: Unsaved CurrentTicket
+    """
+    try:
+        outage_type = ticket.outage_type
+    except ParsingException:
+        outage_type = ''
+    # Keyed by the ticket number, which the current outages keep in ticket_id
+    return CurrentTicket(id=ticket.number, ticket_number=ticket.number, status=ticket.current_status,
+                         lastRevised=ticket.last_revised, outageType=outage_type, approvalRisk=ticket.approval_risk,
+                         availability=ticket.availability, rtepNumber=ticket.rtep,
+                         previousStatus=ticket.previous_status, validFrom=mod_date)
+
+
+def load_outage_file(outage_parser, mod_date, delta=False, dimensions=None):
+    """
+    Replace the current tickets and outages with those of a parsed file and update the history tables
+
+    The zone, station and facility keys of the outages come from a DimensionCache, so only names that were
+    never seen before cost a query.
+
+    :param outage_parser: OutageParser of the file
+    :param mod_date: Modification date of the file, used for the validFrom and validTo columns
+    :param delta: Only write the history rows that changed, see HistoricPlannedOutageManager.apply_delta
+    :param dimensions: DimensionCache, the cache shared by the process if None
+    :return: Tuple of (number of tickets, number of outages) loaded
+    """
+    dimensions = dimensions or dimension_cache
+    tickets = list(outage_parser.tickets)
+    try:
+        dimensions.prime(outage for ticket in tickets for outage in ticket.outages)
+        with transaction.atomic():
+            CurrentPlannedOutage.objects.delete_current_outages()
+            CurrentTicket.objects.all().delete()
+            CurrentTicket.objects.insert_tickets([_current_ticket(ticket, mod_date) for ticket in tickets], mod_date)
+
+            outages = []
+            for ticket in tickets:
+                for line_number, outage in enumerate(ticket.outages, 1):
+                    zone_id, station_id, facility_id = dimensions.resolve(outage)
+                    # The current outages keep the ticket number in ticket_id, see CurrentPlannedOutageManager
+                    outages.append(CurrentPlannedOutage(
+                        ticket_id=ticket.number, ticket_number=ticket.number, lineNumber=line_number,
+                        zone_id=zone_id, station_id=station_id, facility_id=facility_id,
+                        startTime=outage.start_time, endTime=outage.end_time, openClosed=outage.open_closed,
+                        validFrom=mod_date))
+            CurrentPlannedOutage.objects.insert_outages(outages, mod_date, delta)
+    except Exception:
+        # Rows inserted by prime within a transaction that rolled back are gone, their cached ids with them
+        dimensions.invalidate()
+        raise
+    return len(tickets), len(outages)
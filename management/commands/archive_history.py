@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...history_archive import archive_closed_history
+
+
+class Command(BaseCommand):
+    """
+    Archive the closed planned outage history month by month, meant to run monthly from cron:
+
+        python manage.py archive_history --before 2016-01 --directory /var/lib/outages/archive
+    """
+    help = 'Move the closed history rows that stopped being valid before --before to gzip CSV files in --directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='First month to keep in the database as YYYY-MM')
+        parser.add_argument('--directory', required=True, help='Directory of the monthly archive files')
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.strptime(options['before'], '%Y-%m')
+        except ValueError:
+            raise CommandError('--before must look like 2016-01')
+        now = timezone.now()
+        if timezone.is_aware(now):
+            before = timezone.make_aware(before)
+        if before > now:
+            raise CommandError('--before must not be a month that has not started yet')
+
+        archived = archive_closed_history(options['directory'], before)
+        for month, outages, tickets in archived:
+            self.stdout.write('{}: archived {} outages and {} tickets'.format(month, outages, tickets))
+        if not archived:
+            self.stdout.write('Nothing to archive before {}'.format(options['before']))
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...models import HistoryCheckpoint
+
+
+class Command(BaseCommand):
+    """
+    Checkpoint the planned outage history, meant to run daily from cron:
+
+        python manage.py write_history_checkpoint
+    """
+    help = 'Store the planned outage history rows valid now, or at --time, as a checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--time', help='Point in time of the checkpoint as YYYY-MM-DD HH:MM, now by default')
+
+    def handle(self, *args, **options):
+        if options['time']:
+            try:
+                checkpoint_time = datetime.strptime(options['time'], '%Y-%m-%d %H:%M')
+            except ValueError:
+                raise CommandError('--time must look like 2015-07-01 08:00')
+            if timezone.is_aware(timezone.now()):
+                checkpoint_time = timezone.make_aware(checkpoint_time)
+        else:
+            checkpoint_time = timezone.now()
+
+        if HistoryCheckpoint.objects.filter(checkpointTime=checkpoint_time.replace(second=0, microsecond=0)).exists():
+            raise CommandError('A checkpoint at {} already exists'.format(checkpoint_time))
+        checkpoint = HistoryCheckpoint.objects.write(checkpoint_time)
+        self.stdout.write('Wrote checkpoint {} with {} outages'.format(
+            checkpoint.checkpointTime, checkpoint.historycheckpointoutage_set.count()))
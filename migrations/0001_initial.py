@@ -0,0 +1,150 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    Tables of the current and history outage models as they were before the history indexes
+    """
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentPlannedOutage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_number', models.IntegerField()),
+                ('lineNumber', models.IntegerField()),
+                ('startTime', models.DateTimeField()),
+                ('endTime', models.DateTimeField()),
+                ('openClosed', models.CharField(max_length=1)),
+                ('validFrom', models.DateTimeField()),
+                ('validTo', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CurrentTicket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_number', models.IntegerField()),
+                ('status', models.CharField(max_length=9)),
+                ('lastRevised', models.DateTimeField(null=True)),
+                ('outageType', models.CharField(max_length=27)),
+                ('approvalRisk', models.CharField(max_length=8)),
+                ('availability', models.CharField(max_length=9)),
+                ('rtepNumber', models.CharField(max_length=9)),
+                ('previousStatus', models.CharField(max_length=11)),
+                ('validFrom', models.DateTimeField()),
+                ('validTo', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Equipment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipmentName', models.CharField(max_length=32, unique=True)),
+                ('equipmentType', models.CharField(max_length=4)),
+                ('voltageLevel', models.IntegerField()),
+                ('voltageMeasurementUnit', models.CharField(max_length=8)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistoricPlannedOutage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_number', models.IntegerField()),
+                ('lineNumber', models.IntegerField()),
+                ('startTime', models.DateTimeField()),
+                ('endTime', models.DateTimeField()),
+                ('openClosed', models.CharField(max_length=1)),
+                ('validFrom', models.DateTimeField()),
+                ('validTo', models.DateTimeField(null=True)),
+                ('currentStatus', models.CharField(max_length=1)),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Equipment')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistoricTicket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_number', models.IntegerField()),
+                ('status', models.CharField(max_length=9)),
+                ('lastRevised', models.DateTimeField(null=True)),
+                ('outageType', models.CharField(max_length=27)),
+                ('approvalRisk', models.CharField(max_length=8)),
+                ('availability', models.CharField(max_length=9)),
+                ('rtepNumber', models.CharField(max_length=9)),
+                ('previousStatus', models.CharField(max_length=11)),
+                ('validFrom', models.DateTimeField()),
+                ('validTo', models.DateTimeField(null=True)),
+                ('currentStatus', models.CharField(max_length=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutageCauses',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_number', models.IntegerField()),
+                ('cause', models.CharField(max_length=78, unique=True)),
+                ('ticket', models.ManyToManyField(to='outages.CurrentTicket')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Station',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stationName', models.CharField(max_length=8, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoneName', models.CharField(max_length=8, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='historicplannedoutage',
+            name='station',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Station'),
+        ),
+        migrations.AddField(
+            model_name='historicplannedoutage',
+            name='ticket',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.HistoricTicket'),
+        ),
+        migrations.AddField(
+            model_name='historicplannedoutage',
+            name='zone',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Zone'),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='station',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Station'),
+        ),
+        migrations.AddField(
+            model_name='currentplannedoutage',
+            name='facility',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Equipment'),
+        ),
+        migrations.AddField(
+            model_name='currentplannedoutage',
+            name='station',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Station'),
+        ),
+        migrations.AddField(
+            model_name='currentplannedoutage',
+            name='ticket',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.CurrentTicket'),
+        ),
+        migrations.AddField(
+            model_name='currentplannedoutage',
+            name='zone',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Zone'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# (table, index name, columns, partial on currentStatus = 'Y')
+HISTORY_INDEXES = [
+    ('outages_historicplannedoutage', 'outages_hpo_match_idx', ['ticket_number', 'facility_id', 'lineNumber'], False),
+    ('outages_historicplannedoutage', 'outages_hpo_ticket_match_idx', ['ticket_id', 'facility_id', 'lineNumber'],
+     False),
+    ('outages_historicplannedoutage', 'outages_hpo_valid_idx', ['validFrom', 'validTo'], False),
+    ('outages_historicplannedoutage', 'outages_hpo_open_match_idx', ['ticket_number', 'facility_id', 'lineNumber'],
+     True),
+    ('outages_historicticket', 'outages_ht_match_idx', ['ticket_number'], False),
+    ('outages_historicticket', 'outages_ht_valid_idx', ['validFrom', 'validTo'], False),
+    ('outages_historicticket', 'outages_ht_open_match_idx', ['ticket_number'], True),
+    ('outages_currentplannedoutage', 'outages_cpo_match_idx', ['ticket_id', 'facility_id', 'lineNumber'], False),
+    ('outages_currentticket', 'outages_ct_match_idx', ['ticket_number'], False),
+]
+
+# Backends that support CREATE INDEX ... WHERE
+PARTIAL_INDEX_VENDORS = ('postgresql', 'sqlite')
+
+
+def create_history_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+    for table, name, columns, partial in HISTORY_INDEXES:
+        if partial and vendor not in PARTIAL_INDEX_VENDORS:
+            continue  # The full composite index on the same columns covers these lookups
+        sql = 'CREATE INDEX {} ON {} ({})'.format(quote(name), quote(table), ', '.join(quote(c) for c in columns))
+        if partial:
+            sql += " WHERE {} = 'Y'".format(quote('currentStatus'))
+        schema_editor.execute(sql)
+
+
+def drop_history_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+    for table, name, columns, partial in HISTORY_INDEXES:
+        if partial and vendor not in PARTIAL_INDEX_VENDORS:
+            continue
+        if vendor == 'mysql':
+            schema_editor.execute('DROP INDEX {} ON {}'.format(quote(name), quote(table)))
+        else:
+            schema_editor.execute('DROP INDEX {}'.format(quote(name)))
+
+
+class Migration(migrations.Migration):
+    """
+    Composite indexes on the history match keys and validity columns, plus partial indexes on the open
+    (currentStatus = 'Y') rows where the backend supports them
+    """
+
+    dependencies = [
+        ('outages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_history_indexes, drop_history_indexes),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# (table, index name, columns)
+WINDOW_INDEXES = [
+    ('outages_historicplannedoutage', 'outages_hpo_window_idx', ['endTime', 'startTime']),
+]
+
+
+def create_window_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    for table, name, columns in WINDOW_INDEXES:
+        schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(
+            quote(name), quote(table), ', '.join(quote(c) for c in columns)))
+
+
+def drop_window_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    for table, name, columns in WINDOW_INDEXES:
+        if schema_editor.connection.vendor == 'mysql':
+            schema_editor.execute('DROP INDEX {} ON {}'.format(quote(name), quote(table)))
+        else:
+            schema_editor.execute('DROP INDEX {}'.format(quote(name)))
+
+
+class Migration(migrations.Migration):
+    """
+    Index on the outage window of the planned outage history, used by the as of / active at queries
+    """
+
+    dependencies = [
+        ('outages', '0002_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_window_indexes, drop_window_indexes),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    Checkpoint tables holding the planned outage history rows valid at a point in time
+    """
+
+    dependencies = [
+        ('outages', '0003_outage_window_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpointTime', models.DateTimeField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistoryCheckpointOutage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                 to='outages.HistoryCheckpoint')),
+                ('outage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                             to='outages.HistoricPlannedOutage')),
+            ],
+        ),
+    ]
@@ -0,0 +1,124 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+OUTAGE_COLUMNS = ['id', 'ticket_id', 'ticket_number', 'facility_id', 'lineNumber', 'zone_id', 'station_id',
+                  'startTime', 'endTime', 'openClosed', 'validFrom', 'validTo', 'currentStatus']
+TICKET_COLUMNS = ['id', 'ticket_number', 'status', 'lastRevised', 'outageType', 'approvalRisk', 'availability',
+                  'rtepNumber', 'previousStatus', 'validFrom', 'validTo', 'currentStatus']
+
+# (open table, closed table, columns, view over both or None)
+HISTORY_TABLES = [
+    ('outages_historicplannedoutage', 'outages_closedhistoricplannedoutage', OUTAGE_COLUMNS,
+     'outages_allhistoricplannedoutage'),
+    ('outages_historicticket', 'outages_closedhistoricticket', TICKET_COLUMNS, None),
+]
+
+# (table, index name, columns), the indexes of the planned outage history used by the point-in-time queries, the
+# closed tickets are only read by id
+CLOSED_HISTORY_INDEXES = [
+    ('outages_closedhistoricplannedoutage', 'outages_chpo_ticket_match_idx',
+     ['ticket_id', 'facility_id', 'lineNumber']),
+    ('outages_closedhistoricplannedoutage', 'outages_chpo_valid_idx', ['validFrom', 'validTo']),
+    ('outages_closedhistoricplannedoutage', 'outages_chpo_window_idx', ['endTime', 'startTime']),
+]
+
+
+def _move_rows(schema_editor, source, target, columns, condition):
+    quote = schema_editor.quote_name
+    column_list = ', '.join(quote(c) for c in columns)
+    schema_editor.execute('INSERT INTO {} ({}) SELECT {} FROM {} WHERE {}'.format(
+        quote(target), column_list, column_list, quote(source), condition))
+    schema_editor.execute('DELETE FROM {} WHERE {}'.format(quote(source), condition))
+
+
+def _closed_ticket_condition(schema_editor):
+    quote = schema_editor.quote_name
+    return "{status} = 'N' AND NOT EXISTS(SELECT * FROM {outages} WHERE {outages}.{ticket_id} = {tickets}.{id})".format(
+        status=quote('currentStatus'), outages=quote('outages_historicplannedoutage'), ticket_id=quote('ticket_id'),
+        tickets=quote('outages_historicticket'), id=quote('id'))
+
+
+def split_closed_history(apps, schema_editor):
+    quote = schema_editor.quote_name
+    for table, name, columns in CLOSED_HISTORY_INDEXES:
+        schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(
+            quote(name), quote(table), ', '.join(quote(c) for c in columns)))
+
+    _move_rows(schema_editor, 'outages_historicplannedoutage', 'outages_closedhistoricplannedoutage', OUTAGE_COLUMNS,
+               "{} = 'N'".format(quote('currentStatus')))
+    _move_rows(schema_editor, 'outages_historicticket', 'outages_closedhistoricticket', TICKET_COLUMNS,
+               _closed_ticket_condition(schema_editor))
+
+    for open_table, closed_table, columns, view in HISTORY_TABLES:
+        if view is not None:
+            column_list = ', '.join(quote(c) for c in columns)
+            schema_editor.execute('CREATE VIEW {} AS SELECT {} FROM {} UNION ALL SELECT {} FROM {}'.format(
+                quote(view), column_list, quote(open_table), column_list, quote(closed_table)))
+
+
+def merge_closed_history(apps, schema_editor):
+    quote = schema_editor.quote_name
+    # Tickets first, the open outages reference them
+    for open_table, closed_table, columns, view in reversed(HISTORY_TABLES):
+        if view is not None:
+            schema_editor.execute('DROP VIEW {}'.format(quote(view)))
+        column_list = ', '.join(quote(c) for c in columns)
+        schema_editor.execute('INSERT INTO {} ({}) SELECT {} FROM {}'.format(
+            quote(open_table), column_list, column_list, quote(closed_table)))
+        schema_editor.execute('DELETE FROM {}'.format(quote(closed_table)))
+
+
+class Migration(migrations.Migration):
+    """
+    Closed history tables next to the open ones, with the closed rows moved over, and a view over both planned
+    outage history tables that the point-in-time queries read
+    """
+
+    dependencies = [
+        ('outages', '0004_history_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedHistoricTicket',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('ticket_number', models.IntegerField()),
+                ('status', models.CharField(max_length=9)),
+                ('lastRevised', models.DateTimeField(null=True)),
+                ('outageType', models.CharField(max_length=27)),
+                ('approvalRisk', models.CharField(max_length=8)),
+                ('availability', models.CharField(max_length=9)),
+                ('rtepNumber', models.CharField(max_length=9)),
+                ('previousStatus', models.CharField(max_length=11)),
+                ('validFrom', models.DateTimeField()),
+                ('validTo', models.DateTimeField(null=True)),
+                ('currentStatus', models.CharField(max_length=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClosedHistoricPlannedOutage',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('ticket_id', models.IntegerField()),
+                ('ticket_number', models.IntegerField()),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Equipment')),
+                ('lineNumber', models.IntegerField()),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Zone')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='outages.Station')),
+                ('startTime', models.DateTimeField()),
+                ('endTime', models.DateTimeField()),
+                ('openClosed', models.CharField(max_length=1)),
+                ('validFrom', models.DateTimeField()),
+                ('validTo', models.DateTimeField(null=True)),
+                ('currentStatus', models.CharField(max_length=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='historycheckpointoutage',
+            name='outage',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING,
+                                    to='outages.HistoricPlannedOutage'),
+        ),
+        migrations.RunPython(split_closed_history, merge_closed_history),
+    ]
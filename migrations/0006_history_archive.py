@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Runs of the history archive, the point-in-time queries refuse dates whose closed rows were archived
+    """
+
+    dependencies = [
+        ('outages', '0005_closed_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivedBefore', models.DateTimeField(unique=True)),
+                ('directory', models.CharField(max_length=255)),
+            ],
+        ),
+    ]
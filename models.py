@@ -1,5 +1,51 @@
+from datetime import datetime
+
+from django.conf import settings
 from django.db import models
 from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+
+from .history_cache import point_in_time_cache
+
+# Largest number of ids sent in a single IN clause, sqlite allows 999 parameters per statement
+ID_BATCH_SIZE = 500
+
+# Formats of the dates written and compared by the history statements
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def _stored_date(value, date_format=DATETIME_FORMAT):
+    """
+    Helper function to put a date in the form the history tables store it, so a date read back from the
+    database and one from a parsed file compare equal when they are the same point in time, and a date
+    formatted into a statement is the same point in time as the stored ones it is compared with
+    :param value: Datetime, aware or naive in the default time zone, or a date string as sqlite returns it
+    :param date_format: DATETIME_FORMAT or DATE_FORMAT
+    :return: String in date_format, in UTC when USE_TZ is set
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        # Read back as stored, sqlite returns some dates as strings
+        return datetime.strptime(str(value)[:19], DATETIME_FORMAT).strftime(date_format)
+    if settings.USE_TZ:
+        # Django saves naive dates as being in the default time zone
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.get_default_timezone())
+        value = timezone.make_naive(value, timezone.utc)
+    return value.strftime(date_format)
+
+
+def _load_start(rows, mod_date):
+    """
+    Helper function to find the earliest point in time a load writes to the history tables
+    :param rows: CurrentPlannedOutage or CurrentTicket objects of the load
+    :param mod_date: Modification date of the load
+    :return: Earliest of mod_date and the validFrom of the rows
+    """
+    return min([mod_date] + [row.validFrom for row in rows if row.validFrom is not None])
 
 
 class CurrentPlannedOutageManager(models.Manager):
@@ -7,19 +53,31 @@ class CurrentPlannedOutageManager(models.Manager):
     Helper class that defines logic for dealing out outages
     """
 
-    def insert_outages(self, planned_outages, mod_date):
+    def insert_outages(self, planned_outages, mod_date, delta=False):
         """
         Insert outages into database and updates the history table to reflect
         changes.
         :param planned_outages: List of outage objects from Django
         :param mod_date: Date used for validFrom column--modification date
+        :param delta: Only write the history rows that changed, see HistoricPlannedOutageManager.apply_delta
         :return: Returns nothing, does SQL I/O
         """
+        if delta:
+            with transaction.atomic():
+                CurrentPlannedOutage.objects.bulk_create(planned_outages)
+                HistoricPlannedOutage.objects.apply_delta(planned_outages, mod_date)
+                HistoricPlannedOutage.objects.move_closed()
+                HistoricTicket.objects.move_closed()
+            return
+
         CurrentPlannedOutage.objects.bulk_create(planned_outages)
         HistoricPlannedOutage.objects.update_removed(mod_date)
         HistoricPlannedOutage.objects.update_changed(mod_date)
         HistoricPlannedOutage.objects.insert_changed()
         HistoricPlannedOutage.objects.insert_new()
+        HistoricPlannedOutage.objects.record_load(_load_start(planned_outages, mod_date))
+        HistoricPlannedOutage.objects.move_closed()
+        HistoricTicket.objects.move_closed()
 
     def delete_current_outages(self):
         """
@@ -35,6 +93,65 @@ class HistoricPlannedOutageManager(models.Manager):
     history table
     """
 
+    def record_load(self, since):
+        """
+        Drop the checkpoints the load changed and bump the load generation of the point-in-time cache once
+        the load is committed
+
+        :param since: Earliest validFrom or validTo written by the load
+        :return: Returns nothing
+        """
+        # Checkpoints after the earliest change no longer hold the rows valid at their time
+        HistoryCheckpoint.objects.filter(checkpointTime__gt=since).delete()
+        transaction.on_commit(lambda: point_in_time_cache.record_load(since))
+
+    def apply_delta(self, planned_outages, mod_date):
+        """
+        Bring the history table in line with the most recent outage file by writing only the changes
+
+        The open history rows are read once and merged with the new outages on
+        (ticket number, facility, line number); removed and changed rows are closed and new and changed
+        rows inserted, all in one transaction. Tickets must be loaded first so the open HistoricTicket
+        of each outage can be referenced.
+
+        :param planned_outages: List of CurrentPlannedOutage objects, ticket_id holds the ticket number
+        :param mod_date: Date used for validTo column of closed rows--modification date
+        :return: Tuple of (number of closed rows, number of inserted rows), nothing is written when both are 0
+        """
+        with transaction.atomic():
+            open_rows = {}
+            for row in HistoricPlannedOutage.objects.filter(currentStatus='Y').values_list(
+                    'id', 'ticket_number', 'facility_id', 'lineNumber', 'startTime', 'endTime', 'openClosed'):
+                open_rows[row[1:4]] = (row[0], _stored_date(row[4]), _stored_date(row[5]), row[6])
+
+            closed_ids = []
+            new_outages = []
+            for outage in planned_outages:
+                row = open_rows.pop((outage.ticket_id, outage.facility_id, outage.lineNumber), None)
+                if row is None:
+                    new_outages.append(outage)
+                elif row[1:] != (_stored_date(outage.startTime), _stored_date(outage.endTime), outage.openClosed):
+                    closed_ids.append(row[0])
+                    new_outages.append(outage)
+            closed_ids.extend(row[0] for row in open_rows.values())
+
+            ticket_ids = dict(HistoricTicket.objects.filter(currentStatus='Y').values_list('ticket_number', 'id'))
+            history = [HistoricPlannedOutage(ticket_id=ticket_ids.get(outage.ticket_id),
+                                             ticket_number=outage.ticket_id, lineNumber=outage.lineNumber,
+                                             zone_id=outage.zone_id, station_id=outage.station_id,
+                                             facility_id=outage.facility_id, startTime=outage.startTime,
+                                             endTime=outage.endTime, openClosed=outage.openClosed,
+                                             validFrom=outage.validFrom, validTo=outage.validTo, currentStatus='Y')
+                       for outage in new_outages]
+
+            for start in range(0, len(closed_ids), ID_BATCH_SIZE):
+                HistoricPlannedOutage.objects.filter(id__in=closed_ids[start:start + ID_BATCH_SIZE]).update(
+                    validTo=mod_date, currentStatus='N')
+            HistoricPlannedOutage.objects.bulk_create(history)
+            if closed_ids or history:
+                self.record_load(_load_start(new_outages, mod_date))
+            return len(closed_ids), len(history)
+
     def update_removed(self, mod_date):
         """
         Invalidates outages that have been removed from the most recent outage file
@@ -43,13 +160,13 @@ class HistoricPlannedOutageManager(models.Manager):
         :return: Returns nothing, does SQL I/O
         """
         c = connection.cursor()
-        mod_date = mod_date.strftime("%Y-%m-%d %H:%M:%S")
+        mod_date = _stored_date(mod_date)
         sql = """
         UPDATE outages_historicplannedoutage
         SET validTo = '{}', currentStatus = 'N'
-        WHERE NOT EXISTS(SELECT * FROM outages_currentplannedoutage
-                          WHERE outages_historicplannedoutage.currentStatus LIKE 'Y'
-                          AND outages_historicplannedoutage.ticket_number = outages_currentplannedoutage.ticket_id
+        WHERE outages_historicplannedoutage.currentStatus = 'Y'
+          AND NOT EXISTS(SELECT * FROM outages_currentplannedoutage
+                          WHERE outages_historicplannedoutage.ticket_number = outages_currentplannedoutage.ticket_id
                           AND outages_historicplannedoutage.facility_id = outages_currentplannedoutage.facility_id
                           AND outages_currentplannedoutage.lineNumber = outages_historicplannedoutage.lineNumber);""".format(
             mod_date)
@@ -63,11 +180,11 @@ class HistoricPlannedOutageManager(models.Manager):
         :return: Returns nothing, does SQL I/O
         """
         c = connection.cursor()
-        mod_date = mod_date.strftime("%Y-%m-%d %H:%M:%S")
+        mod_date = _stored_date(mod_date)
         sql = """UPDATE outages_historicplannedoutage
         SET validTo = '{}', currentStatus = 'N'
         WHERE EXISTS(SELECT * FROM outages_currentplannedoutage
-              WHERE outages_historicplannedoutage.currentStatus LIKE 'Y'
+              WHERE outages_historicplannedoutage.currentStatus = 'Y'
                 AND outages_historicplannedoutage.ticket_number = outages_currentplannedoutage.ticket_id
                 AND outages_historicplannedoutage.facility_id = outages_currentplannedoutage.facility_id
                 AND outages_currentplannedoutage.lineNumber = outages_historicplannedoutage.lineNumber
@@ -77,6 +194,25 @@ class HistoricPlannedOutageManager(models.Manager):
             mod_date)
         c.execute(sql)
 
+    def move_closed(self):
+        """
+        Moves the closed rows to the closed history table, keeping their ids, so the load statements
+        only work on the open rows
+
+        :return: Returns nothing, does SQL I/O
+        """
+        with transaction.atomic():
+            c = connection.cursor()
+            c.execute("""
+            INSERT INTO outages_closedhistoricplannedoutage
+            (id, ticket_id, ticket_number, facility_id, lineNumber, zone_id, station_id, startTime, endTime,
+            openClosed, validFrom, validTo, currentStatus)
+            SELECT id, ticket_id, ticket_number, facility_id, lineNumber, zone_id, station_id, startTime, endTime,
+            openClosed, validFrom, validTo, currentStatus
+            FROM outages_historicplannedoutage
+            WHERE currentStatus = 'N';""")
+            c.execute("DELETE FROM outages_historicplannedoutage WHERE currentStatus = 'N';")
+
     def insert_changed(self):
         """
         Inserts new outage entry to replace previously invalidated ticket entry
@@ -96,7 +232,7 @@ class HistoricPlannedOutageManager(models.Manager):
           LEFT JOIN outages_historicticket
             ON outages_historicticket.ticket_number = outages_currentplannedoutage.ticket_id
         WHERE EXISTS(SELECT * FROM outages_historicplannedoutage
-              WHERE outages_historicplannedoutage.currentStatus LIKE 'Y'
+              WHERE outages_historicplannedoutage.currentStatus = 'Y'
               AND outages_historicplannedoutage.ticket_number = outages_currentplannedoutage.ticket_id
               AND outages_historicplannedoutage.facility_id = outages_currentplannedoutage.facility_id
               AND outages_currentplannedoutage.lineNumber = outages_historicplannedoutage.lineNumber
@@ -124,7 +260,7 @@ class HistoricPlannedOutageManager(models.Manager):
             ON outages_historicticket.ticket_number = outages_currentplannedoutage.ticket_id
             WHERE NOT EXISTS(SELECT *
                    FROM outages_historicplannedoutage
-                   WHERE outages_historicplannedoutage.currentStatus LIKE 'Y'
+                   WHERE outages_historicplannedoutage.currentStatus = 'Y'
                          AND outages_currentplannedoutage.ticket_id = outages_historicplannedoutage.ticket_number
                          AND outages_currentplannedoutage.facility_id = outages_historicplannedoutage.facility_id
                          AND outages_currentplannedoutage.lineNumber = outages_historicplannedoutage.lineNumber);"""
@@ -150,6 +286,8 @@ class CurrentTicketManager(models.Manager):
         HistoricTicket.objects.update_changed(mod_date)
         HistoricTicket.objects.insert_changed()
         HistoricTicket.objects.insert_new()
+        # The point-in-time queries join the ticket history too
+        HistoricPlannedOutage.objects.record_load(_load_start(tickets, mod_date))
 
 
 class HistoricTicketManager(models.Manager):
@@ -165,13 +303,13 @@ class HistoricTicketManager(models.Manager):
         :return: Returns nothing, does database I/O
         """
         c = connection.cursor()
-        mod_date = mod_date.strftime("%Y-%m-%d %H:%M:%S")
+        mod_date = _stored_date(mod_date)
         sql = """
         UPDATE outages_historicticket
         SET validTo = '{}', currentStatus = 'N'
-        WHERE NOT EXISTS(SELECT * FROM outages_currentticket
-                          WHERE outages_historicticket.currentStatus LIKE 'Y'
-                          AND outages_historicticket.ticket_number = outages_currentticket.ticket_number);""".format(
+        WHERE outages_historicticket.currentStatus = 'Y'
+          AND NOT EXISTS(SELECT * FROM outages_currentticket
+                          WHERE outages_historicticket.ticket_number = outages_currentticket.ticket_number);""".format(
             mod_date)
         c.execute(sql)
 
@@ -183,11 +321,11 @@ class HistoricTicketManager(models.Manager):
         :return:
         """
         c = connection.cursor()
-        mod_date = mod_date.strftime("%Y-%m-%d %H:%M:%S")
+        mod_date = _stored_date(mod_date)
         sql = """UPDATE outages_historicticket
           SET validTo = '{}', currentStatus = 'N'
           WHERE EXISTS(SELECT * FROM outages_currentticket
-                WHERE outages_historicticket.currentStatus LIKE 'Y'
+                WHERE outages_historicticket.currentStatus = 'Y'
                   AND outages_historicticket.ticket_number = outages_currentticket.ticket_number
                   AND (outages_historicticket.status != outages_currentticket.status
                     OR outages_historicticket.lastRevised != outages_currentticket.lastRevised
@@ -199,6 +337,27 @@ class HistoricTicketManager(models.Manager):
             mod_date)
         c.execute(sql)
 
+    def move_closed(self):
+        """
+        Moves the closed tickets that no open outage references to the closed history table, keeping their ids
+
+        :return: Returns nothing, does SQL I/O
+        """
+        condition = """
+            WHERE currentStatus = 'N'
+              AND NOT EXISTS(SELECT * FROM outages_historicplannedoutage
+                             WHERE outages_historicplannedoutage.ticket_id = outages_historicticket.id);"""
+        with transaction.atomic():
+            c = connection.cursor()
+            c.execute("""
+            INSERT INTO outages_closedhistoricticket
+            (id, ticket_number, status, lastRevised, outageType, approvalRisk, availability, rtepNumber,
+            previousStatus, validFrom, validTo, currentStatus)
+            SELECT id, ticket_number, status, lastRevised, outageType, approvalRisk, availability, rtepNumber,
+            previousStatus, validFrom, validTo, currentStatus
+            FROM outages_historicticket""" + condition)
+            c.execute("DELETE FROM outages_historicticket" + condition)
+
     def insert_changed(self):
         """
         Inserts new ticket entry to replace previously invalided entry
@@ -214,7 +373,7 @@ class HistoricTicketManager(models.Manager):
         validTo, 'Y'
         FROM outages_currentticket
         WHERE EXISTS(SELECT * FROM outages_historicticket
-              WHERE outages_historicticket.currentStatus LIKE 'Y'
+              WHERE outages_historicticket.currentStatus = 'Y'
               AND outages_historicticket.ticket_number = outages_currentticket.ticket_number
               AND (outages_historicticket.status != outages_currentticket.status
                       OR outages_historicticket.lastRevised != outages_currentticket.lastRevised
@@ -240,11 +399,60 @@ class HistoricTicketManager(models.Manager):
         validTo, 'Y'
         FROM outages_currentticket
         WHERE NOT EXISTS(SELECT * FROM outages_historicticket
-              WHERE outages_historicticket.currentStatus LIKE 'Y'
+              WHERE outages_historicticket.currentStatus = 'Y'
                 AND outages_historicticket.ticket_number = outages_currentticket.ticket_number);"""
         c.execute(sql)
 
 
+class HistoryCheckpointManager(models.Manager):
+    """
+    Helper class to write and find the checkpoints of the planned outage history
+    """
+
+    def write(self, checkpoint_time):
+        """
+        Store the ids of the history rows valid at a point in time
+
+        :param checkpoint_time: Point in time of the checkpoint, truncated to the minute like the queries
+        :return: The new HistoryCheckpoint
+        """
+        checkpoint_time = checkpoint_time.replace(second=0, microsecond=0)
+        date = _stored_date(checkpoint_time, DATE_FORMAT)
+        with transaction.atomic():
+            checkpoint = self.create(checkpointTime=checkpoint_time)
+            c = connection.cursor()
+            sql = """
+            INSERT INTO outages_historycheckpointoutage (checkpoint_id, outage_id)
+            SELECT %s, id FROM outages_allhistoricplannedoutage
+            WHERE validFrom < %s AND (%s < validTo OR validTo IS NULL);"""
+            c.execute(sql, [checkpoint.id, date, date])
+        return checkpoint
+
+    def nearest(self, date):
+        """
+        Latest checkpoint at or before a point in time
+
+        :param date: Point in time
+        :return: HistoryCheckpoint or None
+        """
+        return self.filter(checkpointTime__lte=date.replace(second=0, microsecond=0)).order_by(
+            '-checkpointTime').first()
+
+
+class HistoryArchiveManager(models.Manager):
+    """
+    Helper class to find how far the closed history has been archived
+    """
+
+    def archived_before(self):
+        """
+        Start of the first month whose closed history rows are still in the database
+
+        :return: Datetime, None if nothing was archived
+        """
+        return self.aggregate(before=models.Max('archivedBefore'))['before']
+
+
 class CurrentTicket(models.Model):
     """
     Class to define CurrentTicket entity
@@ -349,3 +557,68 @@ class HistoricPlannedOutage(models.Model):
     validTo = models.DateTimeField(null=True)
     currentStatus = models.CharField(max_length=1)
     objects = HistoricPlannedOutageManager()
+
+
+class ClosedHistoricTicket(models.Model):
+    """
+    Class to define the closed rows of the CurrentTicket history table, moved out by HistoricTicketManager
+    """
+    id = models.IntegerField(primary_key=True)
+    ticket_number = models.IntegerField()
+    status = models.CharField(max_length=9)
+    lastRevised = models.DateTimeField(null=True)
+    outageType = models.CharField(max_length=27)
+    approvalRisk = models.CharField(max_length=8)
+    availability = models.CharField(max_length=9)
+    rtepNumber = models.CharField(max_length=9)
+    previousStatus = models.CharField(max_length=11)
+    validFrom = models.DateTimeField()
+    validTo = models.DateTimeField(null=True)
+    currentStatus = models.CharField(max_length=1)
+
+
+class ClosedHistoricPlannedOutage(models.Model):
+    """
+    Class to define the closed rows of the CurrentOutage history table, moved out by HistoricPlannedOutageManager
+    """
+    id = models.IntegerField(primary_key=True)
+    # Id of a HistoricTicket or ClosedHistoricTicket
+    ticket_id = models.IntegerField()
+    ticket_number = models.IntegerField()
+    facility = models.ForeignKey(Equipment)
+    lineNumber = models.IntegerField()
+    zone = models.ForeignKey(Zone)
+    station = models.ForeignKey(Station)
+    startTime = models.DateTimeField()
+    endTime = models.DateTimeField()
+    openClosed = models.CharField(max_length=1)
+    validFrom = models.DateTimeField()
+    validTo = models.DateTimeField(null=True)
+    currentStatus = models.CharField(max_length=1)
+
+
+class HistoryCheckpoint(models.Model):
+    """
+    Class to define a checkpoint of the planned outage history
+    """
+    checkpointTime = models.DateTimeField(unique=True)
+    objects = HistoryCheckpointManager()
+
+
+class HistoryCheckpointOutage(models.Model):
+    """
+    Class to define the history rows valid at a checkpoint
+    """
+    checkpoint = models.ForeignKey(HistoryCheckpoint)
+    # Without a database constraint, closed rows move on to ClosedHistoricPlannedOutage under the same id
+    outage = models.ForeignKey(HistoricPlannedOutage, on_delete=models.DO_NOTHING, db_constraint=False)
+
+
+class HistoryArchive(models.Model):
+    """
+    Class to define a run of the history archive, the closed history rows with a validTo before archivedBefore
+    are in the archive files of directory
+    """
+    archivedBefore = models.DateTimeField(unique=True)
+    directory = models.CharField(max_length=255)
+    objects = HistoryArchiveManager()
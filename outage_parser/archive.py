@@ -0,0 +1,90 @@
+"""
+Bulk parsing of an archive of saved outage snapshots using a pool of processes
+"""
+
+from collections import namedtuple
+from datetime import datetime
+from multiprocessing import Pool
+from os import listdir, path
+
+from .outage_parser import OutageParser
+
+SNAPSHOT_PREFIX = 'PJM_outages_'
+SNAPSHOT_TIMESTAMP_FORMAT = '%Y-%m-%d_%H_%M_%S'
+SNAPSHOT_SUFFIX = '.txt'
+
+ParsedSnapshot = namedtuple('ParsedSnapshot', ['path', 'timestamp', 'tickets'])
+
+
+def snapshot_timestamp(file_name):
+    """
+    Retrieve the poll time encoded in a snapshot file name by the scraper
+    :param file_name: File name such as PJM_outages_2015-11-07_15_42_15.txt
+    :return: Datetime of the poll or None if the name is not a snapshot name
+    """
+    base_name = path.basename(file_name)
+    if not (base_name.startswith(SNAPSHOT_PREFIX) and base_name.endswith(SNAPSHOT_SUFFIX)):
+        return None
+    try:
+        return datetime.strptime(base_name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)], SNAPSHOT_TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def list_snapshots(directory):
+    """
+    List the snapshot files of a directory in timestamp order
+    :param directory: Directory the scraper saved snapshots to
+    :return: List of (timestamp, filepath) tuples
+    """
+    snapshots = []
+    for file_name in listdir(directory):
+        timestamp = snapshot_timestamp(file_name)
+        if timestamp is not None:
+            snapshots.append((timestamp, path.join(directory, file_name)))
+    snapshots.sort()
+    return snapshots
+
+
+def parse_snapshot(source):
+    """
+    Parse a single snapshot file, runs inside the worker processes
+    :param source: Filepath of the snapshot
+    :return: ParsedSnapshot with the fully parsed tickets
+    """
+    with open(source) as pjm_outage_file:
+        tickets = list(OutageParser.iter_tickets(pjm_outage_file))
+    return ParsedSnapshot(source, snapshot_timestamp(source), tickets)
+
+
+def parse_archive(directory, workers=None, chunksize=4, progress=None):
+    """
+    Parse every snapshot of a directory in a pool of processes
+
+    Snapshots are handed to the workers in chunks and the results come back in timestamp order as soon
+    as they are ready, so callers can start loading while the rest of the archive is being parsed.
+    :param directory: Directory the scraper saved snapshots to
+    :param workers: Number of worker processes, defaults to the number of cores. 1 parses in this process
+    :param chunksize: Number of snapshots sent to a worker at once
+    :param progress: Optional callable receiving (parsed snapshots, total snapshots) after each snapshot
+    :return: Generator of ParsedSnapshot in timestamp order
+    """
+    sources = [source for _, source in list_snapshots(directory)]
+    total = len(sources)
+
+    if workers == 1:
+        pool = None
+        results = map(parse_snapshot, sources)
+    else:
+        pool = Pool(workers)
+        results = pool.imap(parse_snapshot, sources, chunksize)
+
+    try:
+        for done, result in enumerate(results, 1):
+            if progress is not None:
+                progress(done, total)
+            yield result
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,190 @@
+"""
+Benchmarks for the outage parser, run against a lineoutage file:
+
+    python -m outage_parser.benchmark PJM_outages_2015-11-07_15_42_15.txt
+"""
+
+import gc
+import re
+import sys
+import tracemalloc
+from datetime import datetime
+from timeit import default_timer
+
+from .outage_parser import OutageParser, FIXED_FORMAT, OUTAGE_TIME_FORMAT, TIMESTAMP_FORMAT, decode_outage_time, \
+    decode_timestamp
+
+OUTAGE_TIME_PATTERN = re.compile(r'\d\d-[A-Za-z]{3}-\d{4} \d{4}')
+TIMESTAMP_PATTERN = re.compile(r'\d\d/\d\d/\d{4} \d\d:\d\d')
+
+
+def _best_of(func, repeat=5):
+    """
+    Helper function to time a callable
+    :param func: Callable without arguments
+    :param repeat: Number of runs
+    :return: Fastest run time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = default_timer()
+        func()
+        timings.append(default_timer() - start)
+    return min(timings)
+
+
+def bench_dates(text):
+    """
+    Compare strptime against the fixed layout decoders on every date in an outage file
+    :param text: Raw text of an outage file
+    :return: Dictionary of timings in seconds
+    """
+    outage_times = OUTAGE_TIME_PATTERN.findall(text)
+    timestamps = TIMESTAMP_PATTERN.findall(text)
+
+    def with_strptime():
+        for value in outage_times:
+            datetime.strptime(value, OUTAGE_TIME_FORMAT)
+        for value in timestamps:
+            datetime.strptime(value, TIMESTAMP_FORMAT)
+
+    def with_decoders():
+        decode_outage_time.cache_clear()
+        decode_timestamp.cache_clear()
+        for value in outage_times:
+            decode_outage_time(value)
+        for value in timestamps:
+            decode_timestamp(value)
+
+    def with_uncached_decoders():
+        for value in outage_times:
+            decode_outage_time.__wrapped__(value)
+        for value in timestamps:
+            decode_timestamp.__wrapped__(value)
+
+    def parse_file():
+        decode_outage_time.cache_clear()
+        decode_timestamp.cache_clear()
+        list(OutageParser(text).tickets)
+
+    return {
+        'dates': len(outage_times) + len(timestamps),
+        'strptime': _best_of(with_strptime),
+        'decoders': _best_of(with_decoders),
+        'uncached_decoders': _best_of(with_uncached_decoders),
+        'parse_file': _best_of(parse_file),
+    }
+
+
+class _BaselineEntity(object):
+    """
+    Dict backed entity laid out like the entities before __slots__, for the memory benchmark
+    """
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class _BaselineFwfSlicer(object):
+    """
+    Slicer laid out like the one every baseline ticket and outage built for itself
+    """
+
+    def __init__(self, fixed_format):
+        self.fixed_format = fixed_format
+        self.indicies = [idx for idx, token in enumerate(fixed_format) if token == '+']
+        self.column_slices = [slice(start, end) for start, end in zip(self.indicies, self.indicies[1:])]
+
+
+def _parse_baseline(text):
+    """
+    Helper function to parse an outage file into entities laid out like the ones before __slots__: each ticket
+    and outage holds its raw text and its own slicer, and every date is a separate strptime result
+    :param text: Raw text of an outage file
+    :return: List of baseline tickets
+    """
+    tickets = []
+    for ticket_text in text.replace('\n\n', '\n').split(FIXED_FORMAT + '\n')[1:-2]:
+        fwf = _BaselineFwfSlicer(FIXED_FORMAT)
+        columns = [ticket_text[column] for column in fwf.column_slices]
+        ticket = _BaselineEntity(_fwf=fwf, text=ticket_text, number=int(columns[1].strip()),
+                                 current_status=columns[7].strip(),
+                                 last_revised=datetime.strptime(columns[8].strip(), TIMESTAMP_FORMAT),
+                                 approval_risk=columns[9].strip(), rtep=columns[11].strip(),
+                                 previous_status=columns[12].strip(), outages=[], causes=[], date_log=[],
+                                 history_log=[])
+        for line in ticket_text.splitlines():
+            if line[:107].strip():
+                fwf = _BaselineFwfSlicer(FIXED_FORMAT)
+                columns = [line[column] for column in fwf.column_slices]
+                ticket.outages.append(_BaselineEntity(
+                    _fwf=fwf, line=line, zone=columns[2].strip(), equipment_type=columns[3][1:5],
+                    station=columns[3][6:14].strip(), facility_name=columns[3][21:].strip(),
+                    start_time=datetime.strptime(columns[4].strip(), OUTAGE_TIME_FORMAT),
+                    end_time=datetime.strptime(columns[5].strip(), OUTAGE_TIME_FORMAT),
+                    open_closed=columns[6].strip()))
+            if line[108:109] != '(':
+                continue
+            if line[159:160] == ')':
+                ticket.causes.append(_BaselineEntity(cause=line[109:159].strip()))
+            elif line[164:165] == ')':
+                ticket.date_log.append(_BaselineEntity(
+                    start_time=datetime.strptime(line[109:125], OUTAGE_TIME_FORMAT),
+                    end_time=datetime.strptime(line[128:144], OUTAGE_TIME_FORMAT),
+                    time_stamp=datetime.strptime(line[148:164], TIMESTAMP_FORMAT)))
+            elif line[138:139] == ')':
+                ticket.history_log.append(_BaselineEntity(
+                    status=line[109:122].strip(), time_stamp=datetime.strptime(line[122:138], TIMESTAMP_FORMAT)))
+        tickets.append(ticket)
+    return tickets
+
+
+def _held_per_ticket(parse):
+    """
+    Helper function to measure the memory held by the tickets of a parse, the date caches start empty so the
+    decoded dates they keep are counted the same way in every run
+    :param parse: Callable without arguments returning the list of tickets
+    :return: Tuple of (number of tickets, bytes per ticket)
+    """
+    decode_outage_time.cache_clear()
+    decode_timestamp.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    tickets = parse()
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(tickets), held / float(len(tickets))
+
+
+def bench_memory(text):
+    """
+    Measure the memory held by fully parsed tickets in the baseline layout, where every ticket and outage was
+    a dict backed object keeping its raw text and its own slicer, against the __slots__ entities with and
+    without their raw text
+    :param text: Raw text of an outage file
+    :return: Dictionary with the number of tickets and bytes per ticket for each layout
+    """
+    result = {}
+    result['tickets'], result['baseline'] = _held_per_ticket(lambda: _parse_baseline(text))
+    _, result['keep_raw'] = _held_per_ticket(lambda: list(OutageParser(text, keep_raw=True).tickets))
+    _, result['compact'] = _held_per_ticket(lambda: list(OutageParser(text).tickets))
+    return result
+
+
+def main(source):
+    with open(source) as pjm_outage_file:
+        text = pjm_outage_file.read()
+
+    dates = bench_dates(text)
+    print('{dates} dates: strptime {strptime:.4f}s, decoders {decoders:.4f}s ({speedup:.1f}x), '
+          'without cache {uncached_decoders:.4f}s, full parse {parse_file:.4f}s'.format(
+              speedup=dates['strptime'] / dates['decoders'], **dates))
+
+    memory = bench_memory(text)
+    print('{tickets} tickets: {baseline:.0f} bytes per ticket in the baseline layout, {keep_raw:.0f} with keep_raw, '
+          '{compact:.0f} compact ({reduction:.1f}x)'.format(reduction=memory['baseline'] / memory['compact'], **memory))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,199 @@
+"""
+Long running asyncio poller that downloads new outage snapshots and hands them to the parse/load pipeline
+
+    python -m outage_parser.daemon --interval 60 <directory>
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from os import remove
+
+from .archive import snapshot_timestamp
+from .scraper import OutageFileIO, OUTAGE_URL
+from .snapshot_store import SnapshotStore, store_source
+
+logger = logging.getLogger(__name__)
+
+# Failures after which the backoff stops doubling, far past any max_backoff
+MAX_BACKOFF_DOUBLINGS = 32
+
+
+class OutagePoller(object):
+    """
+    Polls the outage file on an interval and queues every new snapshot for the pipeline
+
+    Downloads run one at a time on a dedicated thread so polls never overlap. A download that outlives
+    the poll timeout keeps running; the following polls wait for it instead of starting another, and its
+    snapshot is queued when it finishes. The pipeline runs on another thread and is fed through a bounded
+    queue, a slow pipeline holds back polling instead of piling up snapshots.
+    """
+
+    def __init__(self, directory, pipeline=None, url=OUTAGE_URL, interval=60, jitter=5, timeout=30,
+                 max_backoff=900, queue_size=4, index=None, outage_file=None, store=None):
+        """
+        Initialize outage poller
+        :param directory: Directory to write PJM text files to
+        :param pipeline: Optional callable receiving the filepath of each new snapshot
+        :param url: The source of PJM outage data
+        :param interval: Seconds between polls
+        :param jitter: Maximum random seconds added to each wait
+        :param timeout: Seconds a poll waits for its download, also the connect and read timeout of the request
+        :param max_backoff: Maximum seconds between polls after repeated failures
+        :param queue_size: Number of snapshots waiting for the pipeline before polling pauses
+        :param index: Optional SnapshotIndex, snapshots with unchanged content are discarded
+        :param outage_file: Optional OutageFileIO, defaults to one for url
+        :param store: Optional SnapshotStore each new snapshot is appended to, its file is removed once the
+        pipeline handled it without raising
+        :return: Poller ready to run
+        """
+        self.directory = directory
+        self.pipeline = pipeline
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.queue_size = queue_size
+        self.index = index
+        self.outage_file = outage_file or OutageFileIO(url)
+        self.store = store
+
+        self.failures = 0
+        self.polls = 0
+        self.snapshots = 0
+        self._queue = None
+        self._stopping = None
+        self._download = None
+        self._download_executor = ThreadPoolExecutor(max_workers=1)
+        self._pipeline_executor = ThreadPoolExecutor(max_workers=1)
+
+    def _fetch(self):
+        """
+        Download a snapshot, runs on the download thread
+        :return: Filepath of the new snapshot, None if it did not change
+        """
+        target = self.outage_file.download(self.directory, timeout=self.timeout)
+        if target is None or (self.index is None and self.store is None):
+            return target
+
+        with open(target) as text_file:
+            text = text_file.read()
+        if self.index is not None and self.index.is_unchanged(text):
+            remove(target)
+            return None
+        source = target
+        if self.store is not None:
+            # The file only lives until the pipeline handled it, the index points at the stored copy
+            source = store_source(self.store.append(snapshot_timestamp(target), text))
+        if self.index is not None:
+            self.index.add(text, source)
+        return target
+
+    def next_delay(self):
+        """
+        Seconds to wait before the next poll, backing off exponentially after failures
+        :return: Delay in seconds
+        """
+        delay = min(self.interval * 2 ** min(self.failures, MAX_BACKOFF_DOUBLINGS), self.max_backoff)
+        return delay + random.uniform(0, self.jitter)
+
+    async def poll_once(self):
+        """
+        Run a single poll and queue the snapshot if it is new, a download still running from an earlier
+        poll is waited for instead of starting another
+        :return: Filepath of the new snapshot or None
+        """
+        loop = asyncio.get_running_loop()
+        self.polls += 1
+        if self._download is None:
+            self._download = loop.run_in_executor(self._download_executor, self._fetch)
+        try:
+            target = await asyncio.wait_for(asyncio.shield(self._download), self.timeout)
+        except asyncio.TimeoutError:
+            self.failures += 1
+            logger.warning('Poll %s still downloading after %s seconds, %s failures in a row', self.polls,
+                           self.timeout, self.failures)
+            return None
+        except Exception:
+            self._download = None
+            self.failures += 1
+            logger.exception('Poll %s failed, %s failures in a row', self.polls, self.failures)
+            return None
+
+        self._download = None
+        self.failures = 0
+        if target is not None:
+            self.snapshots += 1
+            await self._queue.put(target)
+        return target
+
+    async def _consume(self):
+        """
+        Hand queued snapshots to the pipeline one at a time
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            target = await self._queue.get()
+            try:
+                if self.pipeline is not None:
+                    await loop.run_in_executor(self._pipeline_executor, self.pipeline, target)
+            except Exception:
+                logger.exception('Pipeline failed for %s, the file is kept', target)
+            else:
+                if self.store is not None:
+                    remove(target)
+            finally:
+                self._queue.task_done()
+
+    async def run(self):
+        """
+        Poll until stop is called, then let the pipeline finish the queued snapshots
+        """
+        self._queue = asyncio.Queue(self.queue_size)
+        self._stopping = asyncio.Event()
+        consumer = asyncio.ensure_future(self._consume())
+        try:
+            while not self._stopping.is_set():
+                await self.poll_once()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.next_delay())
+                except asyncio.TimeoutError:
+                    pass
+            # A download left running by the last poll still hands its snapshot to the pipeline
+            while self._download is not None:
+                await self.poll_once()
+            await self._queue.join()
+        finally:
+            consumer.cancel()
+
+    def stop(self):
+        """
+        Ask a running poller to stop after the current poll
+        """
+        if self._stopping is not None:
+            self._stopping.set()
+
+
+def main():
+    arguments = argparse.ArgumentParser(description='Poll the PJM outage file and save new snapshots')
+    arguments.add_argument('directory', help='Directory to write PJM text files to')
+    arguments.add_argument('--url', default=OUTAGE_URL)
+    arguments.add_argument('--interval', type=float, default=60)
+    arguments.add_argument('--jitter', type=float, default=5)
+    arguments.add_argument('--timeout', type=float, default=30)
+    arguments.add_argument('--store', help='Directory of a SnapshotStore to append snapshots to instead of keeping '
+                                           'one text file per poll')
+    options = arguments.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = SnapshotStore(options.store) if options.store else None
+    poller = OutagePoller(options.directory, url=options.url, interval=options.interval, jitter=options.jitter,
+                          timeout=options.timeout, pipeline=lambda target: logger.info('New snapshot %s', target),
+                          store=store)
+    asyncio.run(poller.run())
+
+
+if __name__ == '__main__':
+    main()
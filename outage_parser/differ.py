@@ -0,0 +1,78 @@
+"""
+In memory diff of two parsed outage snapshots, the parse time counterpart of the NOT EXISTS queries in SQL.py
+"""
+
+from collections import namedtuple
+
+OutageRecord = namedtuple('OutageRecord', ['ticket_number', 'facility_name', 'line_number', 'zone', 'station',
+                                           'equipment_type', 'voltage', 'start_time', 'end_time', 'open_closed'])
+
+# Fields that identify an outage across snapshots, same match key as the history tables
+KEY_FIELDS = ('ticket_number', 'facility_name', 'line_number')
+
+# Fields whose change makes an outage changed, same comparison as the history table updates
+CHANGE_FIELDS = ('start_time', 'end_time', 'open_closed')
+
+
+class SnapshotDiff(object):
+    """
+    Outages added, removed and changed between an old and a new snapshot
+    """
+
+    def __init__(self, added, removed, changed):
+        """
+        :param added: OutageRecords only in the new snapshot
+        :param removed: OutageRecords only in the old snapshot
+        :param changed: Tuples of (old OutageRecord, new OutageRecord) whose change fields differ
+        """
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def __bool__(self):
+        return len(self) > 0
+
+
+def outage_records(snapshot):
+    """
+    Flatten the outages of a snapshot into records
+    :param snapshot: OutageParser or iterable of parsed tickets
+    :return: Generator of OutageRecord, line_number is the position of the outage in its ticket
+    """
+    for ticket in getattr(snapshot, 'tickets', snapshot):
+        for line_number, outage in enumerate(ticket.outages):
+            yield OutageRecord(ticket.number, outage.facility_name, line_number, outage.zone, outage.station,
+                               outage.equipment_type, outage.voltage, outage.start_time, outage.end_time,
+                               outage.open_closed)
+
+
+def diff_snapshots(old, new, change_fields=CHANGE_FIELDS):
+    """
+    Compare two snapshots in a single pass over each, keyed on ticket number, facility and line number
+    :param old: Earlier OutageParser or iterable of parsed tickets
+    :param new: Later OutageParser or iterable of parsed tickets
+    :param change_fields: Fields compared to decide whether a matched outage changed
+    :return: SnapshotDiff
+    """
+    key_positions = [OutageRecord._fields.index(field) for field in KEY_FIELDS]
+    change_positions = [OutageRecord._fields.index(field) for field in change_fields]
+
+    def key(record):
+        return tuple(record[position] for position in key_positions)
+
+    def fingerprint(record):
+        return tuple(record[position] for position in change_positions)
+
+    old_records = dict((key(record), record) for record in outage_records(old))
+    added, changed = [], []
+    for record in outage_records(new):
+        old_record = old_records.pop(key(record), None)
+        if old_record is None:
+            added.append(record)
+        elif fingerprint(old_record) != fingerprint(record):
+            changed.append((old_record, record))
+    removed = list(old_records.values())
+    return SnapshotDiff(added, removed, changed)
@@ -3,11 +3,84 @@ Set of classes to convert outage text file into python classes to be used
 when rendering data
 """
 
+import mmap
+from array import array
+from collections import Counter
+from collections.abc import Sequence
 from datetime import datetime
+from functools import lru_cache, partial
+from operator import itemgetter
 
 FIXED_FORMAT = '+---+------+--------+------------------------------------------------+-----------------+-------------' \
                '----+-+---------+-----------------+---------+---------+--------+-----------+'
 
+# Names of the columns delimited by FIXED_FORMAT, in order
+COLUMN_NAMES = ('item', 'ticket', 'zone', 'facility', 'start', 'end', 'open_closed', 'status', 'last_revised',
+                'approval_risk', 'availability', 'rtep', 'previous_status')
+
+# Kinds of lines found in a ticket, used by the line classifier and the parse statistics
+OUTAGE_LINE = 'outage'
+OUTAGE_TYPE_LINE = 'outage_type'
+CAUSE_LINE = 'cause'
+DATE_ENTRY_LINE = 'date_entry'
+HISTORY_ENTRY_LINE = 'history_entry'
+UNRECOGNIZED_LINE = 'unrecognized'
+
+# Fields of the parenthesized entries as (name, start, end) offsets from the opening parenthesis, the closing
+# parenthesis of each kind follows its last field
+ENTRY_FIELDS = {
+    OUTAGE_TYPE_LINE: (('outage_type', 1, 27),),
+    HISTORY_ENTRY_LINE: (('status', 1, 14), ('time_stamp', 14, 30)),
+    CAUSE_LINE: (('cause', 1, 51),),
+    DATE_ENTRY_LINE: (('start_time', 1, 17), ('end_time', 20, 36), ('time_stamp', 40, 56)),
+}
+
+# Fields of the facility column as (name, start, end) offsets from the start of the column, None runs to its end
+FACILITY_FIELDS = (('equipment_type', 1, 5), ('station', 6, 14), ('voltage', 15, 21), ('facility_name', 21, None))
+
+# Layouts of the two kinds of dates found in the file, decoded by decode_outage_time and decode_timestamp
+OUTAGE_TIME_FORMAT = '%d-%b-%Y %H%M'
+TIMESTAMP_FORMAT = '%m/%d/%Y %H:%M'
+
+# Number of decoded dates kept per layout, the same timestamps repeat thousands of times within a file
+DATE_CACHE_SIZE = 4096
+
+MONTHS = {'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+          'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12}
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def decode_outage_time(value):
+    """
+    Decode an outage start or end time such as '01-NOV-2015 0800'
+
+    Same result as datetime.strptime(value, OUTAGE_TIME_FORMAT) but slices the fixed positions directly,
+    anything that does not match the fixed layout falls back to strptime.
+    :param value: Date text in OUTAGE_TIME_FORMAT
+    :return: Decoded datetime
+    """
+    if len(value) == 16 and value[2] == '-' and value[6] == '-' and value[11] == ' ':
+        month = MONTHS.get(value[3:6].upper())
+        if month and (value[0:2] + value[7:11] + value[12:16]).isdigit():
+            return datetime(int(value[7:11]), month, int(value[0:2]), int(value[12:14]), int(value[14:16]))
+    return datetime.strptime(value, OUTAGE_TIME_FORMAT)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def decode_timestamp(value):
+    """
+    Decode a revision or log timestamp such as '11/01/2015 07:40'
+
+    Same result as datetime.strptime(value, TIMESTAMP_FORMAT) but slices the fixed positions directly,
+    anything that does not match the fixed layout falls back to strptime.
+    :param value: Date text in TIMESTAMP_FORMAT
+    :return: Decoded datetime
+    """
+    if len(value) == 16 and value[2] == '/' and value[5] == '/' and value[10] == ' ' and value[13] == ':':
+        if (value[0:2] + value[3:5] + value[6:10] + value[11:13] + value[14:16]).isdigit():
+            return datetime(int(value[6:10]), int(value[0:2]), int(value[3:5]), int(value[11:13]), int(value[14:16]))
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
 
 class ParsingException(Exception):
     """
@@ -19,17 +92,179 @@ class ParsingException(Exception):
 class FwfSlicer(object):
     """
     Fixed width format slicer to convert know fixed format into columns
+
+    Instances are immutable so a single compiled slicer can be shared by every ticket and outage,
+    use compile_fixed_format to get the shared instance for a format.
     """
 
-    def __init__(self, fixed_format):
+    __slots__ = ('fixed_format', 'column_names', 'indicies', 'column_slices', 'slices', 'positions', '_getter')
+
+    def __init__(self, fixed_format, column_names=COLUMN_NAMES):
         """
         Initialize fixed format slicer
         :param fixed_format: The fixed format schema as a series for +- with + as delimeter
+        :param column_names: Names of the columns in the fixed format, in order
         :return: Store indicies and slices internally
         """
-        self.fixed_format = fixed_format
-        self.indicies = [idx for idx, token in enumerate(FIXED_FORMAT) if token == '+']
-        self.column_slices = [slice(start, end) for start, end in zip(self.indicies, self.indicies[1:])]
+        indicies = tuple(idx for idx, token in enumerate(fixed_format) if token == '+')
+        column_slices = tuple(slice(start, end) for start, end in zip(indicies, indicies[1:]))
+        column_names = tuple(column_names)
+        if len(column_names) != len(column_slices):
+            raise ValueError('Fixed format has {} columns but {} column names were given'.format(
+                len(column_slices), len(column_names)))
+
+        set_attribute = super(FwfSlicer, self).__setattr__
+        set_attribute('fixed_format', fixed_format)
+        set_attribute('column_names', column_names)
+        set_attribute('indicies', indicies)
+        set_attribute('column_slices', column_slices)
+        set_attribute('slices', dict(zip(column_names, column_slices)))
+        set_attribute('positions', dict((name, idx) for idx, name in enumerate(column_names)))
+        set_attribute('_getter', itemgetter(*column_slices))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('FwfSlicer is immutable')
+
+    def extract(self, row):
+        """
+        Cut a row into its columns in a single call
+        :param row: Raw text line laid out in this fixed format
+        :return: Tuple with the raw (unstripped) text of every column
+        """
+        columns = self._getter(row)
+        if len(self.column_slices) == 1:
+            return (columns,)
+        return columns
+
+    def column(self, row, name):
+        """
+        Retrieve a single named column from a row
+        :param row: Raw text line laid out in this fixed format
+        :param name: Name of the column
+        :return: Raw (unstripped) text of the column
+        """
+        return row[self.slices[name]]
+
+
+_compiled_formats = {}
+
+
+def compile_fixed_format(fixed_format=FIXED_FORMAT, column_names=COLUMN_NAMES):
+    """
+    Build the slicer for a fixed format once and share it afterwards
+    :param fixed_format: The fixed format schema as a series for +- with + as delimeter
+    :param column_names: Names of the columns in the fixed format
+    :return: Shared FwfSlicer instance
+    """
+    key = (fixed_format, tuple(column_names))
+    fwf = _compiled_formats.get(key)
+    if fwf is None:
+        fwf = _compiled_formats[key] = FwfSlicer(fixed_format, column_names)
+    return fwf
+
+
+class TicketLayout(object):
+    """
+    Positions of the parts of a ticket line, derived from a compiled FwfSlicer
+
+    The outage part of a line spans the columns up to open_closed and the parenthesized entries open one
+    character into the status column, so both move with the header layout. Only the widths inside an entry
+    and inside the facility column are fixed, by ENTRY_FIELDS and FACILITY_FIELDS relative to where they start.
+    Use compile_ticket_layout to get the shared instance for a slicer.
+    """
+
+    __slots__ = ('outage_end', 'entry_start', 'closing_markers', 'entry_closings', 'entry_slices', 'facility_slices')
+
+    def __init__(self, fwf):
+        """
+        Initialize ticket layout
+        :param fwf: Compiled FwfSlicer with the facility, open_closed and status columns
+        :return: Store the positions internally
+        """
+        entry_start = fwf.slices['status'].start + 1
+        entry_closings = dict((kind, entry_start + fields[-1][2]) for kind, fields in ENTRY_FIELDS.items())
+
+        set_attribute = super(TicketLayout, self).__setattr__
+        set_attribute('outage_end', fwf.slices['open_closed'].stop)
+        set_attribute('entry_start', entry_start)
+        # Furthest first so inner parenthesis in a cause never win
+        set_attribute('closing_markers', tuple(sorted(((position, kind) for kind, position in entry_closings.items()),
+                                                      reverse=True)))
+        set_attribute('entry_closings', entry_closings)
+        set_attribute('entry_slices', dict(
+            (kind, dict((name, slice(entry_start + start, entry_start + end)) for name, start, end in fields))
+            for kind, fields in ENTRY_FIELDS.items()))
+        set_attribute('facility_slices', dict((name, slice(start, end)) for name, start, end in FACILITY_FIELDS))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TicketLayout is immutable')
+
+    def holds(self, line, kind):
+        """
+        Check that a line holds a parenthesized entry of a kind
+        :param line: Raw text line of a ticket
+        :param kind: Kind of entry, one of the keys of ENTRY_FIELDS
+        :return: True if the entry opens and closes at the positions of its kind
+        """
+        closing = self.entry_closings[kind]
+        return line[self.entry_start:self.entry_start + 1] == '(' and line[closing:closing + 1] == ')'
+
+
+_compiled_layouts = {}
+
+
+def compile_ticket_layout(fwf=None):
+    """
+    Build the ticket layout of a compiled slicer once and share it afterwards
+    :param fwf: Compiled FwfSlicer, defaults to the shared slicer for FIXED_FORMAT
+    :return: Shared TicketLayout instance
+    """
+    fwf = fwf or compile_fixed_format()
+    layout = _compiled_layouts.get(fwf)
+    if layout is None:
+        layout = _compiled_layouts[fwf] = TicketLayout(fwf)
+    return layout
+
+
+class LineClassifier(object):
+    """
+    Decides which entity a ticket line holds by looking at the marker positions of its TicketLayout once
+
+    The left part of a line holds an outage; the right part holds at most one parenthesized entry
+    whose closing parenthesis position tells the kind.
+    """
+
+    def __init__(self, fwf=None):
+        """
+        Initialize line classifier
+        :param fwf: Compiled FwfSlicer, defaults to the shared slicer for FIXED_FORMAT
+        :return: Store the layout and empty statistics internally
+        """
+        self.layout = compile_ticket_layout(fwf)
+        self.counts = Counter()
+
+    def classify(self, line):
+        """
+        Classify a single ticket line and count it in the statistics
+        :param line: Raw text line of a ticket
+        :return: Tuple of (line holds an outage, kind of the parenthesized entry or None)
+        """
+        layout = self.layout
+        is_outage = bool(line[:layout.outage_end].strip())
+        kind = None
+        if line[layout.entry_start:layout.entry_start + 1] == '(':
+            for position, marker_kind in layout.closing_markers:
+                if line[position:position + 1] == ')':
+                    kind = marker_kind
+                    break
+
+        if is_outage:
+            self.counts[OUTAGE_LINE] += 1
+        if kind is not None:
+            self.counts[kind] += 1
+        elif not is_outage:
+            self.counts[UNRECOGNIZED_LINE] += 1
+        return is_outage, kind
 
 
 class OutageParser(object):
@@ -37,75 +272,381 @@ class OutageParser(object):
     Main class for parsing lineoutages.txt file
     """
 
-    def __init__(self, text):
+    def __init__(self, text, fixed_format=FIXED_FORMAT, column_names=COLUMN_NAMES, keep_raw=False):
+        """
+        Initialize outage parser
+        :param text: Raw text of an outage file
+        :param fixed_format: Fixed format line that separates tickets, for files with another header layout
+        :param column_names: Names of the columns in the fixed format
+        :param keep_raw: Keep the raw text on parsed tickets and outages for debugging
+        :return: Store text internally, tickets are parsed on access
+        """
         self.text = text.replace('\n\n', '\n')
-        self._tickets = []
+        self.fwf = compile_fixed_format(fixed_format, column_names)
+        self.keep_raw = keep_raw
+        self.mapped = None
+        self._tickets = None
+        self.classifier = LineClassifier(self.fwf)
+
+    @classmethod
+    def from_mmap(cls, source, fixed_format=FIXED_FORMAT, column_names=COLUMN_NAMES, keep_raw=False):
+        """
+        Parse an outage file through a memory map instead of reading it into memory
+
+        Ticket boundaries are located in the mapped file up front, each ticket is decoded and parsed
+        only when it is accessed. Call close (or use the parser as a context manager) to release the map.
+        :param source: Filepath of file to parse
+        :param fixed_format: Fixed format line that separates tickets
+        :param column_names: Names of the columns in the fixed format
+        :param keep_raw: Keep the raw text on parsed tickets and outages for debugging
+        :return: OutageParser backed by a MappedOutageFile, its text is None
+        """
+        outage_parser = cls('', fixed_format, column_names, keep_raw)
+        outage_parser.text = None
+        outage_parser.mapped = MappedOutageFile(source, outage_parser.fwf)
+        return outage_parser
+
+    def close(self):
+        """
+        Release the memory map of a parser built with from_mmap
+        :return: Returns nothing
+        """
+        if self.mapped is not None:
+            self.mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     @property
     def tickets(self):
         """
         Create list of tickets that corresponds to each ticket section in the textfile
-        :return: List of tickets
+
+        The text is split once and cached; each ticket is only parsed the first time it is accessed.
+        :return: Lazy list of tickets
         """
-        if self._tickets:
-            return self._tickets
-        else:
-            # Parse out tickets by splitting on the fixed format -- will break if format changes
-            tickets = self.text.split(FIXED_FORMAT + '\n')
-            tickets = tickets[1:-2]  # Exclude extra line that are not tickets
-            tickets = [Ticket(text) for text in tickets]
+        if self._tickets is None:
+            if self.mapped is not None:
+                tickets = self.mapped
+            else:
+                # Parse out tickets by splitting on the fixed format -- will break if format changes
+                tickets = self.text.split(self.fwf.fixed_format + '\n')
+                tickets = tickets[1:-2]  # Exclude extra line that are not tickets
+            build_ticket = partial(self._build_ticket, classifier=self.classifier, fwf=self.fwf, keep_raw=self.keep_raw)
+            self._tickets = LazyTicketList(tickets, build_ticket)
+        return self._tickets
+
+    @property
+    def parse_statistics(self):
+        """
+        Number of lines of each kind seen in the tickets parsed so far
+        :return: Dictionary of line kind to line count
+        """
+        return dict(self.classifier.counts)
+
+    def invalidate(self):
+        """
+        Drop cached tickets so that the next access to tickets parses the text again
+        :return: Returns nothing
+        """
+        self._tickets = None
+        self.classifier = LineClassifier(self.fwf)
 
-            for ticket in tickets:
-                for line in ticket.text.splitlines():
-                    line = line.strip('\n')
+    def reparse(self):
+        """
+        Drop cached tickets and parse every ticket again
+        :return: List of freshly parsed tickets
+        """
+        self.invalidate()
+        return list(self.tickets)
+
+    def to_columns(self):
+        """
+        Export every outage of every ticket as NumPy columns, requires numpy
+        :return: OutageColumns with one array entry per outage
+        """
+        return OutageColumns.from_tickets(self.tickets)
+
+    @classmethod
+    def iter_tickets(cls, fileobj, classifier=None, fwf=None, keep_raw=False):
+        """
+        Lazily parse tickets from an open outage file, one line at a time
+
+        Ticket boundaries are found as the file is read, so only a single ticket is held in memory
+        and callers can start consuming tickets before the whole file has been read. Yields the same
+        tickets as the tickets property: the section before the first fixed format line and the
+        trailing header section are skipped.
+        :param fileobj: Iterable of lines, typically a file opened in text mode
+        :param classifier: Optional LineClassifier that collects the parse statistics
+        :param fwf: Optional compiled FwfSlicer for files with another header layout
+        :param keep_raw: Keep the raw text on parsed tickets and outages for debugging
+        :return: Generator of parsed Ticket objects
+        """
+        if fwf is None:
+            fwf = compile_fixed_format()
+        if classifier is None:
+            classifier = LineClassifier(fwf)
+
+        pending = None  # Last complete section, only a ticket if another section follows it
+        section = None  # Lines of the section currently being read, None before the first separator
+        for line in fileobj:
+            line = line.rstrip('\r\n')
+            if not line:
+                continue  # Blank lines are dropped, same as the whole text replace in __init__
+
+            if line == fwf.fixed_format:
+                if pending is not None:
+                    yield cls._build_ticket(pending, classifier, fwf, keep_raw)
+                if section is not None:
+                    pending = '\n'.join(section) + '\n'
+                section = []
+            elif section is not None:
+                section.append(line)
+
+    @staticmethod
+    def _build_ticket(text, classifier, fwf, keep_raw=False):
+        """
+        Parse a single ticket section and attach every entity found in its lines
+        :param text: Raw text that corresponds to a single ticket
+        :param classifier: LineClassifier that routes each line to its entity, built for the same FwfSlicer
+        :param fwf: Compiled FwfSlicer for the ticket columns
+        :param keep_raw: Keep the raw text on the ticket and its outages
+        :return: Parsed Ticket object
+        """
+        ticket = Ticket(text, fwf, keep_raw)
+        for line in text.splitlines():
+            is_outage, kind = classifier.classify(line)
+            if is_outage:
+                ticket.outages.append(Outage(line, fwf, keep_raw))
+            if kind == CAUSE_LINE:
+                ticket.causes.append(Cause(line, classifier.layout))
+            elif kind == DATE_ENTRY_LINE:
+                ticket.date_log.append(DateEntry(line, classifier.layout))
+            elif kind == HISTORY_ENTRY_LINE:
+                ticket.history_log.append(HistoryEntry(line, classifier.layout))
+
+        return ticket
+
+
+class MappedOutageFile(Sequence):
+    """
+    Ticket sections of a memory mapped outage file, decoded one at a time on access
+
+    Only the offsets of the ticket sections are kept in memory. A section between two fixed format
+    lines is a ticket when its first line has a number in the ticket column, so report headers and
+    trailers are skipped and concatenated outage files can be scanned as one.
+    """
+
+    def __init__(self, source, fwf=None, encoding='utf-8'):
+        """
+        Map an outage file and locate its ticket sections
+        :param source: Filepath of file to map
+        :param fwf: Compiled FwfSlicer, defaults to the shared slicer for FIXED_FORMAT
+        :param encoding: Encoding of the file
+        :return: Store the map and the section offsets internally
+        """
+        fwf = fwf or compile_fixed_format()
+        self.encoding = encoding
+        self.starts = array('q')
+        self.ends = array('q')
+        self._file = open(source, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._map = b''  # Empty files cannot be mapped
+
+        separator = fwf.fixed_format.encode('ascii')
+        ticket_column = fwf.slices['ticket']
+        section_start = None
+        position = self._map.find(separator)
+        while position >= 0:
+            line_end = self._map.find(b'\n', position)
+            line_end = len(self._map) if line_end < 0 else line_end + 1
+            at_line_start = position == 0 or self._map[position - 1:position] == b'\n'
+            at_line_end = self._map[position + len(separator):line_end].strip() == b''
+            if at_line_start and at_line_end:
+                if section_start is not None:
+                    first_line_end = self._map.find(b'\n', section_start, position)
+                    first_line = self._map[section_start:position if first_line_end < 0 else first_line_end]
+                    if first_line[ticket_column].strip().isdigit():
+                        self.starts.append(section_start)
+                        self.ends.append(position)
+                section_start = line_end
+            position = self._map.find(separator, line_end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        raw = self._map[self.starts[idx]:self.ends[idx]].decode(self.encoding)
+        return ''.join(line + '\n' for line in raw.replace('\r', '').split('\n') if line)
+
+    def close(self):
+        """
+        Release the map and the file
+        :return: Returns nothing
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
 
-                    # Use the Easier to Ask for Forgiveness idiom
-                    # If we recognize an entity, we parse it, if not, we do nothing
-                    try:
-                        ticket.outages.append(Outage(line))
-                    except ParsingException:
-                        pass
 
-                    try:
-                        ticket.causes.append(Cause(line))
-                    except ParsingException:
-                        pass
+class OutageColumns(object):
+    """
+    Columnar view of the outages in a snapshot, one array entry per outage
 
-                    try:
-                        ticket.date_log.append(DateEntry(line))
-                    except ParsingException:
-                        pass
+    Zone, station and equipment type are stored as integer codes into the matching categories tuple,
+    a voltage of 0 means the facility has no voltage.
+    """
 
-                    try:
-                        ticket.history_log.append(HistoryEntry(line))
-                    except ParsingException:
-                        pass
+    def __init__(self, ticket_number, line_number, start_time, end_time, voltage, open_closed,
+                 zone_codes, zone_categories, station_codes, station_categories,
+                 equipment_type_codes, equipment_type_categories):
+        self.ticket_number = ticket_number
+        self.line_number = line_number
+        self.start_time = start_time
+        self.end_time = end_time
+        self.voltage = voltage
+        self.open_closed = open_closed
+        self.zone_codes = zone_codes
+        self.zone_categories = zone_categories
+        self.station_codes = station_codes
+        self.station_categories = station_categories
+        self.equipment_type_codes = equipment_type_codes
+        self.equipment_type_categories = equipment_type_categories
+
+    def __len__(self):
+        return len(self.ticket_number)
+
+    @classmethod
+    def from_tickets(cls, tickets):
+        """
+        Build columns from parsed tickets
+        :param tickets: Iterable of parsed Ticket objects
+        :return: OutageColumns object
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError('numpy is required to export outages as columns')
+
+        ticket_number, line_number, start_time, end_time, voltage, open_closed = [], [], [], [], [], []
+        zones, stations, equipment_types = {}, {}, {}
+        zone_codes, station_codes, equipment_type_codes = [], [], []
+        for ticket in tickets:
+            for idx, outage in enumerate(ticket.outages):
+                ticket_number.append(ticket.number)
+                line_number.append(idx)
+                start_time.append(outage.start_time)
+                end_time.append(outage.end_time)
+                voltage.append(outage.voltage or 0)
+                open_closed.append(outage.open_closed)
+                zone_codes.append(zones.setdefault(outage.zone, len(zones)))
+                station_codes.append(stations.setdefault(outage.station, len(stations)))
+                equipment_type_codes.append(equipment_types.setdefault(outage.equipment_type, len(equipment_types)))
+
+        return cls(
+            ticket_number=np.array(ticket_number, dtype=np.int64),
+            line_number=np.array(line_number, dtype=np.int16),
+            start_time=np.array(start_time, dtype='datetime64[m]'),
+            end_time=np.array(end_time, dtype='datetime64[m]'),
+            voltage=np.array(voltage, dtype=np.int16),
+            open_closed=np.array(open_closed, dtype='U1'),
+            zone_codes=np.array(zone_codes, dtype=np.int32),
+            zone_categories=tuple(sorted(zones, key=zones.get)),
+            station_codes=np.array(station_codes, dtype=np.int32),
+            station_categories=tuple(sorted(stations, key=stations.get)),
+            equipment_type_codes=np.array(equipment_type_codes, dtype=np.int32),
+            equipment_type_categories=tuple(sorted(equipment_types, key=equipment_types.get)),
+        )
+
+
+class LazyTicketList(Sequence):
+    """
+    Read only list of ticket sections that parses each ticket on first access and keeps the result
+    """
 
-            return tickets
+    def __init__(self, sections, build_ticket):
+        """
+        Initialize lazy ticket list
+        :param sections: Sequence of raw ticket texts
+        :param build_ticket: Callable that turns a raw ticket text into a Ticket
+        :return: Store sections and an empty cache internally
+        """
+        self._sections = sections
+        self._build_ticket = build_ticket
+        self._cache = [None] * len(sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        ticket = self._cache[idx]
+        if ticket is None:
+            ticket = self._build_ticket(self._sections[idx])
+            self._cache[idx] = ticket
+        return ticket
+
+    @property
+    def parsed_count(self):
+        """
+        Number of tickets that have been materialized so far
+        """
+        return sum(1 for ticket in self._cache if ticket is not None)
 
 
 class Ticket(object):
     """
     The ticket entity in the textfile
+
+    Uses __slots__ and drops the raw text unless keep_raw is set, so a large number of parsed tickets
+    can be held in memory.
     """
 
-    def __init__(self, text):
+    __slots__ = ('number', 'current_status', 'last_revised', 'approval_risk', 'availability', 'rtep',
+                 'previous_status', '_outage_type', 'text', 'outages', 'causes', 'date_log', 'history_log')
+
+    def __init__(self, text, fwf=None, keep_raw=False):
         """
         Parse text related to a ticket into a ticket object
 
         :param text: Raw text that corresponds to a single ticket
+        :param fwf: Compiled FwfSlicer, defaults to the shared slicer for FIXED_FORMAT
+        :param keep_raw: Keep the raw text on the ticket for debugging
         :return: Parsed Ticked object
         """
-        self._fwf = FwfSlicer(FIXED_FORMAT)
-        self.text = text
+        fwf = fwf or compile_fixed_format()
+        self.text = text if keep_raw else None
 
         # Parsing definition
-        self.number = int(self._get_col(1).strip())
-        self.current_status = self._get_col(7).strip()
-        self.last_revised = datetime.strptime(self._get_col(8).strip(), '%m/%d/%Y %H:%M')
-        self.approval_risk = self._get_col(9).strip()
-        self.rtep = self._get_col(11).strip()
-        self.previous_status = self._get_col(12).strip()
+        self.number = int(fwf.column(text, 'ticket').strip())
+        self.current_status = fwf.column(text, 'status').strip()
+        self.last_revised = decode_timestamp(fwf.column(text, 'last_revised').strip())
+        self.approval_risk = fwf.column(text, 'approval_risk').strip()
+        self.rtep = fwf.column(text, 'rtep').strip()
+        self.previous_status = fwf.column(text, 'previous_status').strip()
+
+        availability_value = fwf.column(text, 'availability').strip()
+        if availability_value == 'Duration':
+            self.availability = ''
+        else:
+            self.availability = availability_value
+
+        # The outage type sits on the second line of the ticket, None if it is missing
+        lines = text.split('\n', 2)
+        second_line = lines[1] if len(lines) > 1 else ''
+        layout = compile_ticket_layout(fwf)
+        if layout.holds(second_line, OUTAGE_TYPE_LINE):
+            self._outage_type = second_line[layout.entry_slices[OUTAGE_TYPE_LINE]['outage_type']].strip()
+        else:
+            self._outage_type = None
 
         # Related entities
         self.outages = []
@@ -113,37 +654,14 @@ class Ticket(object):
         self.date_log = []
         self.history_log = []
 
-    def _get_col(self, idx):
-        """
-        Helper function to retrieve columns from text snippet
-        :param idx:
-        :return:
-        """
-        return self.text[self._fwf.column_slices[idx]]
-
-    @property
-    def availability(self):
-        """
-        Parsing definition for availability attribute
-        """
-        availability_value = self._get_col(10).strip()
-        if availability_value == 'Duration':
-            return ''
-        else:
-            return availability_value
-
     @property
     def outage_type(self):
         """
         Parsing definition for outage type attribute
         """
-
-        second_line = self.text.splitlines()[1]
-        if not second_line[108] == '(':
+        if self._outage_type is None:
             raise ParsingException
-        if not second_line[135:136] == ')':
-            raise ParsingException
-        return second_line[109:135].strip()
+        return self._outage_type
 
 
 class Cause(object):
@@ -151,70 +669,72 @@ class Cause(object):
     The Cause entity in the textfile
     """
 
-    def __init__(self, line):
+    __slots__ = ('cause',)
+
+    def __init__(self, line, layout=None):
         """
         Parse text related to a cause into a cause object
 
         :param line: Raw text that corresponds to a single cause
+        :param layout: Compiled TicketLayout, defaults to the shared layout for FIXED_FORMAT
         :return: Parsed Cause object
         """
+        layout = layout or compile_ticket_layout()
+
         # Throw an exception if we don't see the parenthesis that mark a cause
-        if not line[108] == '(':
-            raise ParsingException
-        if not line[159:160] == ')':
+        if not layout.holds(line, CAUSE_LINE):
             raise ParsingException
 
         # Parsing definitions
-        self.cause = line[109:159].strip()
+        self.cause = line[layout.entry_slices[CAUSE_LINE]['cause']].strip()
 
 
 class Outage(object):
     """
     The outage entity in the textfile
+
+    Uses __slots__ and drops the raw line unless keep_raw is set.
     """
 
-    def __init__(self, line):
+    __slots__ = ('zone', 'equipment_type', 'station', 'facility_name', 'voltage', 'voltage_measurement_unit',
+                 'start_time', 'end_time', 'open_closed', 'line')
+
+    def __init__(self, line, fwf=None, keep_raw=False):
         """
         Parse text related to an outage into an outage object
 
         :param line: Raw text that corresponds to a single outage
+        :param fwf: Compiled FwfSlicer, defaults to the shared slicer for FIXED_FORMAT
+        :param keep_raw: Keep the raw line on the outage for debugging
         :return: Parsed Outage object
         """
+        fwf = fwf or compile_fixed_format()
+        layout = compile_ticket_layout(fwf)
+
         # Throw an exception if we are not in the outage section of the ticket
-        if not line[:107].strip():
+        if not line[:layout.outage_end].strip():
             raise ParsingException
 
-        self._fwf = FwfSlicer(FIXED_FORMAT)
-        self.line = line
+        self.line = line if keep_raw else None
 
         # Parsing definitions
-        self.zone = self._get_col(2).strip()
-        self.equipment_type = self._get_col(3)[1:5]
-        self.station = self._get_col(3)[6:14].strip()
-        self.facility_name = self._get_col(3)[21:].strip()
-        self.start_time = datetime.strptime(self._get_col(4).strip(), '%d-%b-%Y %H%M')
-        self.end_time = datetime.strptime(self._get_col(5).strip(), '%d-%b-%Y %H%M')
-        self.open_closed = self._get_col(6).strip()
-
-    def _get_col(self, idx):
-        """
-        Helper function to retrieve columns from text snippet
-        :param idx:
-        :return:
-        """
-        return self.line[self._fwf.column_slices[idx]]
-
-    @property
-    def voltage(self):
-        full_facility_name = self.line[self._fwf.column_slices[3]]
-        voltage_col = full_facility_name[15:21]
-        return int(''.join([c for c in voltage_col if c.isdigit()]))
-
-    @property
-    def voltage_measurement_unit(self):
-        full_facility_name = self.line[self._fwf.column_slices[3]]
-        voltage_col = full_facility_name[15:21]
-        return ''.join([c for c in voltage_col if c.isalpha()])
+        columns = fwf.extract(line)
+        positions = fwf.positions
+        facility = columns[positions['facility']]
+        facility_slices = layout.facility_slices
+        self.zone = columns[positions['zone']].strip()
+        self.equipment_type = facility[facility_slices['equipment_type']]
+        self.station = facility[facility_slices['station']].strip()
+        self.facility_name = facility[facility_slices['facility_name']].strip()
+        self.start_time = decode_outage_time(columns[positions['start']].strip())
+        self.end_time = decode_outage_time(columns[positions['end']].strip())
+        self.open_closed = columns[positions['open_closed']].strip()
+
+        # Voltage is None when the voltage column holds no digits
+        voltage_col = facility[facility_slices['voltage']]
+        voltage_digits = ''.join([c for c in voltage_col if c.isdigit()])
+        self.voltage = int(voltage_digits) if voltage_digits else None
+        self.voltage_measurement_unit = ''.join([c for c in voltage_col if c.isalpha()])
 
 
 class DateEntry(object):
@@ -222,23 +742,27 @@ class DateEntry(object):
     The date entry entity in the textfile located in the bottom right of a ticket
     """
 
-    def __init__(self, line):
+    __slots__ = ('start_time', 'end_time', 'time_stamp')
+
+    def __init__(self, line, layout=None):
         """
         Parse text related to a date entry into a DateEntry object
 
         :param line: Raw text line that corresponds to a single date entry
+        :param layout: Compiled TicketLayout, defaults to the shared layout for FIXED_FORMAT
         :return: Parsed DateEntry object
         """
+        layout = layout or compile_ticket_layout()
+
         # Throw an exception if we don't see the parenthesis that mark a date entry
-        if not line[108] == '(':
-            raise ParsingException
-        if not line[164:165] == ')':
+        if not layout.holds(line, DATE_ENTRY_LINE):
             raise ParsingException
 
         # Parsing definitions
-        self.start_time = datetime.strptime(line[109:125], '%d-%b-%Y %H%M')
-        self.end_time = datetime.strptime(line[128:144], '%d-%b-%Y %H%M')
-        self.time_stamp = datetime.strptime(line[148:164], '%m/%d/%Y %H:%M')
+        slices = layout.entry_slices[DATE_ENTRY_LINE]
+        self.start_time = decode_outage_time(line[slices['start_time']])
+        self.end_time = decode_outage_time(line[slices['end_time']])
+        self.time_stamp = decode_timestamp(line[slices['time_stamp']])
 
 
 class HistoryEntry(object):
@@ -246,21 +770,25 @@ class HistoryEntry(object):
     The date entry entity in the textfile located in the bottom right of a ticket
     """
 
-    def __init__(self, line):
+    __slots__ = ('status', 'time_stamp')
+
+    def __init__(self, line, layout=None):
         """
         Parse text related to a history entry in the history log into a HistoryEntry
 
         :param line: Raw text line that corresponds to a single history entry
+        :param layout: Compiled TicketLayout, defaults to the shared layout for FIXED_FORMAT
         :return: Parsed HistoryEntry object
         """
+        layout = layout or compile_ticket_layout()
+
         # Throw an exception if we don't see the parenthesis that mark a history entry
-        if not line[108] == '(':
-            raise ParsingException
-        if not line[138:139] == ')':
+        if not layout.holds(line, HISTORY_ENTRY_LINE):
             raise ParsingException
 
-        self.status = line[109:122].strip()
-        self.time_stamp = datetime.strptime(line[122:138], '%m/%d/%Y %H:%M')
+        slices = layout.entry_slices[HISTORY_ENTRY_LINE]
+        self.status = line[slices['status']].strip()
+        self.time_stamp = decode_timestamp(line[slices['time_stamp']])
 
 
 def scrape_PJM_outage_file(source):
@@ -269,7 +797,27 @@ def scrape_PJM_outage_file(source):
     :param source: Filepath of file to parse
     :return: OutageParser object that contains all related entities
     """
-    with open(source, 'rU') as pjm_outage_file:
+    with open(source) as pjm_outage_file:
         pjm_data = pjm_outage_file.read()
 
     return OutageParser(pjm_data)
+
+
+def map_PJM_outage_file(source):
+    """
+    Maps outage file into memory and parses each ticket on access
+    :param source: Filepath of file to parse
+    :return: OutageParser object backed by the mapped file, close it when done
+    """
+    return OutageParser.from_mmap(source)
+
+
+def iter_PJM_outage_file(source):
+    """
+    Streams tickets out of an outage file without reading the whole file into memory
+    :param source: Filepath of file to parse
+    :return: Generator of parsed Ticket objects
+    """
+    with open(source) as pjm_outage_file:
+        for ticket in OutageParser.iter_tickets(pjm_outage_file):
+            yield ticket
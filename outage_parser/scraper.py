@@ -1,40 +1,132 @@
 """"
 main file of scraper to retrieve outage information in the PJM area
 retrieve from: https://edart.pjm.com/reports/linesout.txt
-
-Code is windows specific and not made to port to unix systems
 """
 
 import requests
-from os import getcwd
+from os import getcwd, path, remove, replace
 from time import gmtime, strftime
 
+from .archive import snapshot_timestamp
+from .snapshot_store import store_source
+
 OUTAGE_URL = 'https://edart.pjm.com/reports/linesout.txt'
 
+# Size of the blocks written to disk while streaming a download
+CHUNK_SIZE = 64 * 1024
+
 
 class OutageFileIO(object):
     """
     Handles Input Output operations between web, disk, and python
+
+    Keeps one HTTP session with keep-alive and remembers the ETag and Last-Modified validators of the
+    last response whose body was fully received, so asking again for an unchanged file returns 304 without
+    a body.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, session=None):
         self.url = url
         self.text = ''
+        self.session = session or requests.Session()
+        self.etag = None
+        self.last_modified = None
+        self.status_code = None
+
+    def _request(self, stream, timeout):
+        """
+        Helper function to send a conditional GET request
+        :param stream: Stream the body instead of reading it at once
+        :param timeout: Timeout in seconds for connecting and reading
+        :return: Response, None if the file did not change since the last request, the caller remembers its
+        validators once the body is received
+        """
+        headers = {'Accept-Encoding': 'gzip'}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        response = self.session.get(self.url, headers=headers, stream=stream, timeout=timeout)
+        self.status_code = response.status_code
+        if response.status_code == requests.codes.not_modified:
+            response.close()
+            return None
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        return response
+
+    def _remember_validators(self, response):
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+
+    def get(self, timeout=None):
+        """
+        Download the outage file into memory
+        :param timeout: Timeout in seconds for connecting and reading
+        :return: True if a new file was downloaded, False if it did not change
+        """
+        response = self._request(stream=False, timeout=timeout)
+        if response is None:
+            return False
+        self.text = response.text
+        self._remember_validators(response)
+        return True
 
-    def get(self):
-        outage_text = requests.get(self.url)
-        self.text = outage_text.text
+    def download(self, directory, timeout=None):
+        """
+        Stream the outage file straight to disk without keeping it in memory
+        :param directory: Directory to write PJM text file to
+        :param timeout: Timeout in seconds for connecting and reading
+        :return: Filepath written to, None if the file did not change
+        """
+        response = self._request(stream=True, timeout=timeout)
+        if response is None:
+            return None
+
+        target = snapshot_path(directory)
+        temp_target = target + '.part'
+        try:
+            with open(temp_target, 'wb') as text_file:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    text_file.write(chunk)
+            replace(temp_target, target)
+        except Exception:
+            if path.exists(temp_target):
+                remove(temp_target)
+            raise
+        finally:
+            response.close()
+        self._remember_validators(response)
+        return target
 
     def save(self, directory):
-        now = strftime("%Y-%m-%d_%H_%M_%S", gmtime())
-        file_name = 'PJM_outages_' + now + '.txt'
-        target = directory + '\\' + file_name
+        target = snapshot_path(directory)
         with open(target, "w") as text_file:
             text_file.write(self.text)
         text_file.close()
+        return target
+
+
+def snapshot_path(directory):
+    """
+    Build the filepath of a new snapshot named after the current time
+    :param directory: Directory to write PJM text file to
+    :return: Filepath of the snapshot
+    """
+    now = strftime("%Y-%m-%d_%H_%M_%S", gmtime())
+    file_name = 'PJM_outages_' + now + '.txt'
+    return path.join(directory, file_name)
+
+
+# OutageFileIO of each url used by retrieve_PJM_outages, so the session and validators outlive a call
+_outage_files = {}
 
 
-def retrieve_PJM_outages(directory, url=OUTAGE_URL):
+def retrieve_PJM_outages(directory, url=OUTAGE_URL, index=None, store=None, outage_file=None):
     """
     Retrieves PJM outage data from the internet.
     Retrieve means load, save on disk, and return from the function.
@@ -42,11 +134,27 @@ def retrieve_PJM_outages(directory, url=OUTAGE_URL):
     :param directory: Directory to write PJM text file to
     :param url: The source of PJM outage data.
     Default is at https://edart.pjm.com/reports/linesout.txt
+    :param index: Optional SnapshotIndex, the file is not saved when its content did not change
+    :param store: Optional SnapshotStore the snapshot is appended to instead of writing a file to directory
+    :param outage_file: Optional OutageFileIO, defaults to one kept for url between calls. Nothing is saved
+    when the server answers that the file did not change since its last download.
     :return: A string containing raw PJM outage data
     """
-    outage_file = OutageFileIO(url)
-    outage_file.get()
-    outage_file.save(directory)
+    if outage_file is None:
+        if url not in _outage_files:
+            _outage_files[url] = OutageFileIO(url)
+        outage_file = _outage_files[url]
+    if not outage_file.get():
+        return outage_file.text
+    if index is not None and index.is_unchanged(outage_file.text):
+        return outage_file.text
+    if store is not None:
+        entry = store.append(snapshot_timestamp(snapshot_path(directory)), outage_file.text)
+        source = store_source(entry)
+    else:
+        source = outage_file.save(directory)
+    if index is not None:
+        index.add(outage_file.text, source)
     return outage_file.text
 
 
@@ -0,0 +1,124 @@
+"""
+Content hash index of outage snapshots so unchanged downloads are neither saved nor parsed twice
+"""
+
+import json
+from collections import OrderedDict
+from hashlib import sha1
+from os import path, replace
+
+from .outage_parser import OutageParser, FIXED_FORMAT
+
+
+def normalize_snapshot(text, fixed_format=FIXED_FORMAT):
+    """
+    Reduce a snapshot to the part that changes when outages change
+
+    Everything before the first fixed format line (the report header with its generation time) is
+    dropped, as are carriage returns and blank lines.
+    :param text: Raw text of an outage file
+    :param fixed_format: Fixed format line that separates tickets
+    :return: Normalized text
+    """
+    start = text.find(fixed_format)
+    if start > 0:
+        text = text[start:]
+    return '\n'.join(line for line in text.replace('\r', '').split('\n') if line)
+
+
+def snapshot_digest(text):
+    """
+    Hash of the normalized snapshot text
+    :param text: Raw text of an outage file
+    :return: Hex digest
+    """
+    return sha1(normalize_snapshot(text).encode('utf-8')).hexdigest()
+
+
+class SnapshotIndex(object):
+    """
+    Persistent index of snapshot digests with an in memory cache of parsed snapshots
+
+    The index remembers the digest of the last saved snapshot and the file each digest was first
+    saved to; it is stored as JSON next to the snapshots.
+    """
+
+    def __init__(self, index_path, cache_size=4):
+        """
+        Initialize snapshot index
+        :param index_path: Filepath of the JSON index, created on first save
+        :param cache_size: Number of parsed snapshots kept in memory
+        :return: Load the index from disk if it exists
+        """
+        self.index_path = index_path
+        self.cache_size = cache_size
+        self.latest = None
+        self.snapshots = {}
+        if path.exists(index_path):
+            with open(index_path) as index_file:
+                index = json.load(index_file)
+            self.latest = index['latest']
+            self.snapshots = index['snapshots']
+
+        # Counters for the unchanged check and for the parse cache
+        self.hits = 0
+        self.misses = 0
+        self.parse_hits = 0
+        self.parse_misses = 0
+        self._parsers = OrderedDict()
+
+    def is_unchanged(self, text):
+        """
+        Check whether a snapshot has the same content as the last saved one
+        :param text: Raw text of an outage file
+        :return: True if the content did not change
+        """
+        if snapshot_digest(text) == self.latest:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, text, source):
+        """
+        Record a saved snapshot as the latest one and write the index to disk
+        :param text: Raw text of the saved outage file
+        :param source: Filepath the snapshot was saved to, or snapshot_store.store_source of the stored snapshot
+        :return: Digest of the snapshot
+        """
+        digest = snapshot_digest(text)
+        self.latest = digest
+        self.snapshots.setdefault(digest, source)
+
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as index_file:
+            json.dump({'latest': self.latest, 'snapshots': self.snapshots}, index_file)
+        replace(temp_path, self.index_path)
+        return digest
+
+    def source(self, text):
+        """
+        Look up the file a snapshot with the same content was first saved to
+        :param text: Raw text of an outage file
+        :return: Filepath or store source as given to add, None if the content was never saved
+        """
+        return self.snapshots.get(snapshot_digest(text))
+
+    def parse(self, text):
+        """
+        Parse a snapshot, returning the cached parser when the same content was parsed recently
+        :param text: Raw text of an outage file
+        :return: OutageParser, shared between calls with identical content
+        """
+        digest = snapshot_digest(text)
+        outage_parser = self._parsers.pop(digest, None)
+        if outage_parser is None:
+            self.parse_misses += 1
+            outage_parser = OutageParser(text)
+        else:
+            self.parse_hits += 1
+
+        self._parsers[digest] = outage_parser
+        while len(self._parsers) > self.cache_size:
+            self._parsers.popitem(last=False)
+        return outage_parser
@@ -0,0 +1,262 @@
+"""
+Compressed, append-only store of outage snapshots
+
+Snapshots are appended to one segment file per month. Every keyframe_interval-th snapshot is stored
+whole, the others as a line delta against the previous snapshot; both are zlib compressed. A tab
+separated index maps each poll time to its segment, offset and length so any snapshot can be read back
+by time.
+"""
+
+import json
+import zlib
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+from difflib import SequenceMatcher
+from os import makedirs, path, remove
+
+from .archive import list_snapshots, snapshot_timestamp
+from .outage_parser import OutageParser
+
+INDEX_FILE_NAME = 'index.tsv'
+INDEX_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Kinds of stored records
+KEYFRAME = 'key'
+DELTA = 'delta'
+
+IndexEntry = namedtuple('IndexEntry', ['timestamp', 'segment', 'offset', 'length', 'kind'])
+
+
+def store_source(entry):
+    """
+    Source to record in a SnapshotIndex for a snapshot kept in a store rather than in a file
+    :param entry: IndexEntry returned by SnapshotStore.append
+    :return: Poll time of the snapshot in INDEX_TIMESTAMP_FORMAT, read it back with SnapshotStore.get_source
+    """
+    return entry.timestamp.strftime(INDEX_TIMESTAMP_FORMAT)
+
+
+def encode_delta(previous_lines, lines):
+    """
+    Describe lines as ranges copied from the previous snapshot plus the lines that are new
+    :param previous_lines: Lines of the previous snapshot
+    :param lines: Lines of the snapshot to encode
+    :return: List of [start, end] ranges into previous_lines and lists of new lines
+    """
+    operations = []
+    matcher = SequenceMatcher(None, previous_lines, lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.append([i1, i2])
+        elif j2 > j1:
+            operations.append(lines[j1:j2])
+    return operations
+
+
+def decode_delta(previous_lines, operations):
+    """
+    Rebuild the lines of a snapshot from the previous snapshot and its delta
+    :param previous_lines: Lines of the previous snapshot
+    :param operations: Delta built by encode_delta
+    :return: Lines of the snapshot
+    """
+    lines = []
+    for operation in operations:
+        if operation and isinstance(operation[0], int):
+            lines.extend(previous_lines[operation[0]:operation[1]])
+        else:
+            lines.extend(operation)
+    return lines
+
+
+class SnapshotStore(object):
+    """
+    Append-only snapshot store with random access by time
+    """
+
+    def __init__(self, directory, keyframe_interval=96, level=9):
+        """
+        Initialize snapshot store, the directory is created if needed
+        :param directory: Directory holding the segments and the index
+        :param keyframe_interval: Store every keyframe_interval-th snapshot whole, bounding the deltas to decode
+        :param level: zlib compression level
+        :return: Load the index from disk
+        """
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.entries = []
+        self.timestamps = []
+        self._last_lines = None
+
+        if not path.isdir(directory):
+            makedirs(directory)
+        index_path = path.join(directory, INDEX_FILE_NAME)
+        if path.exists(index_path):
+            with open(index_path) as index_file:
+                for row in index_file:
+                    timestamp, segment, offset, length, kind = row.rstrip('\n').split('\t')
+                    self._remember(IndexEntry(datetime.strptime(timestamp, INDEX_TIMESTAMP_FORMAT), segment,
+                                              int(offset), int(length), kind))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remember(self, entry):
+        self.entries.append(entry)
+        self.timestamps.append(entry.timestamp)
+
+    def _read_record(self, entry):
+        """
+        Helper function to read and decompress a single record
+        :param entry: IndexEntry of the record
+        :return: Keyframe lines or delta operations
+        """
+        with open(path.join(self.directory, entry.segment), 'rb') as segment_file:
+            segment_file.seek(entry.offset)
+            payload = zlib.decompress(segment_file.read(entry.length))
+        if entry.kind == KEYFRAME:
+            return payload.decode('utf-8').split('\n')
+        return json.loads(payload.decode('utf-8'))
+
+    def _lines_at(self, position):
+        """
+        Helper function to rebuild a snapshot from the closest keyframe at or before it
+        :param position: Position of the snapshot in the index
+        :return: Lines of the snapshot
+        """
+        start = position
+        while self.entries[start].kind != KEYFRAME:
+            start -= 1
+
+        lines = None
+        for entry in self.entries[start:position + 1]:
+            record = self._read_record(entry)
+            lines = record if entry.kind == KEYFRAME else decode_delta(lines, record)
+        return lines
+
+    def append(self, timestamp, text):
+        """
+        Add a snapshot at the end of the store
+        :param timestamp: Poll time of the snapshot, later than every stored snapshot
+        :param text: Raw text of the outage file
+        :return: IndexEntry of the new record
+        """
+        if self.timestamps and timestamp <= self.timestamps[-1]:
+            raise ValueError('Snapshots must be appended in time order')
+
+        lines = text.split('\n')
+        since_keyframe = 0
+        for entry in reversed(self.entries):
+            if entry.kind == KEYFRAME:
+                break
+            since_keyframe += 1
+
+        if not self.entries or since_keyframe + 1 >= self.keyframe_interval:
+            kind = KEYFRAME
+            payload = text
+        else:
+            if self._last_lines is None:
+                self._last_lines = self._lines_at(len(self.entries) - 1)
+            kind = DELTA
+            payload = json.dumps(encode_delta(self._last_lines, lines), separators=(',', ':'))
+        record = zlib.compress(payload.encode('utf-8'), self.level)
+
+        segment = timestamp.strftime('segment-%Y-%m.dat')
+        with open(path.join(self.directory, segment), 'ab') as segment_file:
+            offset = segment_file.tell()
+            segment_file.write(record)
+
+        entry = IndexEntry(timestamp, segment, offset, len(record), kind)
+        with open(path.join(self.directory, INDEX_FILE_NAME), 'a') as index_file:
+            index_file.write('\t'.join([timestamp.strftime(INDEX_TIMESTAMP_FORMAT), segment, str(offset),
+                                        str(len(record)), kind]) + '\n')
+        self._remember(entry)
+        self._last_lines = lines
+        return entry
+
+    def get(self, timestamp):
+        """
+        Read the snapshot that was current at a point in time
+        :param timestamp: Point in time
+        :return: Tuple of (poll time, raw text) of the latest snapshot at or before timestamp
+        """
+        position = bisect_right(self.timestamps, timestamp) - 1
+        if position < 0:
+            raise KeyError('No snapshot at or before {}'.format(timestamp))
+        return self.timestamps[position], '\n'.join(self._lines_at(position))
+
+    def get_source(self, source):
+        """
+        Read the snapshot a SnapshotIndex source recorded with store_source points at
+        :param source: Poll time in INDEX_TIMESTAMP_FORMAT
+        :return: Raw text of the snapshot
+        """
+        timestamp = datetime.strptime(source, INDEX_TIMESTAMP_FORMAT)
+        stored_timestamp, text = self.get(timestamp)
+        if stored_timestamp != timestamp:
+            raise KeyError('No snapshot at {}'.format(source))
+        return text
+
+    def iter_snapshots(self, start=None, end=None):
+        """
+        Stream snapshots in time order, decoding each delta against the one before it
+        :param start: Optional first poll time to include
+        :param end: Optional last poll time to include
+        :return: Generator of (poll time, raw text) tuples
+        """
+        first = 0 if start is None else bisect_right(self.timestamps, start) - 1
+        first = max(first, 0)
+        last = len(self.entries) if end is None else bisect_right(self.timestamps, end)
+
+        lines = None
+        for position in range(first, last):
+            entry = self.entries[position]
+            if lines is None:
+                lines = self._lines_at(position)
+            else:
+                record = self._read_record(entry)
+                lines = record if entry.kind == KEYFRAME else decode_delta(lines, record)
+            if start is None or entry.timestamp >= start:
+                yield entry.timestamp, '\n'.join(lines)
+
+    def iter_parsers(self, start=None, end=None):
+        """
+        Stream snapshots straight into the outage parser
+        :param start: Optional first poll time to include
+        :param end: Optional last poll time to include
+        :return: Generator of (poll time, OutageParser) tuples
+        """
+        for timestamp, text in self.iter_snapshots(start, end):
+            yield timestamp, OutageParser(text)
+
+    def append_file(self, source, remove_source=True):
+        """
+        Add a snapshot file saved by the scraper at the end of the store and remove the file
+        :param source: Filepath of the snapshot, named after its poll time by the scraper
+        :param remove_source: Remove the file once it is stored
+        :return: IndexEntry of the new record
+        """
+        timestamp = snapshot_timestamp(source)
+        if timestamp is None:
+            raise ValueError('{} is not named like a snapshot'.format(source))
+        with open(source) as pjm_outage_file:
+            entry = self.append(timestamp, pjm_outage_file.read())
+        if remove_source:
+            remove(source)
+        return entry
+
+    def import_directory(self, directory):
+        """
+        Append the .txt snapshots saved by the scraper that are newer than the store
+        :param directory: Directory the scraper saved snapshots to
+        :return: Number of imported snapshots
+        """
+        imported = 0
+        for timestamp, source in list_snapshots(directory):
+            if self.timestamps and timestamp <= self.timestamps[-1]:
+                continue
+            self.append_file(source, remove_source=False)
+            imported += 1
+        return imported
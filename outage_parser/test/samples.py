@@ -0,0 +1,33 @@
+"""
+Outage file text shared by the parser tests
+"""
+
+# Two tickets in the layout of the PJM planned outage file
+PARSER_SAMPLE = \
+"""+---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
+ 332 594137 AEP-IM   BRKR SORENSON 345 KV  SORENSON B            CB   01-NOV-2015 0800  24-NOV-2015 1600  O  Active   11/01/2015 07:40            Duration           Approved   |
+            AEP-IM   BRKR SORENSON 345 KV  SORENSON B2           CB   01-NOV-2015 0800  24-NOV-2015 1600  O (Continuous                )
+            AEP-IM   BRKR KEYSTNE  345 KV  KEYSTNE  A            CB   01-NOV-2015 0800  24-NOV-2015 1600  O (New Construction                                  )
+            AEP-IM   BRKR KEYSTNE  345 KV  KEYSTNE  C            CB   01-NOV-2015 0800  24-NOV-2015 1600  O                            |
+            AEP      LINE SORENSON 345 KV  SORENSON-KEYSTNE           01-NOV-2015 0800  24-NOV-2015 1600  O                            |
+                                                                                                            (01-NOV-2015 0800   24-NOV-2015 1600    03/24/2015 17:12)
+                                                                                                            (Active       11/01/2015 07:40)
+                                                                                                            (Approved     10/29/2015 14:16)
+                                                                                                            (Received     03/25/2015 15:55)
++---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
+ 333 616724 AEP      LINE DELAWARE 138 KV  DELAWARE-TANGY TIE         01-NOV-2015 0912  13-NOV-2015 1600  O  Active   11/06/2015 18:50            Duration           Submitted  |
+            AEP-OH   BRKR DELAWARE 138 KV  DELAWARE 106          CB   01-NOV-2015 0912  13-NOV-2015 1600  O (Continuous                )
+                                                                                                            (CB Maintenance                                    )
+                                                                                                            (01-NOV-2015 0912   13-NOV-2015 1600    11/06/2015 18:50)
+                                                                                                            (01-NOV-2015 0912   06-NOV-2015 1600    11/04/2015 20:41)
+                                                                                                            (01-NOV-2015 0912   04-NOV-2015 1600    11/03/2015 17:20)
+                                                                                                            (01-NOV-2015 0912   03-NOV-2015 1600    11/01/2015 09:05)
+                                                                                                            (Active       11/01/2015 09:12)
+                                                                                                            (Approved     11/01/2015 09:12)
++---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
+
+                                                                                                                    LAST_REVISED
+PLANNED OUTAGES (OUTAGE REQUEST RECEIVED BY PJM PLANNING PERSONNEL)                         OPEN/CLOSED---+ (. . . . outage type . . . )
+ITEM TICKET ZONE/CO  FACILITY_NAME                                     START_DATE TIME   END_DATE  TIME   | (. . . . c a u s e s . . . )
++---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
+"""
@@ -0,0 +1,44 @@
+import pickle
+from datetime import datetime
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from outages.outage_parser.archive import parse_archive, list_snapshots, snapshot_timestamp
+from outages.outage_parser.test.samples import PARSER_SAMPLE
+
+
+class TestParseArchive(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        for name, text in [('PJM_outages_2015-11-07_15_42_15.txt', PARSER_SAMPLE),
+                           ('PJM_outages_2015-11-07_15_41_15.txt', PARSER_SAMPLE.replace('594137', '594138')),
+                           ('notes.txt', '')]:
+            with open(path.join(self.directory, name), 'w') as snapshot_file:
+                snapshot_file.write(text)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_snapshot_timestamp_should_parse_file_name(self):
+        self.assertEqual(snapshot_timestamp('PJM_outages_2015-11-07_15_42_15.txt'), datetime(2015, 11, 7, 15, 42, 15))
+        self.assertIsNone(snapshot_timestamp('notes.txt'))
+
+    def test_list_snapshots_should_skip_other_files(self):
+        self.assertEqual(len(list_snapshots(self.directory)), 2)
+
+    def test_parse_archive_should_return_snapshots_in_timestamp_order(self):
+        snapshots = list(parse_archive(self.directory, workers=2, chunksize=1))
+        self.assertEqual([s.timestamp.minute for s in snapshots], [41, 42])
+        self.assertEqual(snapshots[0].tickets[0].number, 594138)
+        self.assertEqual(len(snapshots[1].tickets), 2)
+
+    def test_parse_archive_should_report_progress(self):
+        calls = []
+        list(parse_archive(self.directory, workers=1, progress=lambda done, total: calls.append((done, total))))
+        self.assertEqual(calls, [(1, 2), (2, 2)])
+
+    def test_parsed_snapshot_should_pickle(self):
+        snapshot = next(parse_archive(self.directory, workers=1))
+        restored = pickle.loads(pickle.dumps(snapshot))
+        self.assertEqual(restored.tickets[1].date_log[0].time_stamp, snapshot.tickets[1].date_log[0].time_stamp)
@@ -0,0 +1,92 @@
+import asyncio
+from http.server import HTTPServer
+from os import listdir, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Thread
+from unittest import TestCase, skipIf
+from outages.outage_parser.test.test_scraper import StandInHandler, OutageFileIO
+if OutageFileIO is not None:
+    from outages.outage_parser.daemon import OutagePoller
+    from outages.outage_parser.snapshot_index import SnapshotIndex
+    from outages.outage_parser.snapshot_store import SnapshotStore, store_source
+
+
+@skipIf(OutageFileIO is None, 'requests is not installed')
+class TestOutagePoller(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_port)
+        Thread(target=cls.server.serve_forever).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def run_poller(self, poller, polls):
+        async def stop_after_polls():
+            while poller.polls < polls:
+                await asyncio.sleep(0.01)
+            poller.stop()
+
+        async def run():
+            await asyncio.gather(poller.run(), stop_after_polls())
+
+        asyncio.run(run())
+
+    def test_poller_should_hand_only_new_snapshots_to_pipeline(self):
+        snapshots = []
+        poller = OutagePoller(self.directory, pipeline=snapshots.append, url=self.url + '/linesout.txt',
+                              interval=0.01, jitter=0)
+        self.run_poller(poller, 3)
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(poller.failures, 0)
+
+    def test_poller_with_store_should_remove_handled_snapshot_files(self):
+        snapshots = []
+        store = SnapshotStore(path.join(self.directory, 'store'))
+        index = SnapshotIndex(path.join(self.directory, 'index.json'))
+        poller = OutagePoller(self.directory, pipeline=snapshots.append, url=self.url + '/linesout.txt',
+                              interval=0.01, jitter=0, store=store, index=index)
+        self.run_poller(poller, 3)
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(sorted(listdir(self.directory)), ['index.json', 'store'])
+        self.assertEqual(len(store), 1)
+        self.assertEqual(index.snapshots[index.latest], store_source(store.entries[0]))
+
+    def test_poller_with_store_should_keep_files_the_pipeline_failed_on(self):
+        def failing_pipeline(target):
+            raise RuntimeError('load failed')
+
+        store = SnapshotStore(path.join(self.directory, 'store'))
+        poller = OutagePoller(self.directory, pipeline=failing_pipeline, url=self.url + '/linesout.txt',
+                              interval=0.01, jitter=0, store=store)
+        self.run_poller(poller, 1)
+        self.assertEqual(len([name for name in listdir(self.directory) if name.endswith('.txt')]), 1)
+        self.assertEqual(len(store), 1)
+
+    def test_poller_should_back_off_after_failures(self):
+        poller = OutagePoller(self.directory, url=self.url + '/error', interval=0.05, jitter=0, max_backoff=1)
+        self.run_poller(poller, 2)
+        self.assertEqual(poller.failures, 2)
+        self.assertEqual(poller.next_delay(), 0.2)
+        poller.failures = 10
+        self.assertEqual(poller.next_delay(), 1)
+        poller.failures = 5000
+        self.assertEqual(poller.next_delay(), 1)
+
+    def test_download_outliving_the_timeout_should_reach_pipeline(self):
+        snapshots = []
+        poller = OutagePoller(self.directory, pipeline=snapshots.append, url=self.url + '/slow', interval=0.01,
+                              jitter=0, timeout=0.1)
+        self.run_poller(poller, 1)
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(poller.snapshots, 1)
@@ -0,0 +1,29 @@
+from unittest import TestCase
+from outages.outage_parser.differ import diff_snapshots
+from outages.outage_parser.outage_parser import OutageParser
+from outages.outage_parser.test.samples import PARSER_SAMPLE
+
+
+class TestDiffSnapshots(TestCase):
+    def setUp(self):
+        self.old = OutageParser(PARSER_SAMPLE)
+
+    def test_identical_snapshots_should_have_empty_diff(self):
+        self.assertFalse(diff_snapshots(self.old, OutageParser(PARSER_SAMPLE)))
+
+    def test_changed_end_time_should_be_changed(self):
+        new = OutageParser(PARSER_SAMPLE.replace('13-NOV-2015 1600  O', '14-NOV-2015 1600  O'))
+        diff = diff_snapshots(self.old, new)
+        self.assertEqual((len(diff.added), len(diff.removed), len(diff.changed)), (0, 0, 2))
+        old_record, new_record = diff.changed[0]
+        self.assertEqual((old_record.end_time.day, new_record.end_time.day), (13, 14))
+
+    def test_new_ticket_number_should_be_added_and_removed(self):
+        new = OutageParser(PARSER_SAMPLE.replace('616724', '616725'))
+        diff = diff_snapshots(self.old, new)
+        self.assertEqual((len(diff.added), len(diff.removed), len(diff.changed)), (2, 2, 0))
+        self.assertEqual(set(record.ticket_number for record in diff.added), set([616725]))
+
+    def test_diff_should_accept_ticket_lists(self):
+        diff = diff_snapshots(self.old.tickets[:1], self.old.tickets)
+        self.assertEqual([record.facility_name for record in diff.added], ['DELAWARE-TANGY TIE', 'DELAWARE 106          CB'])
@@ -1,41 +1,22 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
 from datetime import datetime
+from io import StringIO
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from outages.outage_parser.outage_parser import HistoryEntry, DateEntry, Outage, Cause, Ticket, OutageParser, \
-    scrape_PJM_outage_file
-
+    LineClassifier, FwfSlicer, FIXED_FORMAT, compile_fixed_format, compile_ticket_layout, decode_outage_time, decode_timestamp, \
+    scrape_PJM_outage_file, map_PJM_outage_file
+from outages.outage_parser.test.samples import PARSER_SAMPLE
 
 
 class TestOutageParser(TestCase):
     def setUp(self):
-        unparsed = \
-"""+---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
- 332 594137 AEP-IM   BRKR SORENSON 345 KV  SORENSON B            CB   01-NOV-2015 0800  24-NOV-2015 1600  O  Active   11/01/2015 07:40            Duration           Approved   |
-            AEP-IM   BRKR SORENSON 345 KV  SORENSON B2           CB   01-NOV-2015 0800  24-NOV-2015 1600  O (Continuous                )
-            AEP-IM   BRKR KEYSTNE  345 KV  KEYSTNE  A            CB   01-NOV-2015 0800  24-NOV-2015 1600  O (New Construction                                  )
-            AEP-IM   BRKR KEYSTNE  345 KV  KEYSTNE  C            CB   01-NOV-2015 0800  24-NOV-2015 1600  O                            |
-            AEP      LINE SORENSON 345 KV  SORENSON-KEYSTNE           01-NOV-2015 0800  24-NOV-2015 1600  O                            |
-                                                                                                            (01-NOV-2015 0800   24-NOV-2015 1600    03/24/2015 17:12)
-                                                                                                            (Active       11/01/2015 07:40)
-                                                                                                            (Approved     10/29/2015 14:16)
-                                                                                                            (Received     03/25/2015 15:55)
-+---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
- 333 616724 AEP      LINE DELAWARE 138 KV  DELAWARE-TANGY TIE         01-NOV-2015 0912  13-NOV-2015 1600  O  Active   11/06/2015 18:50            Duration           Submitted  |
-            AEP-OH   BRKR DELAWARE 138 KV  DELAWARE 106          CB   01-NOV-2015 0912  13-NOV-2015 1600  O (Continuous                )
-                                                                                                            (CB Maintenance                                    )
-                                                                                                            (01-NOV-2015 0912   13-NOV-2015 1600    11/06/2015 18:50)
-                                                                                                            (01-NOV-2015 0912   06-NOV-2015 1600    11/04/2015 20:41)
-                                                                                                            (01-NOV-2015 0912   04-NOV-2015 1600    11/03/2015 17:20)
-                                                                                                            (01-NOV-2015 0912   03-NOV-2015 1600    11/01/2015 09:05)
-                                                                                                            (Active       11/01/2015 09:12)
-                                                                                                            (Approved     11/01/2015 09:12)
-+---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
-
-                                                                                                                    LAST_REVISED
-PLANNED OUTAGES (OUTAGE REQUEST RECEIVED BY PJM PLANNING PERSONNEL)                         OPEN/CLOSED---+ (. . . . outage type . . . )
-ITEM TICKET ZONE/CO  FACILITY_NAME                                     START_DATE TIME   END_DATE  TIME   | (. . . . c a u s e s . . . )
-+---+------+--------+------------------------------------------------+-----------------+-----------------+-+---------+-----------------+---------+---------+--------+-----------+
-"""
-        self.outage_parser = OutageParser(unparsed)
+        self.outage_parser = OutageParser(PARSER_SAMPLE)
 
     def test_outage_parser_should_return2_tickets(self):
         self.assertEqual(len(self.outage_parser.tickets), 2)
@@ -52,6 +33,224 @@ ITEM TICKET ZONE/CO  FACILITY_NAME                                     START_DAT
     def test_second_ticket_should_have_2_history_entries(self):
         self.assertEqual(len(self.outage_parser.tickets[1].history_log), 2)
 
+    def test_keep_raw_should_keep_outage_lines(self):
+        outage_parser = OutageParser(PARSER_SAMPLE, keep_raw=True)
+        self.assertTrue(outage_parser.tickets[0].outages[0].line.startswith(' 332 594137'))
+
+    def test_tickets_should_be_cached(self):
+        self.assertIs(self.outage_parser.tickets[0], self.outage_parser.tickets[0])
+
+    def test_ticket_lookup_should_only_parse_requested_ticket(self):
+        self.outage_parser.tickets[1]
+        self.assertEqual(self.outage_parser.tickets.parsed_count, 1)
+
+    def test_reparse_should_return_new_tickets(self):
+        first = self.outage_parser.tickets[0]
+        tickets = self.outage_parser.reparse()
+        self.assertEqual(len(tickets), 2)
+        self.assertIsNot(tickets[0], first)
+
+    def test_invalidate_should_pick_up_new_text(self):
+        self.outage_parser.tickets
+        self.outage_parser.text = PARSER_SAMPLE.replace('594137', '594138')
+        self.outage_parser.invalidate()
+        self.assertEqual(self.outage_parser.tickets[0].number, 594138)
+
+    def test_parse_statistics_should_count_line_kinds(self):
+        list(self.outage_parser.tickets)
+        statistics = self.outage_parser.parse_statistics
+        self.assertEqual(statistics['outage'], 7)
+        self.assertEqual(statistics['cause'], 2)
+        self.assertEqual(statistics['outage_type'], 2)
+        self.assertEqual(statistics['date_entry'], 5)
+        self.assertEqual(statistics['history_entry'], 5)
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class TestOutageColumns(TestCase):
+    def setUp(self):
+        self.columns = OutageParser(PARSER_SAMPLE).to_columns()
+
+    def test_columns_should_have_one_entry_per_outage(self):
+        self.assertEqual(len(self.columns), 7)
+        self.assertEqual(list(self.columns.ticket_number[:2]), [594137, 594137])
+        self.assertEqual(list(self.columns.line_number[:6]), [0, 1, 2, 3, 4, 0])
+
+    def test_times_should_be_datetime64(self):
+        self.assertEqual(self.columns.start_time[0], numpy.datetime64('2015-11-01T08:00'))
+        self.assertEqual(self.columns.end_time.dtype, numpy.dtype('datetime64[m]'))
+
+    def test_voltage_should_be_int16(self):
+        self.assertEqual(self.columns.voltage.dtype, numpy.int16)
+        self.assertEqual(int((self.columns.voltage == 345).sum()), 5)
+
+    def test_zone_codes_should_point_to_categories(self):
+        zones = [self.columns.zone_categories[code] for code in self.columns.zone_codes]
+        self.assertEqual(zones, ['AEP-IM', 'AEP-IM', 'AEP-IM', 'AEP-IM', 'AEP', 'AEP', 'AEP-OH'])
+
+
+class TestLineClassifier(TestCase):
+    def setUp(self):
+        self.classifier = LineClassifier()
+
+    def test_outage_with_cause_should_be_outage_and_cause(self):
+        line = "            AE       BRKR CARDIFF  230 KV  CARDIFF  AW CB        CB   09-DEC-2015 0600  09-DEC-2015 1800  O (Relay Maintenance (Impact to primary clearing)    )"
+        self.assertEqual(self.classifier.classify(line), (True, 'cause'))
+
+    def test_date_entry_should_not_be_outage(self):
+        line = "                                                                                                            (22-DEC-2015 0200   22-DEC-2015 1600    10/29/2015 07:50)"
+        self.assertEqual(self.classifier.classify(line), (False, 'date_entry'))
+
+    def test_history_entry_should_be_history_entry(self):
+        line = "                                                                                                            (Received     05/11/2015 13:57)"
+        self.assertEqual(self.classifier.classify(line), (False, 'history_entry'))
+
+    def test_short_blank_line_should_be_unrecognized(self):
+        self.assertEqual(self.classifier.classify('   '), (False, None))
+        self.assertEqual(self.classifier.counts['unrecognized'], 1)
+
+
+class TestMappedOutageFile(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def write(self, text):
+        source = path.join(self.directory, 'linesout.txt')
+        with open(source, 'wb') as pjm_outage_file:
+            pjm_outage_file.write(text.encode('utf-8'))
+        return source
+
+    def test_mapped_file_should_match_text_parser(self):
+        with map_PJM_outage_file(self.write('REPORT HEADER\n' + PARSER_SAMPLE)) as outage_parser:
+            self.assertEqual(len(outage_parser.tickets), 2)
+            self.assertEqual(len(outage_parser.tickets[1].date_log), 4)
+            self.assertEqual(outage_parser.tickets[0].outages[4].facility_name, 'SORENSON-KEYSTNE')
+
+    def test_mapped_file_should_only_decode_accessed_tickets(self):
+        with OutageParser.from_mmap(self.write(PARSER_SAMPLE)) as outage_parser:
+            self.assertEqual(outage_parser.tickets[1].number, 616724)
+            self.assertEqual(outage_parser.tickets.parsed_count, 1)
+
+    def test_mapped_file_should_scan_concatenated_files_with_windows_line_endings(self):
+        source = self.write((PARSER_SAMPLE + '\nREPORT HEADER\n\n' + PARSER_SAMPLE).replace('\n', '\r\n'))
+        with map_PJM_outage_file(source) as outage_parser:
+            self.assertEqual([t.number for t in outage_parser.tickets], [594137, 616724, 594137, 616724])
+            self.assertEqual(len(outage_parser.tickets[3].history_log), 2)
+
+    def test_empty_file_should_have_no_tickets(self):
+        with map_PJM_outage_file(self.write('')) as outage_parser:
+            self.assertEqual(len(outage_parser.tickets), 0)
+
+
+class TestFwfSlicer(TestCase):
+    def setUp(self):
+        self.fwf = compile_fixed_format()
+
+    def test_compiled_format_should_be_shared(self):
+        self.assertIs(compile_fixed_format(FIXED_FORMAT), self.fwf)
+
+    def test_slicer_should_be_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.fwf.column_slices = ()
+
+    def test_extract_should_return_every_column(self):
+        line = PARSER_SAMPLE.splitlines()[1]
+        columns = self.fwf.extract(line)
+        self.assertEqual(len(columns), 13)
+        self.assertEqual(columns[self.fwf.positions['ticket']].strip(), '594137')
+        self.assertEqual(self.fwf.column(line, 'zone').strip(), 'AEP-IM')
+
+    def test_slicer_should_use_given_format(self):
+        fwf = FwfSlicer('+--+---+', ('first', 'second'))
+        self.assertEqual(fwf.extract('abcdefgh'), ('abc', 'defg'))
+
+    def test_slicer_should_reject_wrong_number_of_column_names(self):
+        with self.assertRaises(ValueError):
+            FwfSlicer('+--+---+', ('first',))
+
+
+class TestTicketLayout(TestCase):
+    def setUp(self):
+        self.layout = compile_ticket_layout()
+
+    def test_layout_should_be_derived_from_fixed_format(self):
+        self.assertIs(compile_ticket_layout(compile_fixed_format()), self.layout)
+        self.assertEqual((self.layout.outage_end, self.layout.entry_start), (107, 108))
+        self.assertEqual(self.layout.closing_markers, ((164, 'date_entry'), (159, 'cause'), (138, 'history_entry'),
+                                                       (135, 'outage_type')))
+
+    def test_parser_should_follow_a_wider_column(self):
+        # Widen the zone column by two characters, every position to its right moves along
+        widened = FIXED_FORMAT[:12] + '--' + FIXED_FORMAT[12:]
+        text = '\n'.join(widened if line == FIXED_FORMAT else line[:12] + '  ' + line[12:]
+                         for line in PARSER_SAMPLE.split('\n'))
+        expected = OutageParser(PARSER_SAMPLE).tickets
+        tickets = OutageParser(text, fixed_format=widened).tickets
+        self.assertEqual(len(tickets), len(expected))
+        for ticket, expected_ticket in zip(tickets, expected):
+            self.assertEqual((ticket.number, ticket.last_revised, ticket.outage_type),
+                             (expected_ticket.number, expected_ticket.last_revised, expected_ticket.outage_type))
+            self.assertEqual([(o.zone, o.equipment_type, o.station, o.facility_name, o.voltage, o.end_time)
+                              for o in ticket.outages],
+                             [(o.zone, o.equipment_type, o.station, o.facility_name, o.voltage, o.end_time)
+                              for o in expected_ticket.outages])
+            self.assertEqual([c.cause for c in ticket.causes], [c.cause for c in expected_ticket.causes])
+            self.assertEqual([(d.start_time, d.end_time, d.time_stamp) for d in ticket.date_log],
+                             [(d.start_time, d.end_time, d.time_stamp) for d in expected_ticket.date_log])
+            self.assertEqual([(h.status, h.time_stamp) for h in ticket.history_log],
+                             [(h.status, h.time_stamp) for h in expected_ticket.history_log])
+
+
+class TestDateDecoders(TestCase):
+    def test_outage_time_should_match_strptime(self):
+        self.assertEqual(decode_outage_time('01-NOV-2015 0800'), datetime.strptime('01-NOV-2015 0800', '%d-%b-%Y %H%M'))
+
+    def test_outage_time_should_accept_lowercase_month(self):
+        self.assertEqual(decode_outage_time('29-Feb-2016 2359'), datetime(2016, 2, 29, 23, 59))
+
+    def test_timestamp_should_match_strptime(self):
+        self.assertEqual(decode_timestamp('11/01/2015 07:40'), datetime.strptime('11/01/2015 07:40', '%m/%d/%Y %H:%M'))
+
+    def test_timestamp_should_fall_back_to_strptime_for_other_layouts(self):
+        self.assertEqual(decode_timestamp('1/2/2015 7:40'), datetime(2015, 1, 2, 7, 40))
+
+    def test_invalid_dates_should_raise_value_error(self):
+        with self.assertRaises(ValueError):
+            decode_outage_time('31-NOV-2015 0800')
+        with self.assertRaises(ValueError):
+            decode_timestamp('13/01/2015 07:40')
+        with self.assertRaises(ValueError):
+            decode_timestamp('')
+
+
+class TestIterTickets(TestCase):
+    def setUp(self):
+        self.tickets = list(OutageParser.iter_tickets(StringIO(PARSER_SAMPLE)))
+
+    def test_iter_tickets_should_return_2_tickets(self):
+        self.assertEqual(len(self.tickets), 2)
+
+    def test_iter_tickets_should_match_tickets_property(self):
+        expected = OutageParser(PARSER_SAMPLE).tickets
+        self.assertEqual([t.number for t in self.tickets], [t.number for t in expected])
+        self.assertEqual([len(t.outages) for t in self.tickets], [len(t.outages) for t in expected])
+        self.assertEqual([len(t.date_log) for t in self.tickets], [len(t.date_log) for t in expected])
+
+    def test_iter_tickets_should_ignore_blank_lines_and_windows_line_endings(self):
+        unparsed = PARSER_SAMPLE.replace('\n', '\r\n\r\n')
+        tickets = list(OutageParser.iter_tickets(StringIO(unparsed, newline='')))
+        self.assertEqual(len(tickets[1].history_log), 2)
+
+    def test_iter_tickets_should_yield_before_end_of_file(self):
+        lines = iter(PARSER_SAMPLE.splitlines(True))
+        first = next(OutageParser.iter_tickets(lines))
+        self.assertEqual(first.number, 594137)
+        self.assertTrue(len(list(lines)) > 0)
+
+
 class TestTicket(TestCase):
     def setUp(self):
         unparsed = \
@@ -60,6 +259,7 @@ class TestTicket(TestCase):
             AEP      LINE HUNTINGT 138 KV  HUNTINGT-SORENSON          27-DEC-2015 0800  31-DEC-2015 1600  O (New Construction                                  )
                                                                                                                 (27-DEC-2015 0800   31-DEC-2015 1600    10/30/2015 13:40)
                                                                                                                 (Received     11/02/2015 08:17)"""
+        self.unparsed = unparsed
         self.ticket = Ticket(unparsed)
 
     def test_ticket_number_should_be_616617(self):
@@ -86,6 +286,14 @@ class TestTicket(TestCase):
     def test_ticket_outage_type_should_be_continuous(self):
         self.assertEqual(self.ticket.outage_type, 'Continuous')
 
+    def test_ticket_should_drop_raw_text_by_default(self):
+        self.assertIsNone(self.ticket.text)
+        self.assertFalse(hasattr(self.ticket, '__dict__'))
+
+    def test_ticket_should_keep_raw_text_when_asked(self):
+        ticket = Ticket(self.unparsed, keep_raw=True)
+        self.assertEqual(ticket.text, self.unparsed)
+
 
 class TestOutageFirstLine(TestCase):
     def setUp(self):
@@ -250,7 +458,7 @@ class TestHistoryEntry(TestCase):
 
 class TestScrapePJMOutageFile(TestCase):
     def setUp(self):
-        self.pjm = scrape_PJM_outage_file('C:\Users\Alexander\PycharmProjects\outage\outages\outage_parser\PJM_outages_2015-11-07_15_42_15.txt')
+        self.pjm = scrape_PJM_outage_file(r'C:\Users\Alexander\PycharmProjects\outage\outages\outage_parser\PJM_outages_2015-11-07_15_42_15.txt')
 
     def test_runs(self):
         tickets = self.pjm.tickets
@@ -0,0 +1,141 @@
+import gzip
+from os import listdir, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+from time import sleep
+from unittest import TestCase, skipIf
+try:
+    from requests import HTTPError, RequestException
+    from outages.outage_parser.scraper import OutageFileIO, retrieve_PJM_outages
+    from outages.outage_parser.snapshot_index import SnapshotIndex
+    from outages.outage_parser.snapshot_store import SnapshotStore, store_source
+except ImportError:
+    OutageFileIO = None
+
+BODY = 'PLANNED OUTAGES\n' * 1000
+ETAG = '"snapshot-1"'
+
+# The /slow body arrives in parts, each well within a request timeout of 0.1 seconds but all of them past it
+SLOW_PARTS = 5
+SLOW_PART_DELAY = 0.05
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves linesout.txt with an ETag, answers 304 to a matching If-None-Match, 500 on /error, cuts the
+    body short on /truncated and sends it in slow parts on /slow
+    """
+
+    def do_GET(self):
+        if self.path == '/error':
+            self.send_response(500)
+            self.end_headers()
+            return
+        if self.path == '/truncated':
+            body = BODY.encode('utf-8')
+            self.send_response(200)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(body) * 2))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path == '/slow' and self.headers.get('If-None-Match') != ETAG:
+            body = BODY.encode('utf-8')
+            self.send_response(200)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            part = len(body) // SLOW_PARTS + 1
+            for start in range(0, len(body), part):
+                sleep(SLOW_PART_DELAY)
+                self.wfile.write(body[start:start + part])
+                self.wfile.flush()
+            return
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = BODY.encode('utf-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+        else:
+            self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@skipIf(OutageFileIO is None, 'requests is not installed')
+class TestOutageFileIO(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_port)
+        Thread(target=cls.server.serve_forever).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.outage_file = OutageFileIO(self.url + '/linesout.txt')
+
+    def tearDown(self):
+        self.outage_file.session.close()
+        rmtree(self.directory)
+
+    def test_get_should_download_and_remember_etag(self):
+        self.assertTrue(self.outage_file.get())
+        self.assertEqual(self.outage_file.text, BODY)
+        self.assertEqual(self.outage_file.etag, ETAG)
+
+    def test_get_should_return_false_when_not_modified(self):
+        self.outage_file.get()
+        self.assertFalse(self.outage_file.get())
+        self.assertEqual(self.outage_file.status_code, 304)
+        self.assertEqual(self.outage_file.text, BODY)
+
+    def test_download_should_stream_to_disk(self):
+        target = self.outage_file.download(self.directory)
+        with open(target) as text_file:
+            self.assertEqual(text_file.read(), BODY)
+        self.assertIsNone(self.outage_file.download(self.directory))
+        self.assertEqual(listdir(self.directory), [path.basename(target)])
+
+    def test_truncated_download_should_keep_validators_and_no_partial_file(self):
+        outage_file = OutageFileIO(self.url + '/truncated')
+        with self.assertRaises(RequestException):
+            outage_file.download(self.directory)
+        self.assertIsNone(outage_file.etag)
+        self.assertEqual(listdir(self.directory), [])
+
+    def test_retrieve_with_store_should_not_write_snapshot_files(self):
+        store = SnapshotStore(path.join(self.directory, 'store'))
+        index = SnapshotIndex(path.join(self.directory, 'index.json'))
+        self.assertEqual(retrieve_PJM_outages(self.directory, index=index, store=store,
+                                              outage_file=self.outage_file), BODY)
+        self.assertEqual(sorted(listdir(self.directory)), ['index.json', 'store'])
+        self.assertEqual(index.source(BODY), store_source(store.entries[0]))
+        self.assertEqual(store.get_source(index.source(BODY)), BODY)
+
+    def test_retrieve_should_reuse_validators_between_calls(self):
+        self.assertEqual(retrieve_PJM_outages(self.directory, outage_file=self.outage_file), BODY)
+        self.assertEqual(retrieve_PJM_outages(self.directory, outage_file=self.outage_file), BODY)
+        self.assertEqual(self.outage_file.status_code, 304)
+        self.assertEqual(len(listdir(self.directory)), 1)
+
+    def test_error_should_raise(self):
+        outage_file = OutageFileIO(self.url + '/error')
+        with self.assertRaises(HTTPError):
+            outage_file.get()
@@ -0,0 +1,40 @@
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from outages.outage_parser.snapshot_index import SnapshotIndex, snapshot_digest
+from outages.outage_parser.test.samples import PARSER_SAMPLE
+
+
+class TestSnapshotIndex(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.index_path = path.join(self.directory, 'index.json')
+        self.index = SnapshotIndex(self.index_path)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_digest_should_ignore_report_header_and_blank_lines(self):
+        self.assertEqual(snapshot_digest('Report generated 11/07/2015 15:42\n' + PARSER_SAMPLE),
+                         snapshot_digest('Report generated 11/07/2015 15:43\n' + PARSER_SAMPLE.replace('\n', '\r\n\n')))
+
+    def test_digest_should_change_when_outages_change(self):
+        self.assertNotEqual(snapshot_digest(PARSER_SAMPLE), snapshot_digest(PARSER_SAMPLE.replace('0800', '0900')))
+
+    def test_unchanged_snapshot_should_count_hit(self):
+        self.assertFalse(self.index.is_unchanged(PARSER_SAMPLE))
+        self.index.add(PARSER_SAMPLE, 'first.txt')
+        self.assertTrue(self.index.is_unchanged(PARSER_SAMPLE))
+        self.assertEqual((self.index.hits, self.index.misses), (1, 1))
+
+    def test_index_should_persist(self):
+        self.index.add(PARSER_SAMPLE, 'first.txt')
+        index = SnapshotIndex(self.index_path)
+        self.assertTrue(index.is_unchanged(PARSER_SAMPLE))
+        self.assertEqual(index.source(PARSER_SAMPLE), 'first.txt')
+
+    def test_parse_should_reuse_parser_for_identical_content(self):
+        first = self.index.parse(PARSER_SAMPLE)
+        self.assertIs(self.index.parse(PARSER_SAMPLE), first)
+        self.assertEqual((self.index.parse_hits, self.index.parse_misses), (1, 1))
@@ -0,0 +1,71 @@
+from datetime import datetime
+from os import listdir, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from outages.outage_parser.snapshot_store import SnapshotStore, encode_delta, decode_delta
+from outages.outage_parser.test.samples import PARSER_SAMPLE
+
+
+class TestSnapshotStore(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.store = SnapshotStore(path.join(self.directory, 'store'), keyframe_interval=3)
+        self.texts = [PARSER_SAMPLE, PARSER_SAMPLE.replace('0800', '0900'), PARSER_SAMPLE.replace('594137', '594140'),
+                      PARSER_SAMPLE.replace('AEP-OH', 'AEP'), PARSER_SAMPLE]
+        for minute, text in enumerate(self.texts):
+            self.store.append(datetime(2015, 11, 7, 15, minute), text)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_delta_should_round_trip(self):
+        old, new = self.texts[0].split('\n'), self.texts[1].split('\n')
+        self.assertEqual(decode_delta(old, encode_delta(old, new)), new)
+
+    def test_store_should_mix_keyframes_and_deltas(self):
+        self.assertEqual([entry.kind for entry in self.store.entries], ['key', 'delta', 'delta', 'key', 'delta'])
+
+    def test_get_should_return_snapshot_current_at_time(self):
+        timestamp, text = self.store.get(datetime(2015, 11, 7, 15, 2, 30))
+        self.assertEqual(timestamp, datetime(2015, 11, 7, 15, 2))
+        self.assertEqual(text, self.texts[2])
+
+    def test_get_before_first_snapshot_should_raise(self):
+        with self.assertRaises(KeyError):
+            self.store.get(datetime(2015, 11, 7, 14, 0))
+
+    def test_store_should_reopen_from_disk(self):
+        store = SnapshotStore(self.store.directory)
+        self.assertEqual([text for _, text in store.iter_snapshots()], self.texts)
+        store.append(datetime(2015, 11, 7, 16, 0), self.texts[1])
+        self.assertEqual(store.get(datetime(2015, 11, 7, 16, 0))[1], self.texts[1])
+
+    def test_iter_snapshots_should_honour_window(self):
+        minutes = [timestamp.minute for timestamp, _ in
+                   self.store.iter_snapshots(datetime(2015, 11, 7, 15, 1, 30), datetime(2015, 11, 7, 15, 3))]
+        self.assertEqual(minutes, [2, 3])
+
+    def test_iter_parsers_should_feed_outage_parser(self):
+        numbers = [outage_parser.tickets[0].number for _, outage_parser in self.store.iter_parsers()]
+        self.assertEqual(numbers, [594137, 594137, 594140, 594137, 594137])
+
+    def test_append_out_of_order_should_raise(self):
+        with self.assertRaises(ValueError):
+            self.store.append(datetime(2015, 11, 7, 15, 0), PARSER_SAMPLE)
+
+    def test_append_file_should_store_and_remove_the_file(self):
+        source = path.join(self.directory, 'PJM_outages_2015-11-07_16_00_00.txt')
+        with open(source, 'w') as snapshot_file:
+            snapshot_file.write(self.texts[2])
+        self.assertEqual(self.store.append_file(source).timestamp, datetime(2015, 11, 7, 16, 0))
+        self.assertFalse(path.exists(source))
+        self.assertEqual(self.store.get(datetime(2015, 11, 7, 16, 0))[1], self.texts[2])
+
+    def test_import_directory_should_append_newer_snapshots(self):
+        for name in ['PJM_outages_2015-11-07_15_01_00.txt', 'PJM_outages_2015-11-07_15_10_00.txt']:
+            with open(path.join(self.directory, name), 'w') as snapshot_file:
+                snapshot_file.write(PARSER_SAMPLE)
+        self.assertEqual(self.store.import_directory(self.directory), 1)
+        self.assertEqual(len(self.store), 6)
+        self.assertEqual(sorted(listdir(self.store.directory)), ['index.tsv', 'segment-2015-11.dat'])
@@ -0,0 +1,254 @@
+"""
+SQL statements used by SQL.py
+
+Every statement takes its dates as bound %s parameters and is built once from a shared join, so the
+text of each query shape never changes between calls. The planned outage history is read through the view
+over its open and closed tables created by migrations/0005_closed_history.py.
+"""
+
+# Columns returned by every outage query, in order
+OUTAGE_COLUMNS = ('ticket_number', 'zoneName', 'equipmentName', 'equipmentType', 'voltageLevel',
+                  'voltageMeasurementUnit', 'startTime', 'endTime', 'openClosed', 'status', 'lastRevised',
+                  'approvalRisk', 'availability', 'rtepNumber', 'previousStatus')
+
+SELECT_OUTAGE_COLUMNS = 'SELECT ' + ', '.join('snapshot.' + column for column in OUTAGE_COLUMNS)
+
+# Change types tagging the rows of OUTAGE_DIFF
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED_TO = 'changed_to'
+CHANGED_FROM = 'changed_from'
+
+# Ticket columns of the outage queries
+TICKET_COLUMNS = ('ticket_number', 'status', 'lastRevised', 'approvalRisk', 'availability', 'rtepNumber',
+                  'previousStatus')
+
+# Columns of the outage rows joined to their ticket, zone and equipment. {outage} names the current or history
+# outage table and each ticket column is formatted with its expression
+BASE_COLUMNS = """
+      {ticket_number} AS ticket_number,
+      outages_zone.zoneName AS zoneName,
+      outages_equipment.equipmentName AS equipmentName,
+      outages_equipment.equipmentType AS equipmentType,
+      outages_equipment.voltageLevel AS voltageLevel,
+      outages_equipment.voltageMeasurementUnit AS voltageMeasurementUnit,
+      {outage}.startTime AS startTime,
+      {outage}.endTime AS endTime,
+      {outage}.openClosed AS openClosed,
+      {status} AS status,
+      {lastRevised} AS lastRevised,
+      {approvalRisk} AS approvalRisk,
+      {availability} AS availability,
+      {rtepNumber} AS rtepNumber,
+      {previousStatus} AS previousStatus,
+      {outage}.ticket_id AS ticket_id,
+      {outage}.facility_id AS facility_id,
+      {outage}.lineNumber AS lineNumber"""
+
+# Joins from the outage table to its ticket, zone and equipment
+BASE_JOINS = """{ticket_joins}
+      LEFT JOIN outages_zone
+        ON {outage}.zone_id = outages_zone.id
+      LEFT JOIN outages_equipment
+        ON {outage}.facility_id = outages_equipment.id
+"""
+
+# Outage rows joined to their ticket, zone and equipment
+BASE_JOIN = """
+    SELECT""" + BASE_COLUMNS + """
+    FROM {outage}""" + BASE_JOINS
+
+# View over the open and closed planned outage history tables
+HISTORIC_OUTAGE_VIEW = 'outages_allhistoricplannedoutage'
+
+CURRENT_TABLES = dict([(column, 'outages_currentticket.' + column) for column in TICKET_COLUMNS],
+                      outage='outages_currentplannedoutage', ticket_joins="""
+      LEFT JOIN outages_currentticket
+        ON outages_currentplannedoutage.ticket_id = outages_currentticket.id""")
+
+
+def historic_tables(outage):
+    """
+    Names to format BASE_COLUMNS and BASE_JOINS with for a planned outage history table. A ticket version is in
+    either the open or the closed ticket table under the same id, both are joined on their primary key rather
+    than through a view that would have to be read whole.
+    :param outage: History table or view of the outages
+    :return: Dictionary of format names
+    """
+    tables = dict((column, 'COALESCE(open_ticket.{0}, closed_ticket.{0})'.format(column)) for column in TICKET_COLUMNS)
+    tables['outage'] = outage
+    tables['ticket_joins'] = """
+      LEFT JOIN outages_historicticket AS open_ticket
+        ON {0}.ticket_id = open_ticket.id
+      LEFT JOIN outages_closedhistoricticket AS closed_ticket
+        ON {0}.ticket_id = closed_ticket.id""".format(outage)
+    return tables
+
+
+HISTORIC_TABLES = historic_tables(HISTORIC_OUTAGE_VIEW)
+
+CURRENT_JOIN = BASE_JOIN.format(**CURRENT_TABLES)
+
+HISTORIC_JOIN = BASE_JOIN.format(**HISTORIC_TABLES)
+
+# History rows valid at a point in time, takes the date twice
+VALID_AT = """(
+          {table}.validFrom < %s
+          AND (%s < {table}.validTo OR {table}.validTo IS NULL))"""
+
+# Joined history as it was at a point in time, takes the date twice
+HISTORIC_SNAPSHOT = '(' + HISTORIC_JOIN + '    WHERE ' + VALID_AT.format(table=HISTORIC_OUTAGE_VIEW) + ')'
+
+# Outages of {left} and {right} that are the same outage
+MATCH_KEY = """
+              {left}.ticket_id = {right}.ticket_id
+              AND {left}.facility_id = {right}.facility_id
+              AND {left}.lineNumber = {right}.lineNumber"""
+
+# Matched outages of {left} and {right} that differ
+CHANGED_FIELDS = """
+              AND ({left}.startTime != {right}.startTime
+                   OR {left}.endTime != {right}.endTime
+                   OR {left}.openClosed != {right}.openClosed)"""
+
+CURRENT_OUTAGES = SELECT_OUTAGE_COLUMNS + """
+FROM (""" + CURRENT_JOIN + """) AS snapshot"""
+
+# Parameters: date, date
+HISTORIC_OUTAGES = SELECT_OUTAGE_COLUMNS + """
+FROM """ + HISTORIC_SNAPSHOT + """ AS snapshot"""
+
+# Outages valid at the first date without a match at the second date. Parameters: date1, date1, date2, date2
+DIFF_MISSING_OUTAGES = SELECT_OUTAGE_COLUMNS + """
+FROM """ + HISTORIC_SNAPSHOT + """ AS snapshot
+WHERE NOT EXISTS(SELECT *
+                 FROM outages_allhistoricplannedoutage AS history
+                 WHERE """ + VALID_AT.format(table='history') + """
+                   AND""" + MATCH_KEY.format(left='snapshot', right='history') + """)"""
+
+# Outages valid at the first date whose match at the second date differs. Parameters: date1, date1, date2, date2
+DIFF_CHANGED_OUTAGES = SELECT_OUTAGE_COLUMNS + """
+FROM """ + HISTORIC_SNAPSHOT + """ AS snapshot
+WHERE EXISTS(SELECT *
+             FROM outages_allhistoricplannedoutage AS history
+             WHERE """ + VALID_AT.format(table='history') + """
+               AND""" + (MATCH_KEY + CHANGED_FIELDS).format(left='snapshot', right='history') + """)"""
+
+
+def _diff_branch(change_type, snapshot, other, condition):
+    """
+    Helper function to select the tagged rows of one change type from the two snapshots of OUTAGE_DIFF
+    :param change_type: Tag of the rows
+    :param snapshot: Snapshot the rows are taken from
+    :param other: Snapshot they are compared with
+    :param condition: EXISTS or NOT EXISTS followed by the comparison
+    :return: SELECT statement
+    """
+    columns = ', '.join(snapshot + '.' + column for column in OUTAGE_COLUMNS)
+    return """
+SELECT '{change_type}' AS changeType, {columns}
+FROM {snapshot}
+WHERE {condition}(SELECT *
+             FROM {other}
+             WHERE""".format(change_type=change_type, columns=columns, snapshot=snapshot, other=other,
+                             condition=condition)
+
+
+# Joined history valid at one point in time and not at another. A row valid at both times is its own match
+# and, with one version of an outage valid at any time, cannot be part of a diff. Parameters: date, date,
+# other date, other date
+CHANGED_SNAPSHOT = HISTORIC_JOIN + '    WHERE ' + VALID_AT.format(table=HISTORIC_OUTAGE_VIEW) + \
+    '\n      AND NOT ' + VALID_AT.format(table=HISTORIC_OUTAGE_VIEW)
+
+# Tagged rows of the diff between the snapshot1 and snapshot2 sets of OUTAGE_DIFF
+DIFF_BRANCHES = _diff_branch(ADDED, 'snapshot1', 'snapshot2', 'NOT EXISTS') + \
+    MATCH_KEY.format(left='snapshot1', right='snapshot2') + """)
+UNION ALL""" + _diff_branch(REMOVED, 'snapshot2', 'snapshot1', 'NOT EXISTS') + \
+    MATCH_KEY.format(left='snapshot2', right='snapshot1') + """)
+UNION ALL""" + _diff_branch(CHANGED_TO, 'snapshot1', 'snapshot2', 'EXISTS') + \
+    (MATCH_KEY + CHANGED_FIELDS).format(left='snapshot1', right='snapshot2') + """)
+UNION ALL""" + _diff_branch(CHANGED_FROM, 'snapshot2', 'snapshot1', 'EXISTS') + \
+    (MATCH_KEY + CHANGED_FIELDS).format(left='snapshot2', right='snapshot1') + """)"""
+
+# Added, removed, changed_to and changed_from outages in one statement, each row tagged with its change type
+# first. Both point-in-time sets are read once, without the rows they share.
+# Parameters: date1, date1, date2, date2, date2, date2, date1, date1
+OUTAGE_DIFF = """
+WITH snapshot1 AS (""" + CHANGED_SNAPSHOT + """),
+     snapshot2 AS (""" + CHANGED_SNAPSHOT + """)
+""" + DIFF_BRANCHES
+
+# Outages in the history as it was known at as_of whose outage window overlaps [active_from, active_to].
+# Parameters: as_of, as_of, active_to, active_from
+OUTAGES_AS_OF = SELECT_OUTAGE_COLUMNS + """
+FROM (""" + HISTORIC_JOIN + """    WHERE """ + VALID_AT.format(table=HISTORIC_OUTAGE_VIEW) + """
+      AND outages_allhistoricplannedoutage.startTime <= %s
+      AND outages_allhistoricplannedoutage.endTime >= %s) AS snapshot"""
+
+
+def outages_as_of_batch(count, placeholder='%s'):
+    """
+    OUTAGES_AS_OF for many requests in one statement, the requests are joined in as a VALUES list
+    :param count: Number of requests
+    :param placeholder: Parameter placeholder for the dates of the VALUES list, backends that do not infer
+    their type can cast it here
+    :return: Statement returning the request number first in each row.
+    Parameters: request number, as_of, active_from, active_to for each request
+    """
+    row = '(%s, {0}, {0}, {0})'.format(placeholder)
+    return """
+WITH requests (requestNumber, asOf, activeFrom, activeTo) AS (VALUES """ + ', '.join([row] * count) + """)
+SELECT """ + ', '.join('matches.' + column for column in ('requestNumber',) + OUTAGE_COLUMNS) + """
+FROM (
+    SELECT requests.requestNumber AS requestNumber,""" + BASE_COLUMNS.format(**HISTORIC_TABLES) + """
+    FROM requests
+      JOIN outages_allhistoricplannedoutage
+        ON outages_allhistoricplannedoutage.validFrom < requests.asOf
+          AND (requests.asOf < outages_allhistoricplannedoutage.validTo
+               OR outages_allhistoricplannedoutage.validTo IS NULL)
+          AND outages_allhistoricplannedoutage.startTime <= requests.activeTo
+          AND outages_allhistoricplannedoutage.endTime >= requests.activeFrom""" + \
+        BASE_JOINS.format(**HISTORIC_TABLES) + """) AS matches
+ORDER BY matches.requestNumber"""
+
+# History rows of a checkpoint still valid at a later point in time. Parameters: checkpoint id, date
+CHECKPOINT_ROWS = """outages_allhistoricplannedoutage.id IN (SELECT outage_id
+                                                   FROM outages_historycheckpointoutage
+                                                   WHERE checkpoint_id = %s)
+      AND (%s < outages_allhistoricplannedoutage.validTo OR outages_allhistoricplannedoutage.validTo IS NULL)"""
+
+# History rows written since a checkpoint and valid at a later point in time.
+# Parameters: checkpoint time, date, date
+ROWS_SINCE_CHECKPOINT = """%s <= outages_allhistoricplannedoutage.validFrom
+      AND """ + VALID_AT.format(table=HISTORIC_OUTAGE_VIEW)
+
+# Restricts both halves of a checkpoint snapshot to rows not valid at another point in time, for the diff.
+# Parameters: other date, other date
+NOT_VALID_AT = """
+      AND NOT """ + VALID_AT.format(table=HISTORIC_OUTAGE_VIEW)
+
+
+def checkpoint_snapshot(condition=''):
+    """
+    Joined history at a point in time, read from the rows of a checkpoint at or before it plus the rows written
+    since instead of the whole table. A row valid at the point in time and written before the checkpoint was
+    valid at the checkpoint too.
+    :param condition: Further condition on the history rows, added to both halves
+    :return: SELECT statement. Parameters: checkpoint id, date, condition parameters, checkpoint time, date, date,
+    condition parameters
+    """
+    return HISTORIC_JOIN + '    WHERE ' + CHECKPOINT_ROWS + condition + '\n    UNION ALL' + \
+        HISTORIC_JOIN + '    WHERE ' + ROWS_SINCE_CHECKPOINT + condition
+
+
+# HISTORIC_OUTAGES starting from a checkpoint. Parameters: checkpoint id, date, checkpoint time, date, date
+HISTORIC_OUTAGES_FROM_CHECKPOINT = SELECT_OUTAGE_COLUMNS + """
+FROM (""" + checkpoint_snapshot() + """) AS snapshot"""
+
+# OUTAGE_DIFF starting from a checkpoint for each date. Parameters: checkpoint1 id, date1, date2, date2,
+# checkpoint1 time, date1, date1, date2, date2, checkpoint2 id, date2, date1, date1, checkpoint2 time, date2, date2,
+# date1, date1
+OUTAGE_DIFF_FROM_CHECKPOINTS = """
+WITH snapshot1 AS (""" + checkpoint_snapshot(NOT_VALID_AT) + """),
+     snapshot2 AS (""" + checkpoint_snapshot(NOT_VALID_AT) + """)
+""" + DIFF_BRANCHES
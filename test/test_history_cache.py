@@ -0,0 +1,165 @@
+from datetime import datetime
+from unittest import TestCase
+from outages.history_cache import PointInTimeCache, GENERATION_CACHE_KEY, LOAD_CACHE_KEY, estimate_size
+
+
+class SharedCache(object):
+    """
+    Stand-in for the Django cache shared by the processes
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def get_many(self, keys):
+        return dict((key, self.values[key]) for key in keys if key in self.values)
+
+    def set(self, key, value, timeout):
+        self.values[key] = value
+
+    def add(self, key, value, timeout):
+        if key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+    def incr(self, key):
+        if key not in self.values:
+            raise ValueError('Key {} not found'.format(key))
+        self.values[key] += 1
+        return self.values[key]
+
+
+class InterleavingCache(SharedCache):
+    """
+    Shared cache that runs a load of another process right after a load asks for its number
+    """
+
+    def __init__(self):
+        super(InterleavingCache, self).__init__()
+        self.interleaved = None
+
+    def incr(self, key):
+        generation = super(InterleavingCache, self).incr(key)
+        interleaved, self.interleaved = self.interleaved, None
+        if interleaved is not None:
+            interleaved()
+        return generation
+
+
+class TestPointInTimeCache(TestCase):
+    def setUp(self):
+        self.shared = SharedCache()
+        self.cache = PointInTimeCache(shared=self.shared)
+        self.queries = []
+
+    def query(self, date):
+        self.queries.append(date)
+        return [(date.isoformat(), len(self.queries))]
+
+    def test_get_should_cache_by_minute(self):
+        first = self.cache.get(datetime(2015, 11, 7, 15, 42, 10), self.query)
+        second = self.cache.get(datetime(2015, 11, 7, 15, 42, 50), self.query)
+        self.assertEqual(first, second)
+        self.assertEqual(self.queries, [datetime(2015, 11, 7, 15, 42)])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_get_should_return_a_copy(self):
+        self.cache.get(datetime(2015, 11, 7, 15, 42), self.query).append('changed')
+        self.assertEqual(len(self.cache.get(datetime(2015, 11, 7, 15, 42), self.query)), 1)
+
+    def test_load_should_drop_entries_at_or_after_it(self):
+        for hour in (10, 12, 14):
+            self.cache.get(datetime(2015, 11, 7, hour), self.query)
+        self.cache.record_load(datetime(2015, 11, 7, 12, 0, 30))
+        self.assertEqual(list(self.cache.entries), [datetime(2015, 11, 7, 10)])
+        self.assertEqual(self.cache.load_generation(), 1)
+        self.assertEqual(self.shared.get(GENERATION_CACHE_KEY), 1)
+        self.assertEqual(self.shared.get(LOAD_CACHE_KEY.format(1)), datetime(2015, 11, 7, 12, 0, 30))
+
+    def test_load_in_another_process_should_drop_entries_at_or_after_it(self):
+        other = PointInTimeCache(shared=self.shared)
+        for hour in (10, 12):
+            self.cache.get(datetime(2015, 11, 7, hour), self.query)
+        other.record_load(datetime(2015, 11, 7, 11))
+        self.cache.get(datetime(2015, 11, 7, 10), self.query)
+        self.assertEqual(list(self.cache.entries), [datetime(2015, 11, 7, 10)])
+        self.assertEqual(self.cache.generation, 1)
+
+    def test_missed_loads_should_drop_entries_from_the_earliest(self):
+        other = PointInTimeCache(shared=self.shared)
+        for hour in (10, 12, 14):
+            self.cache.get(datetime(2015, 11, 7, hour), self.query)
+        other.record_load(datetime(2015, 11, 7, 13))
+        other.record_load(datetime(2015, 11, 7, 11))
+        self.assertEqual(self.cache.load_generation(), 2)
+        self.assertEqual(list(self.cache.entries), [datetime(2015, 11, 7, 10)])
+
+    def test_missed_load_that_expired_should_drop_every_entry(self):
+        other = PointInTimeCache(shared=self.shared)
+        self.cache.get(datetime(2015, 11, 7, 10), self.query)
+        other.record_load(datetime(2015, 11, 7, 12))
+        other.record_load(datetime(2015, 11, 7, 13))
+        del self.shared.values[LOAD_CACHE_KEY.format(1)]
+        self.assertEqual(self.cache.load_generation(), 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_concurrent_loads_in_two_processes_should_both_invalidate(self):
+        shared = InterleavingCache()
+        daemon = PointInTimeCache(shared=shared)
+        command = PointInTimeCache(shared=shared)
+        web = PointInTimeCache(shared=shared)
+        for hour in (10, 12, 14):
+            web.get(datetime(2015, 11, 7, hour), self.query)
+            daemon.get(datetime(2015, 11, 7, hour), self.query)
+
+        # The command's load runs between the daemon taking its number and publishing its since
+        shared.interleaved = lambda: command.record_load(datetime(2015, 11, 7, 11))
+        daemon.record_load(datetime(2015, 11, 7, 13))
+        self.assertEqual(shared.get(GENERATION_CACHE_KEY), 2)
+        self.assertEqual(sorted(shared.get(LOAD_CACHE_KEY.format(number)) for number in (1, 2)),
+                         [datetime(2015, 11, 7, 11), datetime(2015, 11, 7, 13)])
+        self.assertEqual(web.load_generation(), 2)
+        self.assertEqual(list(web.entries), [datetime(2015, 11, 7, 10)])
+        self.assertEqual(daemon.load_generation(), 2)
+        self.assertEqual(list(daemon.entries), [datetime(2015, 11, 7, 10)])
+
+    def test_evicted_shared_entry_should_drop_every_entry(self):
+        self.cache.record_load(datetime(2015, 11, 7, 12))
+        self.cache.get(datetime(2015, 11, 7, 10), self.query)
+        self.shared.values.clear()
+        self.assertEqual(self.cache.load_generation(), 0)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_result_computed_during_a_load_should_not_be_stored(self):
+        other = PointInTimeCache(shared=self.shared)
+
+        def query_during_load(date):
+            other.record_load(datetime(2015, 11, 7, 12))
+            return self.query(date)
+
+        self.assertEqual(len(self.cache.get(datetime(2015, 11, 7, 10), query_during_load)), 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_cache_should_evict_least_recently_used_beyond_max_bytes(self):
+        size = estimate_size(self.query(datetime(2015, 11, 7, 10)))
+        cache = PointInTimeCache(max_bytes=size * 2, shared=self.shared)
+        for hour in (10, 11):
+            cache.get(datetime(2015, 11, 7, hour), self.query)
+        cache.get(datetime(2015, 11, 7, 10), self.query)
+        cache.get(datetime(2015, 11, 7, 12), self.query)
+        self.assertEqual(list(cache.entries), [datetime(2015, 11, 7, 10), datetime(2015, 11, 7, 12)])
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_result_larger_than_max_bytes_should_not_be_stored(self):
+        cache = PointInTimeCache(max_bytes=1, shared=self.shared)
+        cache.get(datetime(2015, 11, 7, 10), self.query)
+        self.assertEqual(len(cache), 0)
+
+    def test_clear_should_drop_every_entry(self):
+        self.cache.get(datetime(2015, 11, 7, 10), self.query)
+        self.cache.clear()
+        self.assertEqual((len(self.cache), self.cache.size), (0, 0))
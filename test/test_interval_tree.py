@@ -0,0 +1,46 @@
+import random
+from unittest import TestCase
+from outages.interval_tree import IntervalTree
+
+
+class TestIntervalTree(TestCase):
+    def setUp(self):
+        generator = random.Random(20151107)
+        self.intervals = []
+        for value in range(500):
+            start = generator.randint(0, 1000)
+            self.intervals.append((start, start + generator.randint(0, 60), value))
+        self.tree = IntervalTree(self.intervals)
+
+    def expected(self, start, end):
+        return sorted(value for low, high, value in self.intervals if low <= end and high >= start)
+
+    def test_tree_should_count_intervals(self):
+        self.assertEqual(len(self.tree), 500)
+
+    def test_empty_tree_should_find_nothing(self):
+        tree = IntervalTree([])
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(tree.overlapping(0, 10), [])
+
+    def test_overlapping_should_match_a_scan(self):
+        generator = random.Random(1)
+        for _ in range(300):
+            start = generator.randint(-50, 1100)
+            end = start + generator.randint(0, 200)
+            self.assertEqual(sorted(self.tree.overlapping(start, end)), self.expected(start, end))
+
+    def test_stabbing_should_match_a_scan(self):
+        for point in range(-5, 1070, 7):
+            self.assertEqual(sorted(self.tree.stabbing(point)), self.expected(point, point))
+
+    def test_intervals_should_be_closed(self):
+        tree = IntervalTree([(10, 20, 'a'), (20, 30, 'b'), (31, 40, 'c')])
+        self.assertEqual(sorted(tree.stabbing(20)), ['a', 'b'])
+        self.assertEqual(sorted(tree.overlapping(30, 31)), ['b', 'c'])
+        self.assertEqual(tree.overlapping(41, 50), [])
+
+    def test_point_intervals_should_be_found(self):
+        tree = IntervalTree([(5, 5, 'point'), (0, 4, 'before')])
+        self.assertEqual(tree.stabbing(5), ['point'])
+        self.assertEqual(tree.overlapping(4, 4), ['before'])
@@ -0,0 +1,333 @@
+"""
+Tests of the models and queries on Django's test database, run with `python manage.py test outages`
+"""
+
+import warnings
+from datetime import datetime
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .dimensions import DimensionCache
+from .history_archive import ArchivedHistoryError, archive_closed_history, archived_outages_at
+from .history_cache import point_in_time_cache
+from .interval_index import OutageIntervalIndex, historic_querysets
+from .loader import load_outage_file
+from .models import Zone, Station, Equipment, HistoricTicket, HistoricPlannedOutage, ClosedHistoricPlannedOutage, \
+    HistoryArchive, CurrentPlannedOutage, HistoryCheckpoint, CurrentTicket, ClosedHistoricTicket
+from .outage_parser.outage_parser import OutageParser
+from .outage_parser.test.samples import PARSER_SAMPLE
+from .queries import HISTORIC_OUTAGES, OUTAGE_DIFF
+from .SQL import get_historic_outages, get_outage_diff, get_outages_as_of, get_outages_as_of_batch, _fetchall, \
+    _to_date_string, get_current_outages, get_diff_added_outages, get_diff_removed_outages, \
+    get_diff_changed_to_outages, get_diff_changed_from_outages
+
+LOAD_TIME = datetime(2015, 11, 7, 15, 42)
+NEXT_LOAD_TIME = datetime(2015, 11, 7, 16, 42)
+
+
+class HistoryTestCase(TestCase):
+    """
+    Test case with a zone, a station and two pieces of equipment to hang outages on
+    """
+
+    def setUp(self):
+        # The cached results and load generations would outlive the rolled back rows of earlier tests
+        cache.clear()
+        point_in_time_cache.clear()
+        self.zone = Zone.objects.create(zoneName='PECO')
+        self.station = Station.objects.create(stationName='BRADFORD')
+        self.line = Equipment.objects.create(equipmentName='BRADFORD 230 KV LINE', equipmentType='LINE',
+                                             station=self.station, voltageLevel=230, voltageMeasurementUnit='KV')
+        self.breaker = Equipment.objects.create(equipmentName='BRADFORD 230 KV BKR', equipmentType='BKR',
+                                                station=self.station, voltageLevel=230, voltageMeasurementUnit='KV')
+
+    def historic_ticket(self, number, valid_from=LOAD_TIME, valid_to=None):
+        return HistoricTicket.objects.create(
+            ticket_number=number, status='Approved', lastRevised=valid_from, outageType='Continuous',
+            approvalRisk='Low', availability='', rtepNumber='', previousStatus='Received', validFrom=valid_from,
+            validTo=valid_to, currentStatus='Y' if valid_to is None else 'N')
+
+    def historic_outage(self, ticket, facility, start, end, valid_from=LOAD_TIME, valid_to=None):
+        return HistoricPlannedOutage.objects.create(
+            ticket=ticket, ticket_number=ticket.ticket_number, facility=facility, lineNumber=1, zone=self.zone,
+            station=self.station, startTime=start, endTime=end, openClosed='O', validFrom=valid_from,
+            validTo=valid_to, currentStatus='Y' if valid_to is None else 'N')
+
+    def current_outage(self, number, facility, start, end, valid_from=LOAD_TIME):
+        # The loaders keep the ticket number in ticket_id, see CurrentPlannedOutageManager
+        return CurrentPlannedOutage(ticket_id=number, ticket_number=number, lineNumber=1, facility=facility,
+                                    zone=self.zone, station=self.station, startTime=start, endTime=end,
+                                    openClosed='O', validFrom=valid_from)
+
+
+def history_writes(queries):
+    return [query['sql'] for query in queries if query['sql'].split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+class TestApplyDelta(HistoryTestCase):
+    def setUp(self):
+        super(TestApplyDelta, self).setUp()
+        self.historic_ticket(1001)
+
+    def load(self, start, valid_from=LOAD_TIME):
+        return HistoricPlannedOutage.objects.apply_delta(
+            [self.current_outage(1001, self.line, start, datetime(2015, 12, 5), valid_from),
+             self.current_outage(1001, self.breaker, datetime(2015, 12, 1), datetime(2015, 12, 5), valid_from)],
+            valid_from)
+
+    def assert_unchanged_load_writes_nothing(self):
+        self.assertEqual(self.load(datetime(2015, 12, 1)), (0, 2))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.load(datetime(2015, 12, 1), NEXT_LOAD_TIME), (0, 0))
+        self.assertEqual(history_writes(queries), [])
+
+    def test_unchanged_outages_should_not_be_written(self):
+        self.assert_unchanged_load_writes_nothing()
+
+    @override_settings(USE_TZ=True, TIME_ZONE='America/New_York')
+    def test_unchanged_outages_should_not_be_written_with_time_zones(self):
+        # The parsed file holds naive local times, the database returns aware UTC times
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.assert_unchanged_load_writes_nothing()
+
+    def test_changed_and_removed_outages_should_be_closed(self):
+        self.load(datetime(2015, 12, 1))
+        self.assertEqual(self.load(datetime(2015, 12, 2), NEXT_LOAD_TIME), (1, 1))
+        self.assertEqual(HistoricPlannedOutage.objects.apply_delta([], NEXT_LOAD_TIME), (2, 0))
+        self.assertEqual(HistoricPlannedOutage.objects.filter(currentStatus='Y').count(), 0)
+        self.assertEqual(HistoricPlannedOutage.objects.filter(validTo=NEXT_LOAD_TIME).count(), 3)
+
+
+class TestHistoryCheckpoints(HistoryTestCase):
+    def setUp(self):
+        super(TestHistoryCheckpoints, self).setUp()
+        self.historic_ticket(1001)
+        delta = HistoricPlannedOutage.objects.apply_delta
+        delta([self.current_outage(1001, self.line, datetime(2015, 12, 1), datetime(2015, 12, 5))], LOAD_TIME)
+        self.checkpoint = HistoryCheckpoint.objects.write(datetime(2015, 11, 7, 16, 0, 30))
+        delta([self.current_outage(1001, self.line, datetime(2015, 12, 2), datetime(2015, 12, 5), NEXT_LOAD_TIME),
+               self.current_outage(1001, self.breaker, datetime(2015, 12, 1), datetime(2015, 12, 5), NEXT_LOAD_TIME)],
+              NEXT_LOAD_TIME)
+
+    def test_checkpoint_should_hold_rows_valid_at_its_time(self):
+        self.assertEqual(self.checkpoint.checkpointTime, datetime(2015, 11, 7, 16, 0))
+        self.assertEqual(self.checkpoint.historycheckpointoutage_set.count(), 1)
+        self.assertEqual(HistoryCheckpoint.objects.nearest(datetime(2015, 11, 7, 17)), self.checkpoint)
+        self.assertIsNone(HistoryCheckpoint.objects.nearest(datetime(2015, 11, 7, 15, 59)))
+
+    def test_queries_from_checkpoints_should_match_full_queries(self):
+        for date in (datetime(2015, 11, 7, 16, 30), datetime(2015, 11, 7, 17)):
+            full = _fetchall(HISTORIC_OUTAGES, [_to_date_string(date)] * 2)
+            self.assertEqual(sorted(get_historic_outages(date)), sorted(full))
+
+        date1, date2 = _to_date_string(datetime(2015, 11, 7, 17)), _to_date_string(datetime(2015, 11, 7, 16, 30))
+        full = _fetchall(OUTAGE_DIFF, [date1, date1, date2, date2, date2, date2, date1, date1])
+        diff = get_outage_diff(datetime(2015, 11, 7, 17), datetime(2015, 11, 7, 16, 30))
+        self.assertEqual(sorted(diff), sorted(full))
+        self.assertEqual(sorted(row[0] for row in diff), ['added', 'changed_from', 'changed_to'])
+
+    def test_load_before_a_checkpoint_should_drop_it(self):
+        HistoricPlannedOutage.objects.apply_delta([], datetime(2015, 11, 7, 15, 50))
+        self.assertFalse(HistoryCheckpoint.objects.exists())
+
+    @override_settings(USE_TZ=True, TIME_ZONE='America/New_York')
+    def test_checkpoint_in_another_time_zone_should_hold_rows_valid_at_its_instant(self):
+        HistoryCheckpoint.objects.all().delete()
+        # 16:15 UTC, after the first load at 15:42 UTC and before the second at 16:42 UTC
+        checkpoint_time = timezone.make_aware(datetime(2015, 11, 7, 11, 15))
+        checkpoint = HistoryCheckpoint.objects.write(checkpoint_time)
+        self.assertEqual(checkpoint.historycheckpointoutage_set.count(), 1)
+
+
+class TestLoadQueries(HistoryTestCase):
+    def setUp(self):
+        super(TestLoadQueries, self).setUp()
+        load_outage_file(OutageParser(PARSER_SAMPLE), LOAD_TIME, dimensions=DimensionCache())
+        parser = OutageParser(PARSER_SAMPLE)
+        # The second file moves the first outage of the first ticket and drops the second ticket
+        parser.tickets[0].outages[0].start_time = datetime(2015, 11, 2, 8)
+        parser.tickets[1].outages[:] = []
+        load_outage_file(parser, NEXT_LOAD_TIME, dimensions=DimensionCache())
+
+    def test_current_outages_should_join_tickets_and_dimensions(self):
+        rows = get_current_outages()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(set((row[0], row[1], row[9]) for row in rows), set([(594137, 'AEP-IM', 'Active'),
+                                                                              (594137, 'AEP', 'Active')]))
+
+    def test_diff_queries_should_match_the_single_statement_diff(self):
+        date1, date2 = datetime(2015, 11, 7, 17), datetime(2015, 11, 7, 16)
+        diff = get_outage_diff(date1, date2)
+        for change_type, rows in (('added', get_diff_added_outages(date1, date2)),
+                                  ('removed', get_diff_removed_outages(date1, date2)),
+                                  ('changed_to', get_diff_changed_to_outages(date1, date2)),
+                                  ('changed_from', get_diff_changed_from_outages(date1, date2))):
+            self.assertEqual(sorted(rows), sorted(row[1:] for row in diff if row[0] == change_type))
+        self.assertEqual(sorted(row[0] for row in diff), ['changed_from', 'changed_to', 'removed', 'removed'])
+
+
+class TestOutagesAsOf(HistoryTestCase):
+    def setUp(self):
+        super(TestOutagesAsOf, self).setUp()
+        self.historic_ticket(1001)
+        delta = HistoricPlannedOutage.objects.apply_delta
+        delta([self.current_outage(1001, self.line, datetime(2015, 12, 1), datetime(2015, 12, 5))], LOAD_TIME)
+        delta([self.current_outage(1001, self.line, datetime(2015, 12, 3), datetime(2015, 12, 6), NEXT_LOAD_TIME),
+               self.current_outage(1001, self.breaker, datetime(2015, 12, 10), datetime(2015, 12, 12), NEXT_LOAD_TIME)],
+              NEXT_LOAD_TIME)
+        HistoricPlannedOutage.objects.move_closed()
+
+    def test_as_of_should_follow_both_axes(self):
+        known_first = get_outages_as_of(datetime(2015, 11, 7, 16), datetime(2015, 12, 2))
+        self.assertEqual([(row[2], row[6]) for row in known_first], [('BRADFORD 230 KV LINE', datetime(2015, 12, 1))])
+        self.assertEqual(get_outages_as_of(datetime(2015, 11, 7, 17), datetime(2015, 12, 2)), [])
+        window = get_outages_as_of(datetime(2015, 11, 7, 17), datetime(2015, 12, 1), datetime(2015, 12, 31))
+        self.assertEqual(len(window), 2)
+
+    @mock.patch('outages.SQL.AS_OF_BATCH_SIZE', 2)
+    def test_batch_should_match_single_requests(self):
+        requests = [(datetime(2015, 11, 7, 16), datetime(2015, 12, 2), None),
+                    (datetime(2015, 11, 7, 17), datetime(2015, 12, 2), None),
+                    (datetime(2015, 11, 7, 17), datetime(2015, 12, 1), datetime(2015, 12, 31)),
+                    (datetime(2015, 11, 7, 15), datetime(2015, 12, 1), datetime(2015, 12, 31)),
+                    (datetime(2015, 11, 7, 16), datetime(2015, 12, 4), None)]
+        batch = get_outages_as_of_batch(requests)
+        self.assertEqual(len(batch), len(requests))
+        for request, rows in zip(requests, batch):
+            self.assertEqual(sorted(rows), sorted(get_outages_as_of(*request)))
+        self.assertEqual([len(rows) for rows in batch], [1, 0, 2, 0, 1])
+
+
+class TestDimensionCache(HistoryTestCase):
+    def setUp(self):
+        super(TestDimensionCache, self).setUp()
+        self.outages = [outage for ticket in OutageParser(PARSER_SAMPLE).tickets for outage in ticket.outages]
+
+    def test_prime_should_insert_unseen_names_once(self):
+        dimensions = DimensionCache()
+        dimensions.prime(self.outages)
+        self.assertEqual(sorted(Zone.objects.values_list('zoneName', flat=True)), ['AEP', 'AEP-IM', 'AEP-OH', 'PECO'])
+        self.assertEqual(Equipment.objects.count(), 9)
+        with self.assertNumQueries(0):
+            dimensions.prime(self.outages)
+            keys = [dimensions.resolve(outage) for outage in self.outages]
+        self.assertEqual(keys[-1], (Zone.objects.get(zoneName='AEP-OH').id,
+                                    Station.objects.get(stationName='DELAWARE').id,
+                                    Equipment.objects.get(equipmentName='DELAWARE 106          CB').id))
+
+    def test_prime_should_keep_names_inserted_by_another_loader(self):
+        dimensions = DimensionCache()
+        dimensions.load()
+        zone = Zone.objects.create(zoneName='AEP')
+        station = Station.objects.create(stationName='DELAWARE')
+        dimensions.prime(self.outages)
+        self.assertEqual(Zone.objects.filter(zoneName='AEP').count(), 1)
+        self.assertEqual(dimensions.zones['AEP'], zone.id)
+        self.assertEqual(dimensions.stations['DELAWARE'], station.id)
+        self.assertEqual(len(dimensions.zones), 4)
+
+
+class TestLoadOutageFile(HistoryTestCase):
+    def load(self, mod_date, delta):
+        return load_outage_file(OutageParser(PARSER_SAMPLE), mod_date, delta, DimensionCache())
+
+    def test_load_should_fill_current_and_history_tables(self):
+        self.assertEqual(self.load(LOAD_TIME, False), (2, 7))
+        self.assertEqual(CurrentTicket.objects.count(), 2)
+        self.assertEqual(HistoricTicket.objects.count(), 2)
+        self.assertEqual(HistoricPlannedOutage.objects.filter(currentStatus='Y').count(), 7)
+        self.assertEqual(len(get_historic_outages(datetime(2015, 11, 7, 16))), 7)
+
+    def test_reload_should_keep_unchanged_history(self):
+        for delta in (False, True):
+            self.load(LOAD_TIME, delta)
+            self.load(NEXT_LOAD_TIME, delta)
+            self.assertEqual(CurrentPlannedOutage.objects.count(), 7)
+            self.assertEqual(HistoricPlannedOutage.objects.count(), 7)
+            self.assertEqual(ClosedHistoricPlannedOutage.objects.count(), 0)
+
+
+class TestOutageIntervalIndex(HistoryTestCase):
+    def test_historic_index_should_include_closed_rows(self):
+        ticket = self.historic_ticket(1001)
+        self.historic_outage(ticket, self.line, datetime(2015, 12, 1), datetime(2015, 12, 5))
+        self.historic_outage(ticket, self.breaker, datetime(2015, 12, 3), datetime(2015, 12, 8),
+                             valid_to=datetime(2015, 11, 8))
+        HistoricPlannedOutage.objects.move_closed()
+        self.assertEqual(ClosedHistoricPlannedOutage.objects.count(), 1)
+
+        index = OutageIntervalIndex(historic_querysets())
+        outages = index.overlapping(datetime(2015, 12, 4), datetime(2015, 12, 4))
+        self.assertEqual(sorted((outage.ticket_number, outage.equipment) for outage in outages),
+                         [(1001, 'BRADFORD 230 KV BKR'), (1001, 'BRADFORD 230 KV LINE')])
+        self.assertEqual(len(index.active_at(datetime(2015, 12, 7), equipment='BRADFORD 230 KV BKR')), 1)
+
+    def test_index_should_reject_other_models(self):
+        with self.assertRaises(ValueError):
+            OutageIntervalIndex(Zone.objects.all())
+
+
+class TestMoveClosed(HistoryTestCase):
+    def test_closed_rows_should_move_with_their_ids(self):
+        closed_ticket = self.historic_ticket(1001, valid_to=LOAD_TIME)
+        referenced_ticket = self.historic_ticket(1002, valid_to=LOAD_TIME)
+        open_ticket = self.historic_ticket(1002, valid_from=LOAD_TIME)
+        closed = self.historic_outage(closed_ticket, self.line, datetime(2015, 12, 1), datetime(2015, 12, 5),
+                                      valid_from=datetime(2015, 11, 1), valid_to=LOAD_TIME)
+        referencing = self.historic_outage(referenced_ticket, self.breaker, datetime(2015, 12, 1),
+                                           datetime(2015, 12, 5), valid_from=datetime(2015, 11, 1))
+        self.historic_outage(open_ticket, self.line, datetime(2015, 12, 1), datetime(2015, 12, 5))
+
+        HistoricPlannedOutage.objects.move_closed()
+        HistoricTicket.objects.move_closed()
+        self.assertEqual(list(ClosedHistoricPlannedOutage.objects.values_list('id', 'ticket_id')),
+                         [(closed.id, closed_ticket.id)])
+        self.assertEqual(HistoricPlannedOutage.objects.filter(currentStatus='N').count(), 0)
+        # The open outage still references its closed ticket version, which stays in the open table
+        self.assertEqual(list(ClosedHistoricTicket.objects.values_list('id', flat=True)), [closed_ticket.id])
+        self.assertTrue(HistoricTicket.objects.filter(id=referenced_ticket.id).exists())
+        self.assertTrue(HistoricPlannedOutage.objects.filter(id=referencing.id).exists())
+
+        # The point-in-time queries read the closed rows and tickets through the view and the ticket joins
+        before = get_historic_outages(datetime(2015, 11, 7))
+        self.assertEqual(sorted((row[0], row[2]) for row in before),
+                         [(1001, 'BRADFORD 230 KV LINE'), (1002, 'BRADFORD 230 KV BKR')])
+        self.assertEqual(len(get_historic_outages(datetime(2015, 11, 8))), 2)
+
+
+class TestHistoryArchive(HistoryTestCase):
+    def setUp(self):
+        super(TestHistoryArchive, self).setUp()
+        self.directory = mkdtemp()
+        ticket = self.historic_ticket(1001, valid_from=datetime(2015, 9, 1))
+        self.historic_outage(ticket, self.line, datetime(2015, 12, 1), datetime(2015, 12, 5),
+                             valid_from=datetime(2015, 9, 1), valid_to=datetime(2015, 10, 20))
+        self.historic_outage(ticket, self.breaker, datetime(2015, 12, 1), datetime(2015, 12, 5),
+                             valid_from=datetime(2015, 9, 1))
+        HistoricPlannedOutage.objects.move_closed()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_queries_before_the_archive_should_raise(self):
+        self.assertEqual(len(get_historic_outages(datetime(2015, 10, 1))), 2)
+        archived = archive_closed_history(self.directory, datetime(2015, 11, 1))
+        self.assertEqual(archived, [('2015-10', 1, 0)])
+        self.assertEqual(HistoryArchive.objects.archived_before(), datetime(2015, 11, 1))
+
+        with self.assertRaises(ArchivedHistoryError):
+            get_historic_outages(datetime(2015, 10, 1))
+        with self.assertRaises(ArchivedHistoryError):
+            get_outage_diff(datetime(2015, 11, 2), datetime(2015, 10, 1))
+        with self.assertRaises(ArchivedHistoryError):
+            get_outages_as_of(datetime(2015, 10, 1), datetime(2015, 12, 2))
+        self.assertEqual(len(archived_outages_at(self.directory, datetime(2015, 10, 1))), 1)
+        self.assertEqual(len(get_historic_outages(datetime(2015, 11, 2))), 1)